@@ -0,0 +1,118 @@
+# admision.py
+
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    # Solo lo necesita el modo de admisión por ventana (ver Admision)
+    np = None
+
+# Criterios de admisión por ventana
+CRITERIO_FCFS        = "fcfs"              # orden de llegada (sin ventana)
+CRITERIO_MAX         = "max_solicitudes"   # maximiza el número de solicitudes satisfechas
+CRITERIO_EQUITATIVO  = "equitativo"        # reparte por turnos entre facultades
+CRITERIOS            = (CRITERIO_FCFS, CRITERIO_MAX, CRITERIO_EQUITATIVO)
+
+# Una ventana se resuelve cuando se cumple el primero de estos criterios
+ADMISION_VENTANA         = 0.05   # segundos desde la primera solicitud de la ventana
+ADMISION_MAX_SOLICITUDES = 256    # solicitudes acumuladas
+
+def _cuota_dominante(demandas, capacidad):
+    """
+    Fracción de la capacidad que pide cada solicitud en su recurso más
+    escaso (inf si no cabe ni sola).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cuotas = np.where(capacidad > 0, demandas / capacidad, np.where(demandas > 0, np.inf, 0.0))
+    cuota = cuotas.max(axis=1)
+    cuota[np.any((demandas > capacidad) | (demandas < 0), axis=1)] = np.inf
+    return cuota
+
+def ordenar(demandas, capacidad, criterio=CRITERIO_MAX, grupos=None):
+    """
+    Orden de prioridad de las solicitudes de una ventana, sin las que no
+    caben ni solas. El Central admite en este orden las que todavía caben
+    (mochila multidimensional con valor 1 por solicitud, resuelta de forma
+    voraz); como las aulas de cada solicitud dependen de sus restricciones,
+    esa parte se decide asignando sobre una copia del inventario.
+
+    Con CRITERIO_MAX se ordena por cuota dominante creciente: primero las
+    solicitudes que menos consumen del recurso que más escasea. Con
+    CRITERIO_EQUITATIVO se intercalan las facultades por turnos (la solicitud
+    más pequeña de cada una, luego la segunda, ...).
+
+    Args:
+        demandas (array): Matriz n x k de recursos pedidos (e.g., salones y laboratorios).
+        capacidad (array): Vector k con lo disponible, o matriz n x k con lo
+            disponible para cada solicitud según sus restricciones.
+        criterio (str): CRITERIO_MAX o CRITERIO_EQUITATIVO.
+        grupos (array): Grupo de cada solicitud (facultad) para CRITERIO_EQUITATIVO.
+
+    Returns:
+        np.ndarray: Índices de las solicitudes en orden de prioridad.
+    """
+    demandas = np.asarray(demandas, dtype=np.int64).reshape(len(demandas), -1)
+    capacidad = np.asarray(capacidad, dtype=np.int64)
+    cuota = _cuota_dominante(demandas, capacidad)
+    if criterio == CRITERIO_EQUITATIVO and grupos is not None:
+        grupos = np.asarray(grupos)
+        # Turno de cada solicitud dentro de su grupo (0 = la más pequeña del grupo)
+        por_grupo = np.lexsort((cuota, grupos))
+        grupos_ordenados = grupos[por_grupo]
+        inicio = np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]]
+        posicion = np.arange(len(por_grupo))
+        primero = np.maximum.accumulate(np.where(inicio, posicion, 0))
+        turno = np.empty(len(por_grupo), dtype=np.int64)
+        turno[por_grupo] = posicion - primero
+        orden = np.lexsort((cuota, turno))
+    else:
+        orden = np.argsort(cuota, kind="stable")
+    return orden[np.isfinite(cuota[orden])]
+
+class Admision:
+    """
+    Configuración y contadores del modo de admisión por ventana del Central.
+
+    Args:
+        criterio (str): CRITERIO_MAX o CRITERIO_EQUITATIVO.
+        ventana (float): Segundos máximos que una solicitud espera a su ventana.
+        max_solicitudes (int): Solicitudes que cierran la ventana antes de tiempo.
+    """
+    def __init__(self, criterio=CRITERIO_MAX, ventana=ADMISION_VENTANA,
+                 max_solicitudes=ADMISION_MAX_SOLICITUDES):
+        if criterio not in (CRITERIO_MAX, CRITERIO_EQUITATIVO):
+            raise ValueError(f"Criterio de admisión desconocido: {criterio!r}")
+        if np is None:
+            raise RuntimeError("La admisión por ventana requiere NumPy (pip3 install numpy)")
+        self.criterio        = criterio
+        self.ventana         = ventana
+        self.max_solicitudes = max_solicitudes
+        self.ventanas        = 0
+        self.solicitudes     = 0
+        self.aceptadas       = 0
+        self.aceptadas_fcfs  = 0
+        self.lock            = threading.Lock()
+
+    def registrar(self, solicitudes, aceptadas, aceptadas_fcfs):
+        with self.lock:
+            self.ventanas       += 1
+            self.solicitudes    += solicitudes
+            self.aceptadas      += aceptadas
+            self.aceptadas_fcfs += aceptadas_fcfs
+
+    def estado(self):
+        """
+        Tasa de aceptación real frente a la que habría dado FCFS en las mismas ventanas.
+        """
+        with self.lock:
+            total = self.solicitudes
+            return {
+                "criterio": self.criterio,
+                "ventanas": self.ventanas,
+                "solicitudes": total,
+                "aceptadas": self.aceptadas,
+                "aceptadas_fcfs": self.aceptadas_fcfs,
+                "tasa_aceptacion": self.aceptadas / total if total else 0,
+                "tasa_aceptacion_fcfs": self.aceptadas_fcfs / total if total else 0
+            }
@@ -0,0 +1,494 @@
+# almacen.py
+
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import atexit
+import struct
+import argparse
+
+# --- FORMATO EN DISCO ---
+#
+# Directorio del almacén (un único proceso escritor por directorio):
+#   cadenas.txt               una cadena JSON por línea; su número de línea es su id
+#   ids.dat                   ids de aulas de cada registro ("S001,S002|L01" en utf-8)
+#   segmento_<n>.dat          cabecera b"AALM" + versión (uint16) + tamaño de registro (uint16)
+#                             y registros de tamaño fijo (REGISTRO)
+#   segmento_<n>.idx          índice lateral: (facultad, semestre, programa, posición) por registro
+#   segmento_<n>.ord          índice ordenado de un segmento lleno: para facultad, semestre y
+#                             programa (en ese orden), n pares (id de cadena, posición) ordenados
+#
+# Los registros solo se anexan. Un lector calcula cuántos hay por el tamaño del
+# archivo, así que un registro a medio escribir al final simplemente se ignora.
+# El .ord se escribe (de forma atómica) al cerrar el segmento; el segmento
+# activo, el único que no lo tiene, se filtra recorriendo su .idx.
+
+VERSION_ALMACEN = 1
+MAGIA_ALMACEN   = b"AALM"
+CABECERA        = struct.Struct("<4sHH")
+
+DIRECTORIO_ALMACEN     = "almacen_facultades"
+REGISTROS_POR_SEGMENTO = 1 << 16   # registros por archivo de segmento
+VACIAR_CADA            = 256       # registros en memoria antes de escribir a disco
+
+# Tipos y estados de los registros
+TIPOS   = ("solicitud", "asignacion")
+ESTADOS = ("pendiente", "rechazado", "asignado")
+
+_CAMPOS_REGISTRO = [
+    ("tipo", "u1"),
+    ("estado", "u1"),
+    ("reservado", "<u2"),
+    ("facultad", "<u4"),
+    ("semestre", "<u4"),
+    ("programa", "<u4"),
+    ("salones", "<i4"),
+    ("laboratorios", "<i4"),
+    ("salones_asignados", "<i4"),
+    ("laboratorios_asignados", "<i4"),
+    ("instante", "<f8"),
+    ("ids_posicion", "<u8"),
+    ("ids_largo", "<u4"),
+]
+_REGISTRO = struct.Struct("<BBHIIIiiiidQI")
+_COLUMNA  = {campo: i for i, (campo, _) in enumerate(_CAMPOS_REGISTRO)}
+
+_CAMPOS_INDICE = [("facultad", "<u4"), ("semestre", "<u4"), ("programa", "<u4"), ("posicion", "<u4")]
+_INDICE = struct.Struct("<IIII")
+
+# Columnas de cadena con índice ordenado, en el orden de sus secciones en el .ord
+CLAVES = ("facultad", "semestre", "programa")
+_CAMPOS_ORDEN = [("valor", "<u4"), ("posicion", "<u4")]
+_ORDEN = struct.Struct("<II")
+
+# El escritor solo usa struct; NumPy y los dtypes equivalentes (REGISTRO,
+# INDICE, ORDEN) se cargan al abrir un LectorAlmacen, así las facultades no
+# dependen de NumPy para anexar registros
+np       = None
+REGISTRO = None
+INDICE   = None
+ORDEN    = None
+
+def _cargar_numpy():
+    global np, REGISTRO, INDICE, ORDEN
+    if np is not None:
+        return
+    import numpy
+    REGISTRO = numpy.dtype(_CAMPOS_REGISTRO)
+    assert REGISTRO.itemsize == _REGISTRO.size
+    INDICE = numpy.dtype(_CAMPOS_INDICE)
+    ORDEN = numpy.dtype(_CAMPOS_ORDEN)
+    np = numpy
+
+def _ruta_segmento(directorio, numero, extension):
+    return os.path.join(directorio, f"segmento_{numero:06d}.{extension}")
+
+def _segmentos(directorio):
+    return sorted(int(os.path.basename(ruta)[9:15])
+                  for ruta in glob.glob(os.path.join(directorio, "segmento_*.dat")))
+
+def _escribir_orden(directorio, numero):
+    """
+    Escribe el índice ordenado de un segmento lleno a partir de sus registros.
+    """
+    ruta = _ruta_segmento(directorio, numero, "dat")
+    cantidad = (os.path.getsize(ruta) - CABECERA.size) // _REGISTRO.size
+    with open(ruta, "rb") as f:
+        f.seek(CABECERA.size)
+        filas = list(_REGISTRO.iter_unpack(f.read(cantidad * _REGISTRO.size)))
+    secciones = []
+    for campo in CLAVES:
+        valores = [fila[_COLUMNA[campo]] for fila in filas]
+        # sorted es estable: a igual valor, las posiciones quedan crecientes
+        orden = sorted(range(cantidad), key=valores.__getitem__)
+        secciones.append(b"".join(_ORDEN.pack(valores[posicion], posicion) for posicion in orden))
+    destino = _ruta_segmento(directorio, numero, "ord")
+    with open(destino + ".tmp", "wb") as f:
+        f.write(b"".join(secciones))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(destino + ".tmp", destino)
+
+def _leer_cadenas(directorio):
+    ruta = os.path.join(directorio, "cadenas.txt")
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.endswith("\n")]
+
+def _bloquear(archivo):
+    # Un solo escritor por directorio (sin fcntl, p. ej. en Windows, no se verifica)
+    try:
+        import fcntl
+    except ImportError:
+        return
+    try:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        raise RuntimeError(f"Otro proceso ya escribe en {os.path.dirname(archivo.name)}")
+
+class AlmacenAsignaciones:
+    """
+    Escritor del almacén binario de solicitudes y asignaciones.
+
+    Cada registro ocupa _REGISTRO.size bytes: las cadenas (facultad,
+    semestre, programa) se guardan una sola vez en cadenas.txt y el registro
+    las referencia por id; los ids de aulas, de largo variable, van a ids.dat.
+    Los registros se acumulan en memoria y se escriben cada VACIAR_CADA (y al
+    salir), primero cadenas e ids y después segmento e índice, de modo que un
+    registro visible nunca apunta a datos que aún no están en disco.
+
+    Args:
+        directorio (str): Carpeta del almacén (e.g., "almacen_facultades").
+    """
+    def __init__(self, directorio=DIRECTORIO_ALMACEN, vaciar_cada=VACIAR_CADA):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio  = directorio
+        self.vaciar_cada = vaciar_cada
+        self.bloqueo     = open(os.path.join(directorio, "escritor.lock"), "w")
+        _bloquear(self.bloqueo)
+
+        cadenas = _leer_cadenas(directorio)
+        self.ids_cadenas = {texto: i for i, texto in enumerate(cadenas)}
+        self.archivo_cadenas = open(os.path.join(directorio, "cadenas.txt"), "ab")
+        # Quitar una última línea incompleta (caída a mitad de escritura)
+        self.archivo_cadenas.truncate(self._fin_ultima_linea())
+        self.archivo_ids = open(os.path.join(directorio, "ids.dat"), "ab")
+        self.posicion_ids = self.archivo_ids.tell()
+
+        segmentos = _segmentos(directorio)
+        self.numero = segmentos[-1] if segmentos else 1
+        # Segmentos llenos sin índice ordenado (caída justo al cambiar de segmento)
+        for numero in segmentos[:-1]:
+            if not os.path.exists(_ruta_segmento(directorio, numero, "ord")):
+                _escribir_orden(directorio, numero)
+        self._abrir_segmento()
+        self.pendientes = []   # (registro, entrada de índice) aún en memoria
+        atexit.register(self.cerrar)
+
+    def _abrir_segmento(self):
+        ruta = _ruta_segmento(self.directorio, self.numero, "dat")
+        nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) < CABECERA.size
+        self.segmento = open(ruta, "r+b" if not nuevo else "wb")
+        if nuevo:
+            self.segmento.write(CABECERA.pack(MAGIA_ALMACEN, VERSION_ALMACEN, _REGISTRO.size))
+            self.cantidad = 0
+        else:
+            # Descartar un registro a medio escribir por una caída
+            self.cantidad = (os.path.getsize(ruta) - CABECERA.size) // _REGISTRO.size
+            self.segmento.truncate(CABECERA.size + self.cantidad * _REGISTRO.size)
+            self.segmento.seek(0, os.SEEK_END)
+        self.indice = open(_ruta_segmento(self.directorio, self.numero, "idx"), "ab")
+        indexados = min(self.indice.tell() // _INDICE.size, self.cantidad)
+        self.indice.truncate(indexados * _INDICE.size)
+        if indexados < self.cantidad:
+            # El índice se escribe después del segmento: reconstruir lo que faltó
+            with open(ruta, "rb") as f:
+                f.seek(CABECERA.size + indexados * _REGISTRO.size)
+                datos = f.read((self.cantidad - indexados) * _REGISTRO.size)
+            self.indice.write(b"".join(
+                _INDICE.pack(*(fila[_COLUMNA[campo]] for campo in CLAVES), indexados + i)
+                for i, fila in enumerate(_REGISTRO.iter_unpack(datos))
+            ))
+            self.indice.flush()
+
+    def _fin_ultima_linea(self):
+        ruta = self.archivo_cadenas.name
+        with open(ruta, "rb") as f:
+            contenido = f.read()
+        return contenido.rfind(b"\n") + 1
+
+    def _cadena(self, texto):
+        texto = str(texto or "")
+        id_cadena = self.ids_cadenas.get(texto)
+        if id_cadena is None:
+            id_cadena = self.ids_cadenas[texto] = len(self.ids_cadenas)
+            self.archivo_cadenas.write((json.dumps(texto, ensure_ascii=False) + "\n").encode("utf-8"))
+        return id_cadena
+
+    def agregar(self, tipo, estado, facultad, semestre, programa, salones, laboratorios,
+                salones_asignados=0, laboratorios_asignados=0, salones_ids=(), laboratorios_ids=(),
+                instante=None):
+        """
+        Anexa un registro.
+
+        Args:
+            tipo (str): "solicitud" o "asignacion".
+            estado (str): "pendiente", "rechazado" o "asignado".
+            salones_ids (list): Ids de salones asignados (e.g., ["S001", "S002"]).
+            laboratorios_ids (list): Ids de laboratorios asignados (e.g., ["L01"]).
+            instante (float): Marca de tiempo (por defecto, ahora).
+        """
+        if self.cantidad >= REGISTROS_POR_SEGMENTO:
+            self.vaciar()
+            self.segmento.close()
+            self.indice.close()
+            _escribir_orden(self.directorio, self.numero)
+            self.numero += 1
+            self._abrir_segmento()
+        ids = ",".join(salones_ids) + "|" + ",".join(laboratorios_ids) if salones_ids or laboratorios_ids else ""
+        ids = ids.encode("utf-8")
+        if ids:
+            self.archivo_ids.write(ids)
+        facultad, semestre, programa = self._cadena(facultad), self._cadena(semestre), self._cadena(programa)
+        registro = _REGISTRO.pack(
+            TIPOS.index(tipo), ESTADOS.index(estado), 0, facultad, semestre, programa,
+            salones, laboratorios, salones_asignados, laboratorios_asignados,
+            instante if instante is not None else time.time(),
+            self.posicion_ids, len(ids)
+        )
+        self.posicion_ids += len(ids)
+        self.pendientes.append((registro, _INDICE.pack(facultad, semestre, programa, self.cantidad)))
+        self.cantidad += 1
+        if len(self.pendientes) >= self.vaciar_cada:
+            self.vaciar()
+
+    def vaciar(self):
+        """
+        Escribe lo pendiente: cadenas e ids antes que los registros que los usan.
+        """
+        if not self.pendientes:
+            return
+        self.archivo_cadenas.flush()
+        self.archivo_ids.flush()
+        self.segmento.write(b"".join(registro for registro, _ in self.pendientes))
+        self.segmento.flush()
+        self.indice.write(b"".join(entrada for _, entrada in self.pendientes))
+        self.indice.flush()
+        self.pendientes = []
+
+    def cerrar(self):
+        if self.segmento.closed:
+            return
+        self.vaciar()
+        for archivo in (self.archivo_cadenas, self.archivo_ids, self.segmento, self.indice, self.bloqueo):
+            archivo.close()
+
+class LectorAlmacen:
+    """
+    Lector del almacén: proyecta segmentos e índices con mmap y los ve como
+    arreglos estructurados de NumPy sin copiarlos, así las consultas filtran
+    y agregan sin decodificar texto. Puede abrirse mientras el escritor sigue
+    anexando; ve lo que ya estaba en disco al abrir cada segmento.
+
+    Args:
+        directorio (str): Carpeta del almacén.
+    """
+    def __init__(self, directorio=DIRECTORIO_ALMACEN):
+        _cargar_numpy()
+        self.directorio = directorio
+        self.cadenas = _leer_cadenas(directorio)
+        self.ids_cadenas = {texto: i for i, texto in enumerate(self.cadenas)}
+
+    def _proyectar(self, ruta, desplazamiento, dtype):
+        tamano = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        cantidad = max(0, tamano - desplazamiento) // dtype.itemsize
+        if cantidad == 0:
+            return np.empty(0, dtype=dtype)
+        with open(ruta, "rb") as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return np.frombuffer(mapa, dtype=dtype, count=cantidad, offset=desplazamiento)
+
+    def _segmento(self, numero):
+        ruta = _ruta_segmento(self.directorio, numero, "dat")
+        with open(ruta, "rb") as f:
+            magia, version, tamano = CABECERA.unpack(f.read(CABECERA.size))
+        if magia != MAGIA_ALMACEN or version != VERSION_ALMACEN or tamano != REGISTRO.itemsize:
+            raise ValueError(f"Segmento con formato desconocido: {ruta}")
+        registros = self._proyectar(ruta, CABECERA.size, REGISTRO)
+        indice = self._proyectar(_ruta_segmento(self.directorio, numero, "idx"), 0, INDICE)
+        return registros, indice[:len(registros)]
+
+    def _orden(self, numero, cantidad):
+        # Secciones del índice ordenado de un segmento lleno, o None si no lo tiene
+        orden = self._proyectar(_ruta_segmento(self.directorio, numero, "ord"), 0, ORDEN)
+        if len(orden) != len(CLAVES) * cantidad:
+            return None
+        return {campo: orden[i * cantidad:(i + 1) * cantidad] for i, campo in enumerate(CLAVES)}
+
+    def _posiciones(self, numero, registros, indice, filtros):
+        """
+        Posiciones de los registros del segmento que cumplen los filtros. Con
+        índice ordenado cada filtro es un rango por búsqueda binaria; se toma el
+        más corto y solo esos registros se comparan con los demás filtros.
+        """
+        orden = self._orden(numero, len(registros))
+        if orden is None:
+            # Segmento activo: recorrer su índice lateral
+            mascara = np.ones(len(indice), dtype=bool)
+            for campo, id_cadena in filtros:
+                mascara &= indice[campo] == id_cadena
+            return indice["posicion"][mascara]
+        rangos = []
+        for campo, id_cadena in filtros:
+            valores = orden[campo]["valor"]
+            inicio = np.searchsorted(valores, id_cadena, side="left")
+            fin = np.searchsorted(valores, id_cadena, side="right")
+            rangos.append((fin - inicio, campo, inicio, fin))
+        _, campo, inicio, fin = min(rangos)
+        posiciones = np.sort(orden[campo]["posicion"][inicio:fin])
+        for otro, id_cadena in filtros:
+            if otro != campo:
+                posiciones = posiciones[registros[otro][posiciones] == id_cadena]
+        return posiciones
+
+    def registros(self, facultad=None, semestre=None, programa=None, tipo=None):
+        """
+        Registros que cumplen los filtros, como arreglo estructurado REGISTRO.
+        Facultad, semestre y programa se resuelven con el índice ordenado de
+        cada segmento lleno (y el lateral del activo); solo se copian los
+        registros que coinciden.
+        """
+        filtros = [(campo, self.ids_cadenas.get(valor)) for campo, valor in
+                   (("facultad", facultad), ("semestre", semestre), ("programa", programa)) if valor is not None]
+        if any(id_cadena is None for _, id_cadena in filtros):
+            # Una cadena que nunca se escribió no puede coincidir con nada
+            return np.empty(0, dtype=REGISTRO)
+        partes = []
+        for numero in _segmentos(self.directorio):
+            registros, indice = self._segmento(numero)
+            if filtros:
+                registros = registros[self._posiciones(numero, registros, indice, filtros)]
+            if tipo is not None:
+                registros = registros[registros["tipo"] == TIPOS.index(tipo)]
+            partes.append(registros)
+        return np.concatenate(partes) if partes else np.empty(0, dtype=REGISTRO)
+
+    def ids(self, registros):
+        """
+        Ids de aulas de cada registro: lista de (salones_ids, laboratorios_ids).
+        """
+        ruta = os.path.join(self.directorio, "ids.dat")
+        if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+            return [([], []) for _ in registros]
+        with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            resultado = []
+            for posicion, largo in zip(registros["ids_posicion"].tolist(), registros["ids_largo"].tolist()):
+                if not largo:
+                    resultado.append(([], []))
+                    continue
+                salones, laboratorios = mapa[posicion:posicion + largo].decode("utf-8").split("|")
+                resultado.append((salones.split(",") if salones else [], laboratorios.split(",") if laboratorios else []))
+        return resultado
+
+    def resumen(self, registros, por=("facultad", "semestre")):
+        """
+        Agrega registros por las columnas de cadena indicadas: solicitudes,
+        asignadas, rechazadas y salones/laboratorios asignados.
+        """
+        if not len(registros):
+            return []
+        claves = np.stack([registros[campo] for campo in por], axis=1)
+        grupos, inverso = np.unique(claves, axis=0, return_inverse=True)
+        inverso = inverso.reshape(-1)
+        es_asignacion = registros["tipo"] == TIPOS.index("asignacion")
+        asignado = es_asignacion & (registros["estado"] == ESTADOS.index("asignado"))
+        rechazado = es_asignacion & (registros["estado"] == ESTADOS.index("rechazado"))
+        contar = lambda valores: np.bincount(inverso, weights=valores, minlength=len(grupos)).astype(np.int64)
+        solicitudes = contar(registros["tipo"] == TIPOS.index("solicitud"))
+        asignadas, rechazadas = contar(asignado), contar(rechazado)
+        salones = contar(np.where(asignado, registros["salones_asignados"], 0))
+        laboratorios = contar(np.where(asignado, registros["laboratorios_asignados"], 0))
+        return [
+            dict({campo: self.cadenas[grupo[j]] for j, campo in enumerate(por)},
+                 solicitudes=int(solicitudes[i]), asignadas=int(asignadas[i]), rechazadas=int(rechazadas[i]),
+                 salones_asignados=int(salones[i]), laboratorios_asignados=int(laboratorios[i]))
+            for i, grupo in enumerate(grupos)
+        ]
+
+# --- IMPORTACIÓN DE LOS .txt ---
+
+def _nombre_y_semestre(ruta, prefijo):
+    # asignaciones_<facultad>_<semestre>.txt -> (facultad, semestre)
+    base = os.path.basename(ruta)[len(prefijo) + 1:-len(".txt")]
+    nombre, _, semestre = base.rpartition("_")
+    return nombre, semestre
+
+def importar(almacen, rutas):
+    """
+    Importa archivos asignaciones_<facultad>_<semestre>.txt (respuesta por
+    lote con su detalle "programas") y solicitudes_<programa>_<semestre>.txt
+    (una solicitud JSON por línea). Devuelve el número de registros importados.
+    """
+    importados = 0
+    for ruta in rutas:
+        base = os.path.basename(ruta)
+        with open(ruta, encoding="utf-8") as f:
+            lineas = [json.loads(linea) for linea in f if linea.strip()]
+        if base.startswith("asignaciones_"):
+            facultad, semestre = _nombre_y_semestre(ruta, "asignaciones")
+            for respuesta in lineas:
+                asignado = respuesta["estado"] == "asignado"
+                salones_ids = respuesta.get("salones_ids", [])
+                laboratorios_ids = respuesta.get("laboratorios_ids", [])
+                programas = respuesta.get("programas") or [{
+                    "programa": respuesta.get("programa", ""),
+                    "salones": respuesta.get("salones_asignados", 0),
+                    "laboratorios": respuesta.get("laboratorios_asignados", 0)
+                }]
+                # Mismo reparto de ids entre programas que hace la facultad
+                for prog in programas:
+                    mis_salones, salones_ids = salones_ids[:prog["salones"]], salones_ids[prog["salones"]:]
+                    mis_labs, laboratorios_ids = laboratorios_ids[:prog["laboratorios"]], laboratorios_ids[prog["laboratorios"]:]
+                    almacen.agregar("asignacion", respuesta["estado"], respuesta.get("facultad", facultad), semestre,
+                                    prog["programa"], prog["salones"], prog["laboratorios"],
+                                    prog["salones"] if asignado else 0, prog["laboratorios"] if asignado else 0,
+                                    mis_salones if asignado else (), mis_labs if asignado else (), instante=0.0)
+                    importados += 1
+        elif base.startswith("solicitudes_"):
+            programa, semestre = _nombre_y_semestre(ruta, "solicitudes")
+            for solicitud in lineas:
+                almacen.agregar("solicitud", "pendiente", solicitud.get("facultad", ""),
+                                solicitud.get("semestre", semestre), solicitud.get("programa", programa),
+                                solicitud.get("salones", 0), solicitud.get("laboratorios", 0), instante=0.0)
+                importados += 1
+        else:
+            print(f"⚠️  {ruta}: no es un archivo asignaciones_*.txt ni solicitudes_*.txt")
+    almacen.vaciar()
+    return importados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas sobre el almacén binario de asignaciones")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for comando in ("resumen", "listar"):
+        p = sub.add_parser(comando)
+        p.add_argument("directorio", nargs="?", default=DIRECTORIO_ALMACEN)
+        p.add_argument("--facultad")
+        p.add_argument("--semestre")
+        p.add_argument("--programa")
+        p.add_argument("--tipo", choices=TIPOS)
+    sub.choices["resumen"].add_argument("--por", default="facultad,semestre",
+                                        help="Columnas de agrupación (facultad, semestre, programa)")
+    p = sub.add_parser("importar")
+    p.add_argument("directorio")
+    p.add_argument("archivos", nargs="+", help="asignaciones_*.txt y/o solicitudes_*.txt")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        almacen = AlmacenAsignaciones(args.directorio)
+        print(f"{importar(almacen, args.archivos)} registros importados en {args.directorio}")
+        almacen.cerrar()
+        sys.exit(0)
+
+    lector = LectorAlmacen(args.directorio)
+    registros = lector.registros(args.facultad, args.semestre, args.programa, args.tipo)
+    if args.comando == "resumen":
+        for fila in lector.resumen(registros, tuple(args.por.split(","))):
+            print(json.dumps(fila, ensure_ascii=False))
+    else:
+        for registro, (salones_ids, laboratorios_ids) in zip(registros, lector.ids(registros)):
+            print(json.dumps({
+                "tipo": TIPOS[registro["tipo"]],
+                "estado": ESTADOS[registro["estado"]],
+                "facultad": lector.cadenas[registro["facultad"]],
+                "semestre": lector.cadenas[registro["semestre"]],
+                "programa": lector.cadenas[registro["programa"]],
+                "salones": int(registro["salones"]),
+                "laboratorios": int(registro["laboratorios"]),
+                "salones_ids": salones_ids,
+                "laboratorios_ids": laboratorios_ids,
+                "instante": float(registro["instante"])
+            }, ensure_ascii=False))
@@ -0,0 +1,293 @@
+# benchmark.py
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+
+import zmq
+
+import protocolo
+import trazas
+import servidor_central
+import servidor_respaldo
+import facultades as modulo_facultades
+from histograma import Histograma
+from admision import CRITERIOS, CRITERIO_FCFS
+
+# Transportes soportados por el banco de pruebas
+TRANSPORTES = ("inproc", "ipc", "tcp")
+PERFILES    = ("constante", "rafagas")
+
+def crear_endpoints(transporte, directorio, puerto_base):
+    """
+    Devuelve los endpoints de Central, Réplica y frontend de facultades para el
+    transporte pedido. Con inproc todo vive en el mismo proceso y contexto.
+    """
+    if transporte == "inproc":
+        return {
+            "central": "inproc://bench-central",
+            "respaldo": "inproc://bench-respaldo",
+            "facultades": "inproc://bench-facultades"
+        }
+    if transporte == "ipc":
+        return {
+            "central": f"ipc://{directorio}/central.ipc",
+            "respaldo": f"ipc://{directorio}/respaldo.ipc",
+            "facultades": f"ipc://{directorio}/facultades.ipc"
+        }
+    return {
+        "central": f"tcp://127.0.0.1:{puerto_base}",
+        "respaldo": f"tcp://127.0.0.1:{puerto_base + 1}",
+        "facultades": f"tcp://127.0.0.1:{puerto_base + 2}"
+    }
+
+def iniciar_hilo(objetivo, *args):
+    hilo = threading.Thread(target=objetivo, args=args)
+    hilo.daemon = True
+    hilo.start()
+    return hilo
+
+def iniciar_sistema(args, endpoints, directorio):
+    """
+    Levanta Réplica, Central y las N facultades en hilos de este proceso.
+    """
+    estado_respaldo = None if args.sin_persistencia else os.path.join(directorio, "estado_respaldo")
+    estado_central  = None if args.sin_persistencia else os.path.join(directorio, "estado_central")
+    endpoint_replica = None if args.sin_replica else endpoints["respaldo"]
+
+    if not args.sin_replica:
+        iniciar_hilo(servidor_respaldo.servidor_respaldo, endpoints["respaldo"], estado_respaldo)
+    iniciar_hilo(servidor_central.servidor_central, endpoints["central"], args.trabajadores,
+                 endpoint_replica, args.sincronizar_cada, estado_central, None,
+                 servidor_central.ARCHIVO_INVENTARIO, args.admision)
+    # Dar tiempo a que los servidores hagan bind antes de conectar las facultades
+    time.sleep(0.2)
+
+    nombres = [f"Facultad {i}" for i in range(args.facultades)]
+    iniciar_hilo(modulo_facultades.facultades, nombres, args.semestre, None, None,
+                 endpoints["facultades"], endpoints["central"])
+    time.sleep(0.2)
+    return nombres
+
+def instantes_envio(perfil, tasa, duracion, factor_rafaga, periodo_rafaga, fraccion_rafaga):
+    """
+    Genera los instantes (segundos desde el inicio) de cada envío. En el perfil
+    "rafagas" la tasa se multiplica por `factor_rafaga` durante la primera
+    `fraccion_rafaga` de cada periodo.
+    """
+    t = 0.0
+    while t < duracion:
+        yield t
+        tasa_actual = tasa
+        if perfil == "rafagas" and (t % periodo_rafaga) < periodo_rafaga * fraccion_rafaga:
+            tasa_actual = tasa * factor_rafaga
+        t += 1.0 / tasa_actual
+
+def ejecutar_carga(args, endpoints, nombres_facultades):
+    """
+    Genera carga en lazo abierto desde M programas (un DEALER cada uno) y mide
+    la latencia de extremo a extremo hasta el resultado real de la asignación.
+    """
+    context = zmq.Context.instance()
+    poller = zmq.Poller()
+    programas = []
+    for i in range(args.programas):
+        socket = context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(endpoints["facultades"])
+        poller.register(socket, zmq.POLLIN)
+        programas.append((f"Programa {i}", socket))
+
+    rng = random.Random(args.semilla)
+    latencias = Histograma()
+    en_curso = {}       # id_solicitud -> (instante de envío, traza)
+    conteos = {"enviadas": 0, "asignadas": 0, "rechazadas": 0, "otras": 0}
+
+    def recibir(socket):
+        while True:
+            try:
+                payload = socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            respuesta, _ = protocolo.decodificar(payload)
+            envio = en_curso.pop(respuesta.get("id_solicitud"), None)
+            if envio is None:
+                continue
+            enviado, traza = envio
+            ahora = time.time()
+            latencias.registrar(ahora - enviado)
+            trazas.registrar(traza, "programa.ida_vuelta", enviado, ahora)
+            if respuesta.get("estado") == "asignado":
+                conteos["asignadas"] += 1
+            elif respuesta.get("estado") == "rechazado":
+                conteos["rechazadas"] += 1
+            else:
+                conteos["otras"] += 1
+
+    instantes = instantes_envio(args.perfil, args.tasa, args.duracion,
+                                args.factor_rafaga, args.periodo_rafaga, args.fraccion_rafaga)
+    siguiente = next(instantes, None)
+    inicio = time.time()
+    limite = inicio + args.duracion + args.espera_final
+
+    while time.time() < limite and (siguiente is not None or en_curso):
+        ahora = time.time()
+        while siguiente is not None and inicio + siguiente <= ahora:
+            nombre, socket = programas[conteos["enviadas"] % len(programas)]
+            solicitud = {
+                "id_solicitud": uuid.uuid4().hex,
+                "facultad": nombres_facultades[conteos["enviadas"] % len(nombres_facultades)],
+                "programa": nombre,
+                "semestre": args.semestre,
+                "salones": rng.randint(0, args.max_salones),
+                "laboratorios": rng.randint(0, args.max_laboratorios),
+                "esperar_resultado": True
+            }
+            traza = trazas.muestrear()
+            if traza is not None:
+                solicitud[trazas.CAMPO_TRAZA] = traza
+            en_curso[solicitud["id_solicitud"]] = (time.time(), traza)
+            socket.send(protocolo.codificar(solicitud, protocolo.SOLICITUD, args.codec))
+            conteos["enviadas"] += 1
+            siguiente = next(instantes, None)
+
+        if siguiente is not None:
+            timeout = max(0, (inicio + siguiente - time.time()) * 1000)
+        else:
+            timeout = 50
+        for socket, _ in poller.poll(timeout):
+            recibir(socket)
+
+    duracion_real = time.time() - inicio
+    respondidas = conteos["asignadas"] + conteos["rechazadas"] + conteos["otras"]
+    for _, socket in programas:
+        socket.close()
+    return {
+        "enviadas": conteos["enviadas"],
+        "respondidas": respondidas,
+        "asignadas": conteos["asignadas"],
+        "rechazadas": conteos["rechazadas"],
+        "perdidas": len(en_curso),
+        "tasa_rechazo": conteos["rechazadas"] / respondidas if respondidas else 0,
+        "throughput": respondidas / duracion_real if duracion_real else 0,
+        "duracion_real": duracion_real,
+        "latencia": latencias.resumen()
+    }
+
+def consultar_metricas(endpoint, timeout_ms=1000):
+    """
+    Pide al servidor su instantánea de métricas por el socket ROUTER.
+    """
+    socket = zmq.Context.instance().socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    socket.send(b"metricas")
+    try:
+        if socket.poll(timeout_ms):
+            return json.loads(socket.recv().decode("utf-8"))
+        return None
+    finally:
+        socket.close()
+
+def comparar(resultados, base, tolerancia):
+    """
+    Compara contra una corrida anterior y devuelve la lista de regresiones que
+    superan la tolerancia relativa (menos throughput o más latencia p99).
+    """
+    regresiones = []
+    if base["throughput"] and resultados["throughput"] < base["throughput"] * (1 - tolerancia):
+        regresiones.append(f"throughput {resultados['throughput']:.1f} < {base['throughput']:.1f}")
+    p99_base, p99 = base["latencia"]["p99"], resultados["latencia"]["p99"]
+    if p99_base and p99 > p99_base * (1 + tolerancia):
+        regresiones.append(f"latencia p99 {p99:.6f}s > {p99_base:.6f}s")
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Banco de pruebas en un solo proceso: Central, Réplica, N facultades y M programas.")
+    parser.add_argument("--transporte", choices=TRANSPORTES, default="inproc")
+    parser.add_argument("--puerto-base", type=int, default=45389, help="Primer puerto con --transporte tcp")
+    parser.add_argument("--facultades", type=int, default=10)
+    parser.add_argument("--programas", type=int, default=100)
+    parser.add_argument("--trabajadores", type=int, default=1, help="Hilos del Central (modo broker si > 1)")
+    parser.add_argument("--tasa", type=float, default=500.0, help="Solicitudes por segundo")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos de generación de carga")
+    parser.add_argument("--perfil", choices=PERFILES, default="constante")
+    parser.add_argument("--factor-rafaga", type=float, default=5.0)
+    parser.add_argument("--periodo-rafaga", type=float, default=2.0)
+    parser.add_argument("--fraccion-rafaga", type=float, default=0.2)
+    parser.add_argument("--max-salones", type=int, default=3)
+    parser.add_argument("--max-laboratorios", type=int, default=1)
+    parser.add_argument("--lote-max-espera", type=float, default=modulo_facultades.LOTE_MAX_ESPERA,
+                        help="Espera máxima de consolidación en las facultades (s)")
+    parser.add_argument("--semestre", default="2025-10")
+    parser.add_argument("--codec", choices=(protocolo.CODEC_JSON, protocolo.CODEC_BINARIO),
+                        default=protocolo.CODEC_BINARIO)
+    parser.add_argument("--admision", choices=CRITERIOS, default=CRITERIO_FCFS,
+                        help="Criterio de admisión del Central (ventanas en vez de FCFS)")
+    parser.add_argument("--trazas", type=float, default=0.0,
+                        help="Fracción de solicitudes trazadas (tramos en <directorio>/trazas_benchmark.tsv)")
+    parser.add_argument("--sincronizar-cada", type=int, default=servidor_central.REPLICACION_SINCRONIZAR_CADA)
+    parser.add_argument("--sin-replica", action="store_true")
+    parser.add_argument("--sin-persistencia", action="store_true")
+    parser.add_argument("--espera-final", type=float, default=5.0,
+                        help="Segundos para recibir respuestas tras la generación")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Resultados JSON de una corrida base")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    parser.add_argument("--verboso", action="store_true", help="No silenciar los print de los componentes")
+    args = parser.parse_args(argv)
+
+    modulo_facultades.LOTE_MAX_ESPERA = args.lote_max_espera
+
+    directorio = tempfile.mkdtemp(prefix="bench_aulas_")
+    endpoints = crear_endpoints(args.transporte, directorio, args.puerto_base)
+    # Todos los componentes comparten el proceso y, por tanto, el archivo de tramos
+    trazas.configurar("benchmark", args.trazas, os.path.join(directorio, "trazas_benchmark.tsv"))
+
+    # Los archivos .txt de las facultades quedan en el directorio temporal
+    cwd = os.getcwd()
+    os.chdir(directorio)
+    silencio = open(os.devnull, "w")
+    try:
+        with contextlib.redirect_stdout(sys.stdout if args.verboso else silencio):
+            nombres = iniciar_sistema(args, endpoints, directorio)
+            resultados = ejecutar_carga(args, endpoints, nombres)
+            servidor = consultar_metricas(endpoints["central"])
+    finally:
+        os.chdir(cwd)
+
+    resultados = {
+        "config": vars(args),
+        "resultados": resultados,
+        "servidor": servidor,
+        "directorio": directorio
+    }
+    texto = json.dumps(resultados, indent=2)
+    if args.salida:
+        with open(args.salida, "w") as f:
+            f.write(texto + "\n")
+    print(texto)
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            base = json.load(f)
+        regresiones = comparar(resultados["resultados"], base["resultados"], args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN: {regresion}", file=sys.stderr)
+        return 1 if regresiones else 0
+    return 0
+
+if __name__ == "__main__":
+    # Los hilos de los componentes son demonio; os._exit evita esperar sus sockets
+    codigo = main()
+    sys.stdout.flush()
+    os._exit(codigo)
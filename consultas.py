@@ -0,0 +1,134 @@
+# consultas.py
+
+import json
+
+import zmq
+
+from inventario import clave_pool, SALON, LABORATORIO
+
+# Una consulta llega como [..., MARCA_CONSULTA, <JSON>] al ROUTER del Central o
+# de la Réplica y se responde con un único frame JSON
+MARCA_CONSULTA = b"consulta"
+
+# Tipos de consulta de solo lectura
+DISPONIBILIDAD = "disponibilidad"
+ASIGNACIONES   = "asignaciones"
+METRICAS       = "metricas"
+TIPOS_CONSULTA = (DISPONIBILIDAD, ASIGNACIONES, METRICAS)
+
+CONSULTA_TIMEOUT = 2.0   # segundos que el cliente espera la respuesta
+
+def es_consulta(frames):
+    return len(frames) >= 2 and frames[-2] == MARCA_CONSULTA
+
+def disponibilidad(pools, consulta):
+    """
+    Aulas libres de los pools ya creados, opcionalmente solo los de un
+    "semestre" y/o "campus". Una consulta nunca crea pools: un semestre que
+    aún no recibió solicitudes no aparece. "franja", "capacidad_minima" y
+    "edificio" filtran igual que en una solicitud.
+    """
+    lista = pools.existentes(consulta.get("semestre"), consulta.get("campus"))
+
+    franja           = consulta.get("franja")
+    capacidad_minima = consulta.get("capacidad_minima", 0)
+    edificio         = consulta.get("edificio")
+    resultado = {}
+    for pool in lista:
+        if not pool.inventario.validar_franja(franja):
+            raise ValueError(f"Franja fuera de rango: {franja!r}")
+        with pool.lock:
+            resultado[clave_pool(pool.semestre, pool.campus)] = {
+                "salones_disponibles": pool.inventario.disponibles(SALON, capacidad_minima, edificio, franja),
+                "laboratorios_disponibles": pool.inventario.disponibles(LABORATORIO, capacidad_minima,
+                                                                        edificio, franja)
+            }
+    return resultado
+
+def asignaciones(pools, consulta):
+    """
+    Asignaciones vigentes de consulta["facultad"] por pool, opcionalmente
+    solo las de un "semestre" y/o "campus".
+    """
+    facultad = consulta["facultad"]
+    resultado = {}
+    for pool in pools.existentes(consulta.get("semestre"), consulta.get("campus")):
+        with pool.lock:
+            lista = pool.listar(facultad)
+        if lista:
+            resultado[clave_pool(pool.semestre, pool.campus)] = lista
+    return resultado
+
+def atender_consulta(frames, pools, etiqueta, obtener_metricas):
+    """
+    Resuelve una consulta recibida por un ROUTER y devuelve los frames de la
+    respuesta. No toca el WAL, la replicación ni el lock global de Recursos:
+    solo los locks de los pools consultados, el tiempo de leerlos.
+
+    Args:
+        frames (list): Mensaje multipart recibido ([..., MARCA_CONSULTA, JSON]).
+        pools (PoolsAulas): Pools del servidor que responde.
+        etiqueta (dict): Rol y secuencia del servidor al empezar la consulta
+            (e.g., {"rol": "respaldo", "secuencia": 120, "retraso": 3}).
+        obtener_metricas (callable): Devuelve las métricas del servidor.
+    """
+    try:
+        consulta = json.loads(frames[-1])
+        tipo = consulta.get("tipo")
+        respuesta = dict(etiqueta, tipo=tipo)
+        if tipo == DISPONIBILIDAD:
+            respuesta["disponibilidad"] = disponibilidad(pools, consulta)
+        elif tipo == ASIGNACIONES:
+            respuesta["asignaciones"] = asignaciones(pools, consulta)
+        elif tipo == METRICAS:
+            respuesta["metricas"] = obtener_metricas()
+        else:
+            raise ValueError(f"Tipo de consulta desconocido: {tipo!r}")
+    except KeyError as error:
+        respuesta = {"error": f"Falta el campo {error}"}
+    except (ValueError, AttributeError) as error:
+        respuesta = {"error": str(error)}
+    return frames[:-2] + [json.dumps(respuesta).encode("utf-8")]
+
+def consultar(endpoint, consulta, timeout=CONSULTA_TIMEOUT, context=None):
+    """
+    Envía una consulta a un servidor y devuelve la respuesta decodificada.
+
+    Args:
+        endpoint (str): Endpoint del Central o de la Réplica (e.g., "tcp://192.168.1.101:3390").
+        consulta (dict): Consulta con su "tipo" (e.g., {"tipo": "disponibilidad", "semestre": "2025-10"}).
+        timeout (float): Segundos de espera antes de lanzar TimeoutError.
+    """
+    context = context or zmq.Context.instance()
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(endpoint)
+    try:
+        socket.send_multipart([MARCA_CONSULTA, json.dumps(consulta).encode("utf-8")])
+        if not socket.poll(timeout * 1000):
+            raise TimeoutError(f"Sin respuesta de {endpoint} en {timeout} s")
+        return json.loads(socket.recv())
+    finally:
+        socket.close()
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 4 or sys.argv[3] not in TIPOS_CONSULTA:
+        print("Uso: python3 consultas.py <ip> <puerto> disponibilidad [semestre] [campus] [franja]\n"
+              "     python3 consultas.py <ip> <puerto> asignaciones <facultad> [semestre]\n"
+              "     python3 consultas.py <ip> <puerto> metricas")
+        sys.exit(1)
+    ip, puerto, tipo = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+    argumentos = sys.argv[4:]
+    consulta = {"tipo": tipo}
+    if tipo == DISPONIBILIDAD:
+        for campo, valor in zip(("semestre", "campus", "franja"), argumentos):
+            consulta[campo] = int(valor) if campo == "franja" else valor
+    elif tipo == ASIGNACIONES:
+        if not argumentos:
+            print("Falta la facultad")
+            sys.exit(1)
+        consulta["facultad"] = argumentos[0]
+        if len(argumentos) > 1:
+            consulta["semestre"] = argumentos[1]
+    print(json.dumps(consultar(f"tcp://{ip}:{puerto}", consulta), indent=2, ensure_ascii=False))
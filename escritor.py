@@ -0,0 +1,150 @@
+# escritor.py
+
+import os
+import atexit
+import threading
+import time
+
+# Políticas de fsync del escritor
+FSYNC_NUNCA     = "nunca"      # solo flush al sistema operativo
+FSYNC_AL_VACIAR = "al_vaciar"  # fsync después de cada vaciado
+FSYNC_AL_CERRAR = "al_cerrar"  # fsync únicamente al cerrar
+
+# Criterios de vaciado por defecto (se vacía al cumplirse el primero)
+MAX_LINEAS = 512     # líneas acumuladas entre todos los archivos
+MAX_ESPERA = 0.5     # segundos desde la primera línea pendiente
+
+class EscritorArchivos:
+    """
+    Escritor en segundo plano para los archivos de registro (.txt) de
+    facultades y programas.
+
+    Mantiene abiertos los archivos en modo anexar, acumula las líneas en una
+    cola en memoria y un hilo de fondo las escribe con un `writelines` por
+    archivo cuando se juntan MAX_LINEAS o pasan MAX_ESPERA segundos. Así el
+    camino caliente no paga open/close por cada línea.
+
+    Args:
+        max_lineas (int): Líneas pendientes que disparan un vaciado.
+        max_espera (float): Segundos máximos que una línea espera en memoria.
+        fsync (str): Política de fsync (FSYNC_NUNCA, FSYNC_AL_VACIAR o FSYNC_AL_CERRAR).
+    """
+    def __init__(self, max_lineas=MAX_LINEAS, max_espera=MAX_ESPERA, fsync=FSYNC_NUNCA):
+        self.max_lineas = max_lineas
+        self.max_espera = max_espera
+        self.fsync      = fsync
+
+        self.pendientes = {}      # ruta -> lista de líneas
+        self.num_lineas = 0
+        self.primera    = None    # instante de la línea pendiente más antigua
+        self.archivos   = {}      # ruta -> archivo abierto (solo lo usa quien vacía)
+        self.cerrado    = False
+        self.cond       = threading.Condition()
+        self.lock_disco = threading.Lock()
+
+        hilo = threading.Thread(target=self._bucle)
+        hilo.daemon = True
+        hilo.start()
+
+    def escribir(self, ruta, linea):
+        """
+        Encola una línea (debe incluir el salto de línea) para anexarla a `ruta`.
+        """
+        self.escribir_varias(ruta, [linea])
+
+    def escribir_varias(self, ruta, lineas):
+        """
+        Encola varias líneas para el mismo archivo de una sola vez.
+        """
+        if not lineas:
+            return
+        with self.cond:
+            if self.cerrado:
+                raise ValueError("El escritor ya fue cerrado")
+            self.pendientes.setdefault(ruta, []).extend(lineas)
+            if self.primera is None:
+                self.primera = time.time()
+            self.num_lineas += len(lineas)
+            if self.num_lineas >= self.max_lineas:
+                self.cond.notify()
+
+    def vaciar(self):
+        """
+        Escribe de inmediato todo lo pendiente (bloquea hasta terminar).
+        """
+        self._vaciar(self.fsync == FSYNC_AL_VACIAR)
+
+    def cerrar(self):
+        """
+        Vacía lo pendiente, aplica fsync si la política lo pide y cierra los archivos.
+        """
+        with self.lock_disco:
+            with self.cond:
+                if self.cerrado:
+                    return
+                self.cerrado = True
+                lote = self._tomar_pendientes()
+                self.cond.notify()
+            self._escribir(lote, self.fsync in (FSYNC_AL_VACIAR, FSYNC_AL_CERRAR))
+            for archivo in self.archivos.values():
+                archivo.close()
+            self.archivos.clear()
+
+    def _tomar_pendientes(self):
+        # Requiere self.cond tomado
+        lote, self.pendientes = self.pendientes, {}
+        self.num_lineas = 0
+        self.primera = None
+        return lote
+
+    def _vaciar(self, sincronizar):
+        # El lote se toma y se escribe con lock_disco tomado (orden: lock_disco ->
+        # cond): si se soltara entre ambos pasos, un lote tomado después podría
+        # llegar antes al disco y las líneas de un archivo quedarían desordenadas
+        with self.lock_disco:
+            with self.cond:
+                lote = self._tomar_pendientes()
+            self._escribir(lote, sincronizar)
+
+    def _escribir(self, lote, sincronizar):
+        # Requiere self.lock_disco tomado
+        for ruta, lineas in lote.items():
+            archivo = self.archivos.get(ruta)
+            if archivo is None:
+                archivo = self.archivos[ruta] = open(ruta, "a")
+            archivo.writelines(lineas)
+            archivo.flush()
+            if sincronizar:
+                os.fsync(archivo.fileno())
+
+    def _bucle(self):
+        while True:
+            with self.cond:
+                while not self.cerrado:
+                    if self.num_lineas >= self.max_lineas:
+                        break
+                    if self.primera is None:
+                        self.cond.wait()
+                        continue
+                    restante = self.primera + self.max_espera - time.time()
+                    if restante <= 0:
+                        break
+                    self.cond.wait(restante)
+                if self.cerrado:
+                    return
+            self._vaciar(self.fsync == FSYNC_AL_VACIAR)
+
+_compartido = None
+_lock_compartido = threading.Lock()
+
+def escritor_compartido():
+    """
+    Devuelve el escritor del proceso, creándolo la primera vez. Se vacía y
+    cierra automáticamente al terminar el intérprete.
+    """
+    global _compartido
+    with _lock_compartido:
+        if _compartido is None:
+            _compartido = EscritorArchivos()
+            atexit.register(_compartido.cerrar)
+        return _compartido
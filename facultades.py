@@ -1,127 +1,546 @@
 # Andres Manosalva
 import zmq
-import threading
 import json
 import time
-import os
+import uuid
+from collections import OrderedDict
 
-def manejar_programas(socket_programas, solicitudes_programas, tiempos_inicio):
+from escritor import escritor_compartido
+import protocolo
+import trazas
+from idempotencia import EN_CURSO
+from almacen import AlmacenAsignaciones, DIRECTORIO_ALMACEN
+from latidos import MonitorLatidos, DESFASE_LATIDOS, INTERVALO_LATIDO
+from fragmentos import MapaCacheado, REVISAR_MAPA_CADA
+
+# Puerto donde las facultades atienden a los programas académicos
+PUERTO_PROGRAMAS = 3391
+
+# Servidor Réplica al que se conmuta cuando el Central deja de publicar latidos
+IP_RESPALDO     = "192.168.1.101"
+PUERTO_RESPALDO = 3390
+
+# Criterios de envío del lote consolidado (se envía al cumplirse el primero)
+LOTE_MAX_SOLICITUDES   = 50     # número de solicitudes de programas acumuladas
+LOTE_MAX_ESPERA        = 0.5    # segundos desde la primera solicitud del lote
+LOTE_MAX_SALONES       = 100    # salones acumulados
+LOTE_MAX_LABORATORIOS  = 20     # laboratorios acumulados
+# Lotes consolidados que pueden esperar respuesta del servidor al mismo tiempo
+LOTES_EN_VUELO         = 4
+# Segundos sin respuesta tras los que se reenvía un lote al servidor activo
+# (es seguro: el servidor reconoce el id_solicitud y no asigna dos veces)
+REENVIO_TIMEOUT        = 2.0
+# Resultados por id_solicitud de programa que se recuerdan para responder reintentos
+RESULTADOS_RECORDADOS  = 10000
+# Restricciones de aula que comparten todas las solicitudes de un mismo lote
+RESTRICCIONES          = ("franja", "capacidad_minima", "edificio", "campus")
+
+def restricciones(mensaje):
+    """
+    Clave de restricciones de una solicitud; solo se consolidan juntas las
+    solicitudes con la misma clave.
+    """
+    return tuple(mensaje.get(campo) for campo in RESTRICCIONES)
+
+class Facultad:
+    """
+    Estado de una facultad dentro del proceso: su socket DEALER hacia el
+    servidor, las solicitudes pendientes de consolidar y los lotes en vuelo.
+    Varias instancias pueden compartir el mismo frontend ROUTER de programas
+    y el mismo almacén binario de solicitudes y asignaciones (`almacen`).
     """
-    Maneja las solicitudes de los programas académicos de forma síncrona usando el patrón request-reply.
-    
+    def __init__(self, context, nombre_facultad, semestre, endpoint_servidor, almacen=None):
+        self.nombre      = nombre_facultad
+        self.semestre    = semestre
+        self.escritor    = escritor_compartido()
+        self.almacen     = almacen
+
+        # Configurar socket DEALER para comunicarse con el servidor central (request-reply asíncrono)
+        self.socket_servidor = context.socket(zmq.DEALER)
+        self.socket_servidor.setsockopt_string(zmq.IDENTITY, nombre_facultad)  # Identidad única para la facultad
+
+        # Conectar al servidor activo (central o réplica)
+        self.endpoint_servidor = endpoint_servidor
+        self.socket_servidor.connect(endpoint_servidor)
+        # Codec hacia el servidor: JSON hasta que el servidor demuestre entender binario
+        self.negociacion = protocolo.Negociacion()
+
+        # Solicitudes de programas aún no enviadas: (solicitud, tiempo_inicio, remitente)
+        self.pendientes = []
+        # Lotes enviados esperando respuesta: id_solicitud -> (solicitud, pendientes del lote, instante de envío)
+        self.en_vuelo = {}
+        # Ids de solicitudes de programas pendientes o en vuelo, y resultados ya
+        # entregados (LRU acotada), para que un reintento no se asigne dos veces
+        self.ids_en_curso = set()
+        self.resultados   = OrderedDict()
+
+    def duplicado(self, mensaje):
+        """
+        Indica si la solicitud de un programa es un reintento. Devuelve
+        (True, resultado) si ya se entregó, (True, None) si sigue en curso (el
+        resultado irá al mismo sobre) o (False, None) si es nueva.
+        """
+        id_solicitud = mensaje.get("id_solicitud")
+        if id_solicitud is None:
+            return False, None
+        if id_solicitud in self.ids_en_curso:
+            return True, None
+        resultado = self.resultados.get(id_solicitud)
+        if resultado is not None:
+            self.resultados.move_to_end(id_solicitud)
+            return True, resultado
+        return False, None
+
+    def agregar(self, mensaje, tiempo_inicio, remitente):
+        """
+        Acumula la solicitud de un programa. `remitente` es (sobre ROUTER, codec)
+        al que se enviará el resultado real, o None si ya se le confirmó la recepción.
+        """
+        self.pendientes.append((mensaje, tiempo_inicio, remitente))
+        if "id_solicitud" in mensaje:
+            self.ids_en_curso.add(mensaje["id_solicitud"])
+        if self.almacen is not None:
+            self.almacen.agregar("solicitud", "pendiente", self.nombre, self.semestre_de(mensaje),
+                                 mensaje["programa"], mensaje["salones"], mensaje["laboratorios"],
+                                 instante=tiempo_inicio)
+
+    def semestre_de(self, mensaje):
+        # Semestre del programa (p. ej. una fila del catálogo); sin él, el de la facultad
+        return mensaje.get("semestre") or self.semestre
+
+    def _corte(self):
+        # Cantidad de pendientes iniciales que comparten semestre y restricciones con la primera
+        primera = self.pendientes[0][0]
+        clave = (self.semestre_de(primera), restricciones(primera))
+        for i, (prog, _, _) in enumerate(self.pendientes):
+            if (self.semestre_de(prog), restricciones(prog)) != clave:
+                return i
+        return len(self.pendientes)
+
+    def lote_listo(self, ahora):
+        """
+        Indica si el lote pendiente debe enviarse: por número de solicitudes, por
+        tiempo de espera de la más antigua, por salones/laboratorios acumulados
+        o porque llegó una solicitud de otro semestre o con otras restricciones de aula.
+        """
+        if not self.pendientes or len(self.en_vuelo) >= LOTES_EN_VUELO:
+            return False
+        if len(self.pendientes) >= LOTE_MAX_SOLICITUDES:
+            return True
+        if self._corte() < len(self.pendientes):
+            return True
+        if ahora - self.pendientes[0][1] >= LOTE_MAX_ESPERA:
+            return True
+        salones = sum(prog["salones"] for prog, _, _ in self.pendientes)
+        laboratorios = sum(prog["laboratorios"] for prog, _, _ in self.pendientes)
+        return salones >= LOTE_MAX_SALONES or laboratorios >= LOTE_MAX_LABORATORIOS
+
+    def espera_maxima(self, ahora):
+        """
+        Segundos hasta que venza el lote actual o el reenvío de un lote en vuelo,
+        o None si no hay nada que esperar.
+        """
+        esperas = [enviado + REENVIO_TIMEOUT - ahora for _, _, enviado in self.en_vuelo.values()]
+        if self.pendientes and len(self.en_vuelo) < LOTES_EN_VUELO:
+            esperas.append(self.pendientes[0][1] + LOTE_MAX_ESPERA - ahora)
+        return max(0, min(esperas)) if esperas else None
+
+    def consolidar(self, pendientes):
+        """
+        Crea la solicitud consolidada con los totales, el detalle por programa y
+        el semestre y las restricciones de aula comunes del lote (cada pool de
+        semestre se pide por separado, ver `_corte`).
+        """
+        programas = [
+            {
+                "programa": prog["programa"],
+                "salones": prog["salones"],
+                "laboratorios": prog["laboratorios"]
+            }
+            for prog, _, _ in pendientes
+        ]
+        solicitud = {
+            "id_solicitud": uuid.uuid4().hex,  # Para emparejar la respuesta con el lote
+            "semestre": self.semestre_de(pendientes[0][0]),
+            "facultad": self.nombre,
+            "programa": programas[0]["programa"],  # Programa principal (compatibilidad)
+            "programas": programas,
+            "salones": sum(p["salones"] for p in programas),
+            "laboratorios": sum(p["laboratorios"] for p in programas)
+        }
+        for campo, valor in zip(RESTRICCIONES, restricciones(pendientes[0][0])):
+            if valor is not None:
+                solicitud[campo] = valor
+        # El lote sigue la traza del primer programa trazado, o se muestrea aquí
+        traza = next((prog[trazas.CAMPO_TRAZA] for prog, _, _ in pendientes if trazas.CAMPO_TRAZA in prog),
+                     None) or trazas.muestrear()
+        if traza is not None:
+            solicitud[trazas.CAMPO_TRAZA] = traza
+        return solicitud
+
+    def cambiar_servidor(self, endpoint_servidor):
+        """
+        Conmuta al nuevo servidor activo y le reenvía los lotes que seguían sin
+        respuesta. Conservan su id_solicitud, así que si el servidor anterior ya
+        los había replicado la Réplica devuelve la misma asignación.
+        """
+        # Desconectar del servidor anterior y conectar al nuevo
+        self.socket_servidor.disconnect(self.endpoint_servidor)
+        self.endpoint_servidor = endpoint_servidor
+        self.socket_servidor.connect(endpoint_servidor)
+        self.negociacion.reiniciar()
+        print(f"Facultad {self.nombre} cambió al servidor {endpoint_servidor}")
+
+        self.reenviar(list(self.en_vuelo))
+
+    def reenviar(self, ids):
+        """
+        Reenvía lotes en vuelo con su id_solicitud original.
+        """
+        ahora = time.time()
+        for id_solicitud in ids:
+            solicitud, lote, _ = self.en_vuelo[id_solicitud]
+            self.en_vuelo[id_solicitud] = (solicitud, lote, ahora)
+            self.socket_servidor.send(self.negociacion.codificar(solicitud, protocolo.SOLICITUD))
+            print(f"Facultad {self.nombre} reenvió solicitud {id_solicitud}")
+
+    def reenviar_vencidos(self, ahora):
+        """
+        Reenvía los lotes que llevan más de REENVIO_TIMEOUT sin respuesta.
+        """
+        vencidos = [id_solicitud for id_solicitud, (_, _, enviado) in self.en_vuelo.items()
+                    if ahora - enviado >= REENVIO_TIMEOUT]
+        if vencidos:
+            self.reenviar(vencidos)
+
+    def enviar_lote(self):
+        """
+        Envía el lote consolidado al servidor sin esperar la respuesta.
+        """
+        corte = self._corte()
+        lote, self.pendientes = self.pendientes[:corte], self.pendientes[corte:]
+        solicitud = self.consolidar(lote)
+        ahora = time.time()
+        self.en_vuelo[solicitud["id_solicitud"]] = (solicitud, lote, ahora)
+        for prog, tiempo_inicio, _ in lote:
+            trazas.registrar(prog.get(trazas.CAMPO_TRAZA), "facultad.consolidacion", tiempo_inicio, ahora)
+
+        with trazas.tramo("facultad.envio", solicitud.get(trazas.CAMPO_TRAZA)):
+            self.socket_servidor.send(self.negociacion.codificar(solicitud, protocolo.SOLICITUD))
+            print(f"Facultad {self.nombre} envió solicitud: {solicitud}")
+
+    def recibir_respuestas(self, socket_programas):
+        """
+        Procesa todas las respuestas disponibles del servidor y reenvía el
+        resultado a los programas que lo esperan.
+        """
+        while True:
+            try:
+                payload = self.socket_servidor.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            try:
+                respuesta = self.negociacion.decodificar(payload)
+            except protocolo.ErrorProtocolo as e:
+                print(f"Facultad {self.nombre} descartó una respuesta ilegible: {e}")
+                continue
+            if protocolo.CAMPO_ERROR in respuesta:
+                # La negociación ya volvió a JSON; los lotes se reenvían al vencer REENVIO_TIMEOUT
+                print(f"Facultad {self.nombre}: el servidor no pudo leer un envío ({respuesta[protocolo.CAMPO_ERROR]})")
+                continue
+            if respuesta.get("estado") == EN_CURSO and respuesta.get("id_solicitud") in self.en_vuelo:
+                # El servidor aún atiende el envío anterior: se reenvía tras REENVIO_TIMEOUT
+                solicitud, programas, _ = self.en_vuelo[respuesta["id_solicitud"]]
+                self.en_vuelo[respuesta["id_solicitud"]] = (solicitud, programas, time.time())
+                print(f"Facultad {self.nombre}: el servidor sigue atendiendo {respuesta['id_solicitud']}")
+                continue
+            lote = self.en_vuelo.pop(respuesta.get("id_solicitud"), None)
+            if lote is None:
+                print(f"Facultad {self.nombre} recibió respuesta sin lote asociado: {respuesta}")
+                continue
+            solicitud, programas, enviado = lote
+            recibido = time.time()
+            trazas_lote = {traza for traza in [solicitud.get(trazas.CAMPO_TRAZA)] +
+                           [prog.get(trazas.CAMPO_TRAZA) for prog, _, _ in programas] if traza is not None}
+            for traza in trazas_lote:
+                trazas.registrar(traza, "facultad.servidor", enviado, recibido)
+            self._entregar(socket_programas, respuesta, solicitud, programas)
+            for traza in trazas_lote:
+                trazas.registrar(traza, "facultad.entrega", recibido, time.time())
+
+    def _entregar(self, socket_programas, respuesta, solicitud, programas):
+        """
+        Registra la respuesta de un lote y reparte el resultado entre sus programas.
+        """
+        print(f"Facultad {self.nombre} recibió respuesta: {respuesta}")
+        # Todo el lote es de un mismo semestre (ver `_corte`), no siempre el de la facultad
+        semestre = solicitud["semestre"]
+
+        # Registrar el tiempo total de procesamiento (desde la solicitud hasta la respuesta)
+        tiempo_fin = time.time()
+        self.escritor.escribir_varias(
+            f"metricas_{self.nombre}_{semestre}.txt",
+            [f"Tiempo total: {tiempo_fin - tiempo_inicio}\n" for _, tiempo_inicio, _ in programas]
+        )
+
+        # Guardar la asignación recibida (con el detalle por programa) para persistencia
+        self.escritor.escribir(
+            f"asignaciones_{self.nombre}_{semestre}.txt",
+            f"{json.dumps(dict(respuesta, programas=solicitud['programas']))}\n"
+        )
+
+        # El lote se asigna completo o se rechaza completo; las aulas concretas
+        # se reparten entre los programas en el orden del lote
+        asignado = respuesta["estado"] == "asignado"
+        salones_ids = respuesta.get("salones_ids", [])
+        laboratorios_ids = respuesta.get("laboratorios_ids", [])
+        for prog, _, remitente in programas:
+            mis_salones, salones_ids = salones_ids[:prog["salones"]], salones_ids[prog["salones"]:]
+            mis_labs, laboratorios_ids = laboratorios_ids[:prog["laboratorios"]], laboratorios_ids[prog["laboratorios"]:]
+            if self.almacen is not None:
+                self.almacen.agregar("asignacion", respuesta["estado"], self.nombre, semestre,
+                                     prog["programa"], prog["salones"], prog["laboratorios"],
+                                     prog["salones"] if asignado else 0, prog["laboratorios"] if asignado else 0,
+                                     mis_salones if asignado else (), mis_labs if asignado else ())
+            if remitente is None and "id_solicitud" not in prog:
+                continue
+            resultado = {
+                "facultad": self.nombre,
+                "programa": prog["programa"],
+                "salones_asignados": prog["salones"] if asignado else 0,
+                "laboratorios_asignados": prog["laboratorios"] if asignado else 0,
+                "estado": respuesta["estado"]
+            }
+            if asignado and (mis_salones or mis_labs):
+                resultado["salones_ids"] = mis_salones
+                resultado["laboratorios_ids"] = mis_labs
+            # Devolver el id del programa para que empareje sus solicitudes en curso
+            if "id_solicitud" in prog:
+                resultado["id_solicitud"] = prog["id_solicitud"]
+                self.recordar(resultado)
+            if remitente is None:
+                continue
+            envoltura, codec = remitente
+            socket_programas.send_multipart(envoltura + [protocolo.codificar(resultado, protocolo.ASIGNACION, codec)])
+
+    def recordar(self, resultado):
+        """
+        Guarda el resultado entregado a un programa para responder sus reintentos.
+        """
+        self.ids_en_curso.discard(resultado["id_solicitud"])
+        self.resultados[resultado["id_solicitud"]] = resultado
+        if len(self.resultados) > RESULTADOS_RECORDADOS:
+            self.resultados.popitem(last=False)
+
+def recibir_programa(socket_programas, facultades_locales, despacho):
+    """
+    Atiende un mensaje de un programa académico en el frontend ROUTER.
+
+    El mensaje puede venir en JSON o binario (ver protocolo); la respuesta va
+    en el mismo codec. La facultad destino se toma del campo "facultad" del mensaje; si no viene,
+    de la tabla de despacho por identidad (última facultad usada por ese
+    programa) y, si el proceso tiene una sola facultad, de esa. Si el mensaje
+    trae "esperar_resultado": true, la respuesta se difiere hasta conocer el
+    resultado real de la asignación; si no, se confirma la recepción al momento.
+
     Args:
-        socket_programas (zmq.Socket): Socket REP para comunicarse con los programas académicos.
-        solicitudes_programas (list): Lista para almacenar las solicitudes recibidas de los programas.
-        tiempos_inicio (list): Lista para almacenar los tiempos de inicio de las solicitudes.
+        socket_programas (zmq.Socket): Socket ROUTER para comunicarse con los programas académicos.
+        facultades_locales (dict): Nombre de facultad -> Facultad atendidas por este proceso.
+        despacho (dict): Identidad del programa -> nombre de la facultad asignada.
     """
-    while True:
-        # Recibir solicitud de un programa académico en formato JSON
-        mensaje = socket_programas.recv_json()
-        # Registrar el tiempo de inicio para medir el tiempo total de procesamiento
-        tiempo_inicio = time.time()
-        print(f"Facultad recibió solicitud de programa: {mensaje}")
-        # Almacenar la solicitud y el tiempo de inicio
-        solicitudes_programas.append(mensaje)
-        tiempos_inicio.append(tiempo_inicio)
+    # Recibir [identidad, (vacío), payload]; el sobre se conserva para responder
+    frames = socket_programas.recv_multipart()
+    remitente = frames[:-1]
+    # Registrar el tiempo de inicio para medir el tiempo total de procesamiento
+    tiempo_inicio = time.time()
+    try:
+        mensaje, codec = protocolo.decodificar(frames[-1])
+    except protocolo.ErrorProtocolo as e:
+        socket_programas.send_multipart(remitente + [protocolo.respuesta_ilegible(e)])
+        return
+    codec = protocolo.codec_respuesta(codec, mensaje)
+    trazas.registrar(mensaje.get(trazas.CAMPO_TRAZA), "facultad.decodificar", tiempo_inicio, time.time())
+    print(f"Facultad recibió solicitud de programa: {mensaje}")
+
+    nombre = mensaje.get("facultad") or despacho.get(frames[0])
+    if nombre is None and len(facultades_locales) == 1:
+        nombre = next(iter(facultades_locales))
+    destino = facultades_locales.get(nombre)
+    if destino is None:
+        respuesta = {"status": "Facultad desconocida", "facultad": nombre}
+        socket_programas.send_multipart(remitente + [protocolo.codificar(respuesta, protocolo.ACUSE, codec)])
+        return
+    despacho[frames[0]] = nombre
+
+    # Un reintento (mismo id_solicitud) no vuelve a entrar en un lote
+    repetida, resultado = destino.duplicado(mensaje)
+    if repetida:
+        if resultado is not None and mensaje.get("esperar_resultado"):
+            socket_programas.send_multipart(remitente + [protocolo.codificar(resultado, protocolo.ASIGNACION, codec)])
+        elif not mensaje.get("esperar_resultado"):
+            acuse = protocolo.codificar({"status": "Solicitud recibida"}, protocolo.ACUSE, codec)
+            socket_programas.send_multipart(remitente + [acuse])
+        return
+
+    if mensaje.get("esperar_resultado"):
+        destino.agregar(mensaje, tiempo_inicio, (remitente, codec))
+    else:
+        destino.agregar(mensaje, tiempo_inicio, None)
         # Enviar confirmación al programa académico
-        socket_programas.send_json({"status": "Solicitud recibida"})
+        acuse = protocolo.codificar({"status": "Solicitud recibida"}, protocolo.ACUSE, codec)
+        socket_programas.send_multipart(remitente + [acuse])
 
-def facultad(nombre_facultad, semestre, ip_servidor, puerto_inicial):
+def facultades(nombres_facultades, semestre, ip_servidor, puerto_inicial, puerto_programas=PUERTO_PROGRAMAS,
+               endpoint_servidor=None, ip_respaldo=IP_RESPALDO, puerto_respaldo=PUERTO_RESPALDO,
+               directorio_almacen=DIRECTORIO_ALMACEN, mapa_fragmentos=None):
     """
-    Proceso principal de la facultad. Gestiona la comunicación con programas académicos y el servidor central.
-    
+    Proceso principal que atiende una o varias facultades sobre un único puerto.
+
+    Un socket ROUTER atiende de forma asíncrona a todos los programas
+    académicos y los reparte entre las facultades del proceso. Un único bucle
+    con zmq.Poller atiende el frontend y los DEALER de cada facultad. Las
+    solicitudes se consolidan en lotes que se envían en cuanto se cumple el
+    primer criterio (número de solicitudes, espera máxima o umbral de
+    salones/laboratorios), con hasta LOTES_EN_VUELO lotes por facultad
+    esperando respuesta, emparejados por `id_solicitud`.
+
+    El proceso se suscribe a los latidos que publican Central y Réplica. Si el
+    Central deja de latir más de UMBRAL_FALLO, todas las facultades conmutan a
+    la Réplica y reenvían sus lotes en vuelo; cuando el Central vuelve a latir
+    de forma estable, regresan a él automáticamente.
+
+    Con `mapa_fragmentos` (ruta del mapa de un despliegue fragmentado) cada
+    facultad envía sus lotes al fragmento que le toca en el anillo del mapa,
+    sin latidos. El mapa se guarda en memoria y se relee cuando cambia el
+    archivo; si sube de versión, las facultades que cambian de fragmento
+    conmutan y reenvían sus lotes en vuelo.
+
     Args:
-        nombre_facultad (str): Nombre de la facultad (e.g., "Facultad de Ingeniería").
+        nombres_facultades (list): Nombres de las facultades (e.g., ["Facultad de Ingeniería"]).
         semestre (str): Semestre académico (e.g., "2025-10").
         ip_servidor (str): IP del servidor central o réplica (e.g., "192.168.1.103").
         puerto_inicial (int): Puerto inicial del servidor central (e.g., 3389).
+        puerto_programas (int | str): Puerto donde se atiende a los programas (e.g., 3391)
+            o endpoint completo (e.g., "inproc://facultades").
+        endpoint_servidor (str): Endpoint fijo del servidor; si se indica, no hay
+            conmutación por latidos (útil para pruebas de carga en un solo proceso).
+        ip_respaldo (str): IP del servidor réplica (e.g., "192.168.1.101").
+        puerto_respaldo (int): Puerto del servidor réplica (e.g., 3390).
+        directorio_almacen (str): Carpeta del almacén binario de solicitudes y
+            asignaciones (None = solo los .txt).
+        mapa_fragmentos (str): Mapa de fragmentos (e.g., "fragmentos.json"); None = Central y Réplica.
     """
     # Crear contexto ZeroMQ para manejar sockets
-    context = zmq.Context()
+    context = zmq.Context.instance()
 
-    # Configurar socket REP para comunicarse con los programas académicos (request-reply síncrono)
-    socket_programas = context.socket(zmq.REP)
-    socket_programas.bind("tcp://*:3391")  # Escucha en el puerto 3391 para programas académicos
+    # Configurar socket ROUTER para atender a muchos programas académicos a la vez
+    socket_programas = context.socket(zmq.ROUTER)
+    socket_programas.bind(puerto_programas if isinstance(puerto_programas, str) else f"tcp://*:{puerto_programas}")
 
-    # Configurar socket DEALER para comunicarse con el servidor central (request-reply asíncrono)
-    socket_servidor = context.socket(zmq.DEALER)
-    socket_servidor.setsockopt_string(zmq.IDENTITY, nombre_facultad)  # Identidad única para la facultad
+    # Servidores por prioridad (Central, Réplica) con sus endpoints de latidos
+    monitor = None
+    mapa = MapaCacheado(mapa_fragmentos) if mapa_fragmentos is not None else None
+    if endpoint_servidor is None and mapa is None:
+        servidores = [(ip_servidor, puerto_inicial), (ip_respaldo, puerto_respaldo)]
+        endpoints_servidores = [f"tcp://{ip}:{puerto}" for ip, puerto in servidores]
+        monitor = MonitorLatidos(context, [f"tcp://{ip}:{puerto + DESFASE_LATIDOS}" for ip, puerto in servidores])
+        endpoint_servidor = endpoints_servidores[monitor.actual]
 
-    # Determinar el puerto activo inicial del servidor (central o réplica)
-    puerto_activo = puerto_inicial
-    if os.path.exists("puerto_activo.txt"):
-        with open("puerto_activo.txt", "r") as f:
-            puerto_activo = int(f.read().strip())
-    # Conectar al servidor (central o réplica) usando la IP y puerto activo
-    socket_servidor.connect(f"tcp://{ip_servidor}:{puerto_activo}")
+    # Un solo almacén por proceso: todas sus facultades escriben desde este hilo
+    almacen = AlmacenAsignaciones(directorio_almacen) if directorio_almacen is not None else None
+    facultades_locales = {
+        nombre: Facultad(context, nombre, semestre,
+                         endpoint_servidor if mapa is None else mapa.mapa.endpoint(mapa.mapa.fragmento_de(nombre)),
+                         almacen)
+        for nombre in nombres_facultades
+    }
+    despacho = {}
 
-    # Listas para almacenar solicitudes y tiempos de inicio de los programas académicos
-    solicitudes_programas = []
-    tiempos_inicio = []
+    # Un solo hilo atiende todos los sockets, así el estado no se comparte entre hilos
+    poller = zmq.Poller()
+    poller.register(socket_programas, zmq.POLLIN)
+    por_socket = {}
+    for f in facultades_locales.values():
+        poller.register(f.socket_servidor, zmq.POLLIN)
+        por_socket[f.socket_servidor] = f
+        print(f"Facultad {f.nombre} iniciada para el semestre {semestre}...")
+    if monitor is not None:
+        for socket in monitor.sockets:
+            poller.register(socket, zmq.POLLIN)
 
-    # Iniciar hilo para manejar solicitudes de programas académicos de forma concurrente
-    thread_programas = threading.Thread(target=manejar_programas, args=(socket_programas, solicitudes_programas, tiempos_inicio))
-    thread_programas.daemon = True  # Hilo demonio para que termine al cerrar el programa
-    thread_programas.start()
+    while True:
+        trazas.PERFILADOR.revisar()
+        # Dormir solo hasta que venza la espera máxima del lote más próximo
+        ahora = time.time()
+        esperas = [e for e in (f.espera_maxima(ahora) for f in facultades_locales.values()) if e is not None]
+        if monitor is not None:
+            # Revisar los latidos aunque no haya tráfico
+            esperas.append(INTERVALO_LATIDO)
+        if mapa is not None:
+            esperas.append(REVISAR_MAPA_CADA)
+        timeout = min(esperas) * 1000 if esperas else None
+        eventos = dict(poller.poll(timeout))
 
-    print(f"Facultad {nombre_facultad} iniciada para el semestre {semestre}...")
+        if monitor is not None:
+            for socket in monitor.sockets:
+                if socket in eventos:
+                    monitor.procesar(socket)
+            anterior = monitor.actual
+            if monitor.elegir() != anterior:
+                print(f"Conmutando de {endpoints_servidores[anterior]} a {endpoints_servidores[monitor.actual]} "
+                      f"(secuencias anunciadas: {monitor.secuencias})")
+                for f in facultades_locales.values():
+                    f.cambiar_servidor(endpoints_servidores[monitor.actual])
 
-    while True:
-        # Consolidar solicitudes cada 5 segundos
-        time.sleep(5)
-        if solicitudes_programas:
-            # Calcular el total de salones y laboratorios solicitados por todos los programas
-            total_salones = sum(prog["salones"] for prog in solicitudes_programas)
-            total_laboratorios = sum(prog["laboratorios"] for prog in solicitudes_programas)
-            # Crear solicitud consolidada para enviar al servidor central
-            solicitud = {
-                "semestre": semestre,
-                "facultad": nombre_facultad,
-                "programa": solicitudes_programas[0]["programa"],  # Usar el programa de la primera solicitud
-                "salones": total_salones,
-                "laboratorios": total_laboratorios
-            }
+        if mapa is not None and mapa.revisar(time.time()) is not None:
+            print(f"Mapa de fragmentos actualizado a la versión {mapa.mapa.version}")
+            for f in facultades_locales.values():
+                endpoint = mapa.mapa.endpoint(mapa.mapa.fragmento_de(f.nombre))
+                if endpoint != f.endpoint_servidor:
+                    f.cambiar_servidor(endpoint)
+
+        if socket_programas in eventos:
+            recibir_programa(socket_programas, facultades_locales, despacho)
 
-            # Verificar si el puerto activo cambió (para tolerancia a fallas)
-            if os.path.exists("puerto_activo.txt"):
-                with open("puerto_activo.txt", "r") as f:
-                    nuevo_puerto = int(f.read().strip())
-                    if nuevo_puerto != puerto_activo:
-                        # Desconectar del puerto anterior y conectar al nuevo puerto
-                        socket_servidor.disconnect(f"tcp://{ip_servidor}:{puerto_activo}")
-                        puerto_activo = nuevo_puerto
-                        socket_servidor.connect(f"tcp://{ip_servidor}:{puerto_activo}")
-                        print(f"Facultad {nombre_facultad} cambió al puerto {puerto_activo}")
-
-            # Enviar solicitud consolidada al servidor central
-            socket_servidor.send_json(solicitud)
-            print(f"Facultad {nombre_facultad} envió solicitud: {solicitud}")
-
-            # Recibir respuesta del servidor central en formato JSON
-            respuesta = socket_servidor.recv_json()
-            print(f"Facultad {nombre_facultad} recibió respuesta: {respuesta}")
-
-            # Registrar el tiempo total de procesamiento (desde la solicitud hasta la respuesta)
-            tiempo_fin = time.time()
-            for tiempo_inicio in tiempos_inicio:
-                with open(f"metricas_{nombre_facultad}_{semestre}.txt", "a") as f:
-                    f.write(f"Tiempo total: {tiempo_fin - tiempo_inicio}\n")
-
-            # Guardar la asignación recibida en un archivo para persistencia
-            with open(f"asignaciones_{nombre_facultad}_{semestre}.txt", "a") as f:
-                f.write(f"{json.dumps(respuesta)}\n")
-
-            # Limpiar listas para el próximo ciclo
-            solicitudes_programas.clear()
-            tiempos_inicio.clear()
+        for socket, f in por_socket.items():
+            if socket in eventos:
+                f.recibir_respuestas(socket_programas)
+
+        ahora = time.time()
+        for f in facultades_locales.values():
+            f.reenviar_vencidos(ahora)
+            if f.lote_listo(ahora):
+                f.enviar_lote()
+
+def facultad(nombre_facultad, semestre, ip_servidor, puerto_inicial):
+    """
+    Proceso principal de una sola facultad (ver `facultades`).
+
+    Args:
+        nombre_facultad (str): Nombre de la facultad (e.g., "Facultad de Ingeniería").
+        semestre (str): Semestre académico (e.g., "2025-10").
+        ip_servidor (str): IP del servidor central o réplica (e.g., "192.168.1.103").
+        puerto_inicial (int): Puerto inicial del servidor central (e.g., 3389).
+    """
+    facultades([nombre_facultad], semestre, ip_servidor, puerto_inicial)
 
 if __name__ == "__main__":
     # Punto de entrada del programa
     import sys
-    if len(sys.argv) != 3:
-        print("Uso: python facultades.py <nombre_facultad> <semestre>")
+    mapa_fragmentos = None
+    if len(sys.argv) >= 3 and sys.argv[1] == "--mapa":
+        # Despliegue fragmentado: python facultades.py --mapa fragmentos.json <nombre_facultad> <semestre> [...]
+        mapa_fragmentos = sys.argv[2]
+        del sys.argv[1:3]
+    if len(sys.argv) < 3:
+        print("Uso: python facultades.py [--mapa fragmentos.json] <nombre_facultad> <semestre> [<otra_facultad> ...]")
         sys.exit(1)
-    # IP del servidor central (PC3) o réplica (PC1), dependiendo del puerto activo
+    # IP del servidor central (PC3); la réplica (PC1) está en IP_RESPALDO
     ip_servidor = "192.168.1.103"  # IP de PC3 (servidor central)
-    # Iniciar la facultad con los parámetros proporcionados
-    facultad(sys.argv[1], sys.argv[2], ip_servidor, 3389)  # Puerto inicial 3389 (servidor central)
\ No newline at end of file
+    # Iniciar las facultades con los parámetros proporcionados (todas comparten el puerto 3391)
+    nombres = [sys.argv[1]] + sys.argv[3:]
+    # Tramos en trazas_facultades.tsv; `kill -USR2 <pid>` alterna el perfilado
+    trazas.configurar("facultades")
+    trazas.instalar_senal()
+    facultades(nombres, sys.argv[2], ip_servidor, 3389,  # Puerto inicial 3389 (servidor central)
+               mapa_fragmentos=mapa_fragmentos)
@@ -0,0 +1,419 @@
+# fragmentos.py
+
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import threading
+import subprocess
+from bisect import bisect_right
+
+import zmq
+
+from inventario import SALON, LABORATORIO
+from idempotencia import TTL_IDEMPOTENCIA
+
+# Mapa de fragmentos compartido por servidores y facultades
+ARCHIVO_MAPA = "fragmentos.json"
+
+# Puntos de cada fragmento en el anillo de hash consistente
+VIRTUALES_POR_FRAGMENTO = 64
+
+# Puertos de un despliegue local generado con `crear`: 4389, 4399, 4409...
+PUERTO_FRAGMENTOS = 4389
+PASO_PUERTOS      = 10
+
+# Cada fragmento atiende los préstamos de aulas en su puerto + DESFASE_PRESTAMOS (4389 -> 4589)
+DESFASE_PRESTAMOS = 200
+PRESTAMO_MINIMO   = 4      # aulas por tipo que se piden como mínimo, para no pedir de una en una
+PRESTAMO_TIMEOUT  = 0.5    # segundos de espera por cada fragmento consultado
+PRESTAMO_REINTENTOS = 2    # reenvíos con el mismo id_prestamo tras un timeout
+
+# Cada cuánto revisan las facultades si cambió el archivo del mapa
+REVISAR_MAPA_CADA = 1.0
+
+def hash_estable(texto):
+    """
+    Hash de 64 bits igual en todos los procesos (hash() de Python cambia por proceso).
+    """
+    return int.from_bytes(hashlib.blake2b(texto.encode("utf-8"), digest_size=8).digest(), "big")
+
+def puerto_de(endpoint):
+    return int(endpoint.rsplit(":", 1)[1])
+
+class AnilloConsistente:
+    """
+    Anillo de hash consistente con VIRTUALES_POR_FRAGMENTO puntos por
+    fragmento: al agregar o quitar un fragmento solo cambian de dueño las
+    claves de los tramos que ganó o perdió.
+
+    Args:
+        nombres (list): Nombres de los fragmentos (e.g., ["f1", "f2", "f3"]).
+    """
+    def __init__(self, nombres, virtuales=VIRTUALES_POR_FRAGMENTO):
+        if not nombres:
+            raise ValueError("El anillo necesita al menos un fragmento")
+        puntos = sorted((hash_estable(f"{nombre}#{i}"), nombre) for nombre in nombres for i in range(virtuales))
+        self.hashes  = [h for h, _ in puntos]
+        self.nombres = [nombre for _, nombre in puntos]
+
+    def _posicion(self, clave):
+        return bisect_right(self.hashes, hash_estable(clave)) % len(self.hashes)
+
+    def ubicar(self, clave):
+        """
+        Fragmento dueño de `clave`: el primer punto del anillo a partir de su hash.
+        """
+        return self.nombres[self._posicion(clave)]
+
+    def recorrido(self, clave):
+        """
+        Fragmentos distintos en el orden del anillo a partir de `clave`.
+        """
+        inicio = self._posicion(clave)
+        vistos = []
+        for k in range(len(self.nombres)):
+            nombre = self.nombres[(inicio + k) % len(self.nombres)]
+            if nombre not in vistos:
+                vistos.append(nombre)
+        return vistos
+
+class MapaFragmentos:
+    """
+    Mapa de un despliegue fragmentado, leído de un JSON:
+
+        {"version": 1,
+         "fragmentos": {"f1": {"endpoint": "tcp://127.0.0.1:4389", "replica": null}, ...},
+         "reparto": ["f1", "f2", "f3"]}
+
+    Las facultades se ubican por su nombre en el anillo de todos los
+    fragmentos. Las aulas del catálogo se reparten una sola vez entre los
+    fragmentos de "reparto" (por defecto todos): ese reparto no debe cambiar
+    mientras haya estado guardado. Un fragmento agregado después arranca sin
+    aulas y las obtiene prestadas de los demás.
+
+    Args:
+        datos (dict): Contenido del mapa.
+    """
+    def __init__(self, datos):
+        self.version    = datos.get("version", 1)
+        self.fragmentos = datos["fragmentos"]
+        self.reparto    = datos.get("reparto") or sorted(self.fragmentos)
+        self.anillo     = AnilloConsistente(sorted(self.fragmentos))
+
+    @classmethod
+    def leer(cls, ruta=ARCHIVO_MAPA):
+        with open(ruta, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def datos(self):
+        return {"version": self.version, "fragmentos": self.fragmentos, "reparto": self.reparto}
+
+    def fragmento_de(self, facultad):
+        return self.anillo.ubicar(facultad)
+
+    def endpoint(self, nombre):
+        return self.fragmentos[nombre]["endpoint"]
+
+    def endpoint_prestamos(self, nombre):
+        fragmento = self.fragmentos[nombre]
+        if fragmento.get("prestamos"):
+            return fragmento["prestamos"]
+        endpoint = fragmento["endpoint"]
+        return f"{endpoint.rsplit(':', 1)[0]}:{puerto_de(endpoint) + DESFASE_PRESTAMOS}"
+
+    def replica(self, nombre):
+        return self.fragmentos[nombre].get("replica")
+
+    def pares(self, nombre):
+        """
+        Los otros fragmentos, en el orden del anillo a partir de `nombre`
+        (a quiénes pedir aulas prestadas y en qué orden).
+        """
+        return [otro for otro in self.anillo.recorrido(nombre) if otro != nombre]
+
+    def aulas_de(self, nombre, aulas):
+        """
+        Ids de las aulas que el reparto inicial da a `nombre`. Por campus y tipo,
+        las aulas ordenadas por capacidad se reparten por turnos, así cada
+        fragmento recibe una porción parecida de cada tamaño.
+        """
+        if nombre not in self.reparto:
+            return set()
+        grupos = {}
+        for aula in aulas:
+            grupos.setdefault((aula.get("campus", ""), aula["tipo"]), []).append(aula)
+        turno = self.reparto.index(nombre)
+        propias = set()
+        for grupo in grupos.values():
+            grupo.sort(key=lambda a: (a["capacidad"], a.get("edificio", ""), a["id"]))
+            propias.update(aula["id"] for aula in grupo[turno::len(self.reparto)])
+        return propias
+
+class MapaCacheado:
+    """
+    Copia local del mapa en una facultad. `revisar` relee el archivo como
+    mucho cada REVISAR_MAPA_CADA segundos y solo si cambió su fecha de
+    modificación; devuelve el mapa nuevo si subió su versión.
+    """
+    def __init__(self, ruta=ARCHIVO_MAPA):
+        self.ruta       = ruta
+        self.mapa       = MapaFragmentos.leer(ruta)
+        self.modificado = os.path.getmtime(ruta)
+        self.revisado   = time.time()
+
+    def revisar(self, ahora):
+        if ahora - self.revisado < REVISAR_MAPA_CADA:
+            return None
+        self.revisado = ahora
+        try:
+            modificado = os.path.getmtime(self.ruta)
+            if modificado == self.modificado:
+                return None
+            mapa = MapaFragmentos.leer(self.ruta)
+        except (OSError, ValueError, KeyError) as error:
+            # Archivo a medio escribir o inválido: se conserva el mapa anterior
+            print(f"⚠️  No se pudo releer el mapa {self.ruta}: {error}")
+            return None
+        self.modificado = modificado
+        if mapa.version <= self.mapa.version:
+            return None
+        self.mapa = mapa
+        return mapa
+
+class Prestamos:
+    """
+    Préstamo de aulas entre fragmentos.
+
+    Un fragmento al que no le alcanzan las aulas envía a sus pares, en orden
+    del anillo, [JSON] con {"id_prestamo", "semestre", "campus", "cantidades",
+    "capacidad_minima", "edificio", "fragmento"} por un REQ a su endpoint de
+    préstamos. El par entrega aulas sin ninguna reserva que cumplan las
+    restricciones, registra la cesión en su WAL con el id_prestamo y responde
+    {"salon": [ids], "laboratorio": [ids]}.
+
+    El par recuerda cada id_prestamo en su caché de idempotencia (persistida y
+    replicada), así que reenviar el mismo pedido devuelve las mismas aulas sin
+    ceder otras. Un par que no responde en PRESTAMO_TIMEOUT recibe hasta
+    PRESTAMO_REINTENTOS reenvíos; si ninguno responde, el pedido queda sin
+    confirmar y se vuelve a enviar en los préstamos siguientes (`recuperar`),
+    mientras el par todavía lo recuerde (TTL_IDEMPOTENCIA).
+
+    Args:
+        context (zmq.Context): Contexto ZeroMQ del servidor.
+        mapa (MapaFragmentos): Mapa del despliegue.
+        nombre (str): Nombre de este fragmento.
+    """
+    def __init__(self, context, mapa, nombre, timeout=PRESTAMO_TIMEOUT):
+        self.context   = context
+        self.mapa      = mapa
+        self.nombre    = nombre
+        self.timeout   = timeout
+        self.lock      = threading.Lock()
+        self.pedidas   = 0    # aulas recibidas de otros fragmentos
+        self.cedidas   = 0    # aulas entregadas a otros fragmentos
+        self.fallidos  = 0    # pares que no respondieron a tiempo
+        # id_prestamo -> (par, pedido, instante) de pedidos cuya respuesta se perdió
+        self.sin_confirmar = {}
+
+    def pedir(self, semestre, campus, faltantes, capacidad_minima=0, edificio=None):
+        """
+        Pide a los pares las aulas que faltan (al menos PRESTAMO_MINIMO por
+        tipo) hasta cubrirlas o agotar los pares.
+
+        Returns:
+            dict: Tipo -> ids recibidos (pueden ser menos de los que faltaban).
+        """
+        recibidas = {SALON: [], LABORATORIO: []}
+        pendientes = {tipo: faltan for tipo, faltan in faltantes.items() if faltan > 0}
+        for par in self.mapa.pares(self.nombre):
+            if not pendientes:
+                break
+            pedido = {
+                "id_prestamo": uuid.uuid4().hex,
+                "semestre": semestre, "campus": campus,
+                "cantidades": {tipo: max(faltan, PRESTAMO_MINIMO) for tipo, faltan in pendientes.items()},
+                "capacidad_minima": capacidad_minima, "edificio": edificio, "fragmento": self.nombre
+            }
+            for _ in range(1 + PRESTAMO_REINTENTOS):
+                respuesta = self._enviar(par, pedido)
+                if respuesta is not None:
+                    break
+            if respuesta is None:
+                # El par pudo haber cedido igual: se reclama en los préstamos siguientes
+                with self.lock:
+                    self.sin_confirmar[pedido["id_prestamo"]] = (par, pedido, time.time())
+                continue
+            for tipo in list(pendientes):
+                ids = respuesta.get(tipo, [])
+                recibidas[tipo].extend(ids)
+                pendientes[tipo] -= len(ids)
+                if pendientes[tipo] <= 0:
+                    del pendientes[tipo]
+        with self.lock:
+            self.pedidas += len(recibidas[SALON]) + len(recibidas[LABORATORIO])
+        if any(recibidas.values()):
+            print(f"Fragmento {self.nombre} recibió en préstamo {recibidas}")
+        return recibidas
+
+    def recuperar(self):
+        """
+        Reenvía (una vez cada uno) los pedidos sin confirmar. El par responde
+        con las aulas que ya había cedido, o cede ahora si nunca le llegó.
+
+        Returns:
+            list: (pedido, {tipo: ids}) de los pedidos que respondieron.
+        """
+        ahora = time.time()
+        with self.lock:
+            pedidos, self.sin_confirmar = self.sin_confirmar, {}
+        recuperados = []
+        for id_prestamo, (par, pedido, instante) in pedidos.items():
+            if ahora - instante > TTL_IDEMPOTENCIA:
+                print(f"⚠️  El préstamo {id_prestamo} de {par} nunca se confirmó; "
+                      f"las aulas que haya cedido quedan sin dueño")
+                continue
+            respuesta = self._enviar(par, pedido)
+            if respuesta is None:
+                with self.lock:
+                    self.sin_confirmar[id_prestamo] = (par, pedido, instante)
+                continue
+            recibidas = {tipo: respuesta.get(tipo, []) for tipo in (SALON, LABORATORIO)}
+            with self.lock:
+                self.pedidas += len(recibidas[SALON]) + len(recibidas[LABORATORIO])
+            print(f"Fragmento {self.nombre} recuperó el préstamo {id_prestamo} de {par}: {recibidas}")
+            recuperados.append((pedido, recibidas))
+        return recuperados
+
+    def _enviar(self, par, pedido):
+        socket = self.context.socket(zmq.REQ)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.mapa.endpoint_prestamos(par))
+        try:
+            socket.send(json.dumps(pedido).encode("utf-8"))
+            if not socket.poll(self.timeout * 1000):
+                with self.lock:
+                    self.fallidos += 1
+                print(f"⚠️  El fragmento {par} no respondió el préstamo en {self.timeout} s")
+                return None
+            return json.loads(socket.recv())
+        finally:
+            socket.close()
+
+    def atender(self, recursos, endpoint=None):
+        """
+        Atiende en un hilo propio los préstamos que piden los pares, para que
+        dos fragmentos que se piden aulas a la vez no se esperen entre sí.
+        """
+        endpoint = endpoint or f"tcp://*:{puerto_de(self.mapa.endpoint_prestamos(self.nombre))}"
+        hilo = threading.Thread(target=self._bucle, args=(recursos, endpoint))
+        hilo.daemon = True
+        hilo.start()
+        return hilo
+
+    def _bucle(self, recursos, endpoint):
+        # El socket vive solo en este hilo
+        socket = self.context.socket(zmq.ROUTER)
+        socket.bind(endpoint)
+        while True:
+            frames = socket.recv_multipart()
+            try:
+                pedido = json.loads(frames[-1])
+                _validar_pedido(pedido)
+                cedidas = recursos.ceder(pedido.get("semestre", ""), pedido.get("campus", ""),
+                                         pedido["cantidades"], pedido.get("capacidad_minima", 0),
+                                         pedido.get("edificio"), pedido.get("fragmento", ""),
+                                         pedido.get("id_prestamo"))
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                print(f"⚠️  Préstamo inválido descartado: {error}")
+                socket.send_multipart(frames[:-1] + [json.dumps({"error": str(error)}).encode("utf-8")])
+                continue
+            with self.lock:
+                self.cedidas += len(cedidas[SALON]) + len(cedidas[LABORATORIO])
+            if any(cedidas.values()):
+                print(f"Fragmento {self.nombre} cedió a {pedido.get('fragmento')}: {cedidas}")
+            socket.send_multipart(frames[:-1] + [json.dumps(cedidas).encode("utf-8")])
+
+    def estado(self):
+        with self.lock:
+            return {"fragmento": self.nombre, "version_mapa": self.mapa.version,
+                    "aulas_recibidas": self.pedidas, "aulas_cedidas": self.cedidas,
+                    "pares_sin_respuesta": self.fallidos, "prestamos_sin_confirmar": len(self.sin_confirmar)}
+
+def _validar_pedido(pedido):
+    """
+    Rechaza con ValueError un pedido de préstamo mal formado antes de tocar
+    el inventario: cantidades solo de SALON/LABORATORIO, enteros no negativos.
+    """
+    if not isinstance(pedido, dict) or not isinstance(pedido.get("cantidades"), dict):
+        raise ValueError("se esperaba un objeto JSON con \"cantidades\"")
+    for tipo, cantidad in pedido["cantidades"].items():
+        if tipo not in (SALON, LABORATORIO):
+            raise ValueError(f"tipo de aula desconocido: {tipo!r}")
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 0:
+            raise ValueError(f"cantidad inválida de {tipo}: {cantidad!r}")
+    capacidad_minima = pedido.get("capacidad_minima", 0)
+    if not isinstance(capacidad_minima, int) or isinstance(capacidad_minima, bool) or capacidad_minima < 0:
+        raise ValueError(f"capacidad_minima inválida: {capacidad_minima!r}")
+
+def crear_mapa(cantidad, ip="127.0.0.1", puerto_inicial=PUERTO_FRAGMENTOS):
+    """
+    Mapa de `cantidad` fragmentos f1..fn en puertos consecutivos de a PASO_PUERTOS.
+    """
+    return MapaFragmentos({
+        "version": 1,
+        "fragmentos": {
+            f"f{i + 1}": {"endpoint": f"tcp://{ip}:{puerto_inicial + i * PASO_PUERTOS}", "replica": None}
+            for i in range(cantidad)
+        }
+    })
+
+def lanzar(ruta_mapa, archivo_inventario=None, trabajadores=1):
+    """
+    Arranca un proceso servidor_central.py por cada fragmento del mapa (para
+    probar en una sola máquina) y espera a que terminen.
+    """
+    mapa = MapaFragmentos.leer(ruta_mapa)
+    procesos = []
+    for nombre in sorted(mapa.fragmentos):
+        comando = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "servidor_central.py"),
+                   "--fragmento", nombre, ruta_mapa, str(trabajadores)]
+        if archivo_inventario is not None:
+            comando.append(archivo_inventario)
+        procesos.append(subprocess.Popen(comando))
+        print(f"Fragmento {nombre} en {mapa.endpoint(nombre)} (pid {procesos[-1].pid})")
+    try:
+        for proceso in procesos:
+            proceso.wait()
+    except KeyboardInterrupt:
+        for proceso in procesos:
+            proceso.terminate()
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if len(argumentos) >= 2 and argumentos[0] == "crear":
+        # python3 fragmentos.py crear <n> [ip] [puerto_inicial] [archivo]
+        mapa = crear_mapa(int(argumentos[1]),
+                          argumentos[2] if len(argumentos) >= 3 else "127.0.0.1",
+                          int(argumentos[3]) if len(argumentos) >= 4 else PUERTO_FRAGMENTOS)
+        ruta = argumentos[4] if len(argumentos) >= 5 else ARCHIVO_MAPA
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(mapa.datos(), f, indent=2)
+        print(f"Mapa de {len(mapa.fragmentos)} fragmentos escrito en {ruta}")
+    elif len(argumentos) >= 2 and argumentos[0] == "lanzar":
+        # python3 fragmentos.py lanzar <mapa.json> [archivo_aulas] [trabajadores]
+        lanzar(argumentos[1], argumentos[2] if len(argumentos) >= 3 else None,
+               int(argumentos[3]) if len(argumentos) >= 4 else 1)
+    elif len(argumentos) >= 3 and argumentos[0] == "ubicar":
+        # python3 fragmentos.py ubicar <mapa.json> <facultad> [...]
+        mapa = MapaFragmentos.leer(argumentos[1])
+        for facultad in argumentos[2:]:
+            nombre = mapa.fragmento_de(facultad)
+            print(f"{facultad}: {nombre} ({mapa.endpoint(nombre)})")
+    else:
+        print("Uso: python3 fragmentos.py crear <n> [ip] [puerto_inicial] [archivo]\n"
+              "     python3 fragmentos.py lanzar <mapa.json> [archivo_aulas] [trabajadores]\n"
+              "     python3 fragmentos.py ubicar <mapa.json> <facultad> [...]")
+        sys.exit(1)
@@ -1,20 +1,31 @@
 import zmq
-import time
-import os
 
-def health_check(ip_servidor, puerto_principal, puerto_respaldo):
+from latidos import MonitorLatidos, DESFASE_LATIDOS, UMBRAL_FALLO
+
+def health_check(ip_principal, puerto_principal, ip_respaldo, puerto_respaldo):
     """
-    Monitorea el servidor central y cambia al servidor réplica si falla, actualizando el puerto activo.
-    
+    Monitorea los latidos que publican el servidor central y la réplica e informa
+    cuál debe estar activo. Ya no sondea con REQ: se suscribe a los PUB de latidos,
+    así que detecta una caída en menos de UMBRAL_FALLO segundos y también la vuelta
+    del Central. Las facultades conmutan solas; este script solo informa y mantiene
+    puerto_activo.txt actualizado para herramientas que todavía lo lean.
+
     Args:
-        ip_servidor (str): IP del servidor central o réplica (e.g., "192.168.1.103" o "192.168.1.101").
+        ip_principal (str): IP del servidor central (e.g., "192.168.1.103").
         puerto_principal (int): Puerto del servidor central (e.g., 3389).
+        ip_respaldo (str): IP del servidor réplica (e.g., "192.168.1.101").
         puerto_respaldo (int): Puerto del servidor réplica (e.g., 3390).
     """
     # Crear contexto ZeroMQ para manejar sockets
     context = zmq.Context()
-    # Configurar socket REQ para enviar pings al servidor
-    socket = context.socket(zmq.REQ)
+    puertos = [puerto_principal, puerto_respaldo]
+    monitor = MonitorLatidos(context, [
+        f"tcp://{ip_principal}:{puerto_principal + DESFASE_LATIDOS}",
+        f"tcp://{ip_respaldo}:{puerto_respaldo + DESFASE_LATIDOS}"
+    ])
+    poller = zmq.Poller()
+    for socket in monitor.sockets:
+        poller.register(socket, zmq.POLLIN)
 
     # Establecer puerto activo inicial (servidor central)
     puerto_activo = puerto_principal
@@ -22,27 +33,19 @@ def health_check(ip_servidor, puerto_principal, puerto_respaldo):
         f.write(str(puerto_activo))
 
     while True:
-        try:
-            # Conectar al servidor activo (central o réplica)
-            socket.connect(f"tcp://{ip_servidor}:{puerto_activo}")
-            # Enviar mensaje de ping
-            socket.send_string("ping")
-            # Esperar respuesta con un timeout de 1 segundo
-            socket.recv_string(timeout=1000)
-            # Desconectar para el próximo ciclo
-            socket.disconnect(f"tcp://{ip_servidor}:{puerto_activo}")
-            print(f"Servidor en puerto {puerto_activo} está activo.")
-        except zmq.error.Again:
-            # Si no hay respuesta, el servidor ha fallado
-            print(f"Servidor en puerto {puerto_activo} no responde.")
-            # Cambiar al otro puerto (central -> réplica o réplica -> central)
-            puerto_activo = puerto_respaldo if puerto_activo == puerto_principal else puerto_principal
-            # Actualizar el archivo puerto_activo.txt para que las facultades se reconecten
+        eventos = dict(poller.poll(UMBRAL_FALLO * 1000 / 2))
+        for socket in monitor.sockets:
+            if socket in eventos:
+                monitor.procesar(socket)
+
+        nuevo_puerto = puertos[monitor.elegir()]
+        if nuevo_puerto != puerto_activo:
+            puerto_activo = nuevo_puerto
+            # Actualizar el archivo puerto_activo.txt para herramientas antiguas
             with open("puerto_activo.txt", "w") as f:
                 f.write(str(puerto_activo))
-            print(f"Cambiando al servidor en puerto {puerto_activo}...")
-        # Esperar 2 segundos antes de la próxima verificación
-        time.sleep(2)
+            print(f"Cambiando al servidor en puerto {puerto_activo} "
+                  f"(secuencia Central: {monitor.secuencias[0]}, Réplica: {monitor.secuencias[1]})")
 
 if __name__ == "__main__":
     # Punto de entrada del programa
@@ -50,7 +53,8 @@ if __name__ == "__main__":
     if len(sys.argv) != 3:
         print("Uso: python health_check.py <puerto_principal> <puerto_respaldo>")
         sys.exit(1)
-    # Determinar la IP según el puerto (central en 3389, réplica en 3390)
-    ip_servidor = "192.168.1.103" if int(sys.argv[1]) == 3389 else "192.168.1.101"
-    # Iniciar el health-check con los puertos proporcionados
-    health_check(ip_servidor, int(sys.argv[1]), int(sys.argv[2]))
\ No newline at end of file
+    # IPs del servidor central (PC3) y de la réplica (PC1)
+    ip_principal = "192.168.1.103"
+    ip_respaldo  = "192.168.1.101"
+    # Iniciar el monitor de latidos con los puertos proporcionados
+    health_check(ip_principal, int(sys.argv[1]), ip_respaldo, int(sys.argv[2]))
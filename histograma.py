@@ -0,0 +1,152 @@
+# histograma.py
+
+import math
+import time
+
+# Rango y precisión de los histogramas de latencia (en segundos)
+VALOR_MINIMO = 1e-6      # 1 µs; todo lo menor cae en el primer bucket
+VALOR_MAXIMO = 100.0     # 100 s; todo lo mayor cae en el último bucket
+PRECISION    = 0.02      # error relativo máximo de cada bucket (2 %)
+
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p999", 99.9))
+
+_LOG_BASE    = math.log1p(PRECISION)
+_NUM_BUCKETS = int(math.log(VALOR_MAXIMO / VALOR_MINIMO) / _LOG_BASE) + 2
+
+class Histograma:
+    """
+    Histograma de latencias con buckets logarítmicos y memoria fija.
+
+    Cada bucket cubre un intervalo cuyo ancho es PRECISION veces su límite
+    inferior, así los percentiles tienen un error relativo acotado sin guardar
+    las muestras. Registrar es O(1) y leer percentiles recorre un arreglo de
+    tamaño constante.
+    """
+    def __init__(self):
+        self.conteos = [0] * _NUM_BUCKETS
+        self.total   = 0
+        self.suma    = 0.0
+        self.minimo  = None
+        self.maximo  = None
+
+    @staticmethod
+    def _indice(valor):
+        if valor <= VALOR_MINIMO:
+            return 0
+        indice = int(math.log(valor / VALOR_MINIMO) / _LOG_BASE) + 1
+        return min(indice, _NUM_BUCKETS - 1)
+
+    @staticmethod
+    def _valor(indice):
+        # Punto medio geométrico del bucket
+        if indice == 0:
+            return VALOR_MINIMO
+        return VALOR_MINIMO * math.exp((indice - 0.5) * _LOG_BASE)
+
+    def registrar(self, valor):
+        self.conteos[self._indice(valor)] += 1
+        self.total += 1
+        self.suma  += valor
+        if self.minimo is None or valor < self.minimo:
+            self.minimo = valor
+        if self.maximo is None or valor > self.maximo:
+            self.maximo = valor
+
+    def combinar(self, otro):
+        """
+        Suma los conteos de `otro` en este histograma.
+        """
+        for i, conteo in enumerate(otro.conteos):
+            if conteo:
+                self.conteos[i] += conteo
+        self.total += otro.total
+        self.suma  += otro.suma
+        if otro.minimo is not None and (self.minimo is None or otro.minimo < self.minimo):
+            self.minimo = otro.minimo
+        if otro.maximo is not None and (self.maximo is None or otro.maximo > self.maximo):
+            self.maximo = otro.maximo
+
+    def copiar(self):
+        copia = Histograma()
+        copia.conteos = list(self.conteos)
+        copia.total   = self.total
+        copia.suma    = self.suma
+        copia.minimo  = self.minimo
+        copia.maximo  = self.maximo
+        return copia
+
+    def percentil(self, p):
+        if self.total == 0:
+            return 0
+        objetivo = math.ceil(self.total * p / 100.0)
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                # Nunca reportar fuera del rango observado
+                return min(max(self._valor(i), self.minimo), self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        """
+        Devuelve conteo, promedio, mínimo, máximo y percentiles en un diccionario.
+        """
+        resumen = {
+            "conteo": self.total,
+            "promedio": self.suma / self.total if self.total else 0,
+            "min": self.minimo or 0,
+            "max": self.maximo or 0
+        }
+        for nombre, p in PERCENTILES:
+            resumen[nombre] = self.percentil(p)
+        return resumen
+
+class VentanaDeslizante:
+    """
+    Histograma de los últimos `num_ranuras * duracion_ranura` segundos.
+
+    Mantiene un anillo de histogramas, uno por ranura de tiempo; al avanzar el
+    reloj se reutilizan las ranuras vencidas, así que la memoria es fija.
+    """
+    def __init__(self, num_ranuras=60, duracion_ranura=1.0):
+        self.num_ranuras     = num_ranuras
+        self.duracion_ranura = duracion_ranura
+        self.ranuras         = [Histograma() for _ in range(num_ranuras)]
+        self.marcas          = [-1] * num_ranuras   # número de ranura absoluto de cada posición
+
+    def _ranura(self, ahora):
+        numero = int(ahora / self.duracion_ranura)
+        posicion = numero % self.num_ranuras
+        if self.marcas[posicion] != numero:
+            self.ranuras[posicion] = Histograma()
+            self.marcas[posicion] = numero
+        return self.ranuras[posicion]
+
+    def registrar(self, valor, ahora=None):
+        self._ranura(time.time() if ahora is None else ahora).registrar(valor)
+
+    def copiar(self):
+        """
+        Copia de la ventana (cada ranura con `Histograma.copiar`, que copia la
+        lista de conteos de una vez) para combinarla fuera de un lock.
+        """
+        copia = VentanaDeslizante(self.num_ranuras, self.duracion_ranura)
+        copia.ranuras = [ranura.copiar() for ranura in self.ranuras]
+        copia.marcas  = list(self.marcas)
+        return copia
+
+    def combinado(self, segundos=None, ahora=None):
+        """
+        Devuelve un histograma con las muestras de los últimos `segundos`
+        (por defecto toda la ventana).
+        """
+        ahora = time.time() if ahora is None else ahora
+        actual = int(ahora / self.duracion_ranura)
+        ranuras = self.num_ranuras
+        if segundos is not None:
+            ranuras = min(ranuras, max(1, math.ceil(segundos / self.duracion_ranura)))
+        resultado = Histograma()
+        for posicion, numero in enumerate(self.marcas):
+            if 0 <= actual - numero < ranuras:
+                resultado.combinar(self.ranuras[posicion])
+        return resultado
@@ -0,0 +1,145 @@
+# idempotencia.py
+
+import threading
+import time
+from collections import OrderedDict
+
+# Parámetros por defecto de la caché de solicitudes ya atendidas
+CAPACIDAD_IDEMPOTENCIA = 100000   # ids recordados como máximo (LRU)
+TTL_IDEMPOTENCIA       = 600.0    # segundos que se recuerda un id
+ESPERA_EN_CURSO        = 5.0      # segundos que un duplicado espera al original en curso
+# Estado de la respuesta a un duplicado cuyo original sigue en curso tras la espera
+EN_CURSO               = "en_curso"
+
+# Campos de un registro replicado que forman la respuesta al cliente
+CAMPOS_RESPUESTA = ("id_solicitud", "facultad", "programa", "salones_asignados",
+                    "laboratorios_asignados", "estado", "salones_ids", "laboratorios_ids")
+
+def respuesta_de_registro(registro):
+    """
+    Reconstruye la respuesta que recibió el cliente a partir de un registro del
+    WAL o de la replicación.
+    """
+    return {campo: registro[campo] for campo in CAMPOS_RESPUESTA if campo in registro}
+
+def respuesta_en_curso(solicitud):
+    """
+    Respuesta a un duplicado cuyo original sigue en curso: no asigna nada y el
+    cliente debe reintentar más tarde con el mismo id_solicitud.
+    """
+    return {
+        "id_solicitud": solicitud["id_solicitud"],
+        "facultad": solicitud["facultad"],
+        "programa": solicitud["programa"],
+        "salones_asignados": 0,
+        "laboratorios_asignados": 0,
+        "estado": EN_CURSO
+    }
+
+class CacheIdempotencia:
+    """
+    Caché LRU acotada y con vencimiento de las respuestas ya enviadas, por
+    `id_solicitud`.
+
+    Un cliente que reenvía una solicitud (p. ej. una facultad tras un failover)
+    recibe la misma respuesta sin que se vuelvan a restar aulas. El lock de la
+    caché es independiente del de Recursos, así que un duplicado nunca toca el
+    lock de los recursos. Si el original sigue en curso, el duplicado espera su
+    resultado en vez de asignar por segunda vez.
+
+    Args:
+        capacidad (int): Ids recordados como máximo; se descartan los menos usados.
+        ttl (float): Segundos que se recuerda cada id desde que se atendió.
+    """
+    def __init__(self, capacidad=CAPACIDAD_IDEMPOTENCIA, ttl=TTL_IDEMPOTENCIA):
+        self.capacidad  = capacidad
+        self.ttl        = ttl
+        self.entradas   = OrderedDict()   # id -> (instante, respuesta, secuencia)
+        self.en_curso   = set()
+        self.aciertos   = 0
+        self.cond       = threading.Condition()
+
+    def reservar(self, id_solicitud, timeout=ESPERA_EN_CURSO):
+        """
+        Devuelve (respuesta, secuencia) si el id ya fue atendido. Si no, lo
+        marca en curso y devuelve None: el llamador debe atenderlo y luego
+        llamar a `completar` (o a `cancelar` si falla). Si el original sigue
+        en curso tras `timeout`, devuelve EN_CURSO: el llamador responde
+        `respuesta_en_curso` en vez de atenderlo por segunda vez.
+        """
+        limite = time.time() + timeout
+        with self.cond:
+            while True:
+                previa = self._obtener(id_solicitud)
+                if previa is not None:
+                    self.aciertos += 1
+                    return previa
+                if id_solicitud not in self.en_curso:
+                    self.en_curso.add(id_solicitud)
+                    return None
+                restante = limite - time.time()
+                if restante <= 0:
+                    # El original no terminó a tiempo: el cliente reintentará
+                    return EN_CURSO
+                self.cond.wait(restante)
+
+    def completar(self, id_solicitud, respuesta, secuencia, instante=None):
+        """
+        Guarda la respuesta de un id y despierta a los duplicados que la esperan.
+        """
+        ahora = time.time() if instante is None else instante
+        with self.cond:
+            self.en_curso.discard(id_solicitud)
+            self.entradas[id_solicitud] = (ahora, respuesta, secuencia)
+            self.entradas.move_to_end(id_solicitud)
+            self._purgar(time.time())
+            self.cond.notify_all()
+
+    def cancelar(self, id_solicitud):
+        with self.cond:
+            self.en_curso.discard(id_solicitud)
+            self.cond.notify_all()
+
+    def _obtener(self, id_solicitud):
+        # Requiere self.cond tomado
+        entrada = self.entradas.get(id_solicitud)
+        if entrada is None:
+            return None
+        if time.time() - entrada[0] > self.ttl:
+            del self.entradas[id_solicitud]
+            return None
+        self.entradas.move_to_end(id_solicitud)
+        return entrada[1], entrada[2]
+
+    def _purgar(self, ahora):
+        # Requiere self.cond tomado. Las entradas vencidas se acumulan al
+        # principio; basta con recorrer hasta la primera vigente.
+        while len(self.entradas) > self.capacidad:
+            self.entradas.popitem(last=False)
+        while self.entradas:
+            instante = next(iter(self.entradas.values()))[0]
+            if ahora - instante <= self.ttl:
+                break
+            self.entradas.popitem(last=False)
+
+    def capturar(self):
+        """
+        Entradas vigentes para una instantánea: [id, edad, respuesta, secuencia].
+        """
+        ahora = time.time()
+        with self.cond:
+            return [[id_solicitud, ahora - instante, respuesta, secuencia]
+                    for id_solicitud, (instante, respuesta, secuencia) in self.entradas.items()
+                    if ahora - instante <= self.ttl]
+
+    def restaurar(self, entradas):
+        """
+        Carga las entradas de `capturar` conservando su edad.
+        """
+        ahora = time.time()
+        for id_solicitud, edad, respuesta, secuencia in entradas:
+            self.completar(id_solicitud, respuesta, secuencia, ahora - edad)
+
+    def estado(self):
+        with self.cond:
+            return {"ids": len(self.entradas), "en_curso": len(self.en_curso), "duplicados": self.aciertos}
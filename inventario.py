@@ -0,0 +1,688 @@
+# inventario.py
+
+import os
+import csv
+import json
+import copy
+import threading
+from bisect import bisect_left
+
+# Tipos de aula que maneja el inventario
+SALON       = "salon"
+LABORATORIO = "laboratorio"
+TIPOS       = (SALON, LABORATORIO)
+
+# Estados de los registros de préstamo de aulas entre fragmentos
+CEDIDO    = "cedido"
+RECIBIDO  = "recibido"
+PRESTAMOS = (CEDIDO, RECIBIDO)
+
+# Franjas horarias por semana: lunes a sábado, 14 franjas de una hora (7:00-21:00)
+FRANJAS_SEMANA = 6 * 14
+
+# Archivo de aulas por defecto; si no existe se genera el campus clásico
+ARCHIVO_INVENTARIO = "aulas.csv"
+SALONES_POR_DEFECTO      = 380
+LABORATORIOS_POR_DEFECTO = 60
+
+class _IndiceTipo:
+    """
+    Índices de las aulas de un tipo. Cada aula tiene una posición fija (bit)
+    en orden de capacidad creciente, de modo que:
+
+      - `libres[s]` es un entero cuyo bit i indica si el aula i está libre en la franja s,
+      - `ocupadas_semestre` marca las aulas reservadas para todas las franjas,
+      - `sin_uso` marca las aulas sin ninguna reserva,
+      - `ajenas` marca las aulas que pertenecen a otro fragmento (nunca son candidatas),
+      - "capacidad >= C" es un sufijo de bits (se ubica con bisect),
+      - `por_edificio[e]` es la máscara de las aulas del edificio e.
+
+    Una consulta se resuelve con unas pocas operaciones AND sobre enteros de
+    n bits (n = aulas del tipo) en vez de recorrer aula por aula.
+    """
+    def __init__(self, aulas, num_franjas):
+        aulas = sorted(aulas, key=lambda a: (a["capacidad"], a["id"]))
+        self.ids         = [a["id"] for a in aulas]
+        self.capacidades = [a["capacidad"] for a in aulas]
+        self.todos       = (1 << len(aulas)) - 1
+        self.por_edificio = {}
+        for i, aula in enumerate(aulas):
+            edificio = aula.get("edificio", "")
+            self.por_edificio[edificio] = self.por_edificio.get(edificio, 0) | (1 << i)
+        self._por_capacidad = {}
+        self.num_franjas = num_franjas
+        self.ajenas      = 0
+        self.vaciar()
+
+    def vaciar(self):
+        self.ocupacion         = [0] * len(self.ids)   # por aula: bit s = ocupada en la franja s
+        self.libres            = [self.todos] * self.num_franjas
+        self.ocupadas_semestre = 0
+        self.sin_uso           = self.todos
+
+    def copiar(self):
+        # Las máscaras son enteros inmutables: basta con duplicar las listas
+        copia = copy.copy(self)
+        copia.ocupacion = list(self.ocupacion)
+        copia.libres    = list(self.libres)
+        return copia
+
+    def mascara_capacidad(self, capacidad_minima):
+        mascara = self._por_capacidad.get(capacidad_minima)
+        if mascara is None:
+            desde = bisect_left(self.capacidades, capacidad_minima)
+            mascara = self._por_capacidad[capacidad_minima] = self.todos & ~((1 << desde) - 1)
+        return mascara
+
+    def candidatas(self, capacidad_minima=0, edificio=None, franja=None):
+        if franja is None:
+            mascara = self.sin_uso
+        else:
+            mascara = self.libres[franja] & ~self.ocupadas_semestre
+        if capacidad_minima:
+            mascara &= self.mascara_capacidad(capacidad_minima)
+        if edificio is not None:
+            mascara &= self.por_edificio.get(edificio, 0)
+        return mascara & ~self.ajenas
+
+    def reservar(self, bits, franja=None):
+        """
+        Marca como ocupadas las aulas de la máscara `bits` en una franja o en
+        todo el semestre (franja None).
+        """
+        todas = (1 << self.num_franjas) - 1
+        if franja is None:
+            self.ocupadas_semestre |= bits
+            nuevas = todas
+        else:
+            self.libres[franja] &= ~bits
+            nuevas = 1 << franja
+        self.sin_uso &= ~bits
+        while bits:
+            bajo = bits & -bits
+            i = bajo.bit_length() - 1
+            self.ocupacion[i] |= nuevas
+            # Un aula ocupada franja a franja hasta llenarse cuenta como de semestre completo
+            if self.ocupacion[i] == todas:
+                self.ocupadas_semestre |= bajo
+            bits ^= bajo
+
+def _primeros_bits(mascara, cantidad):
+    """
+    Devuelve la máscara con los `cantidad` bits más bajos de `mascara`, es decir,
+    las aulas de menor capacidad que cumplen la consulta (mejor ajuste).
+    """
+    elegidos = 0
+    for _ in range(cantidad):
+        bajo = mascara & -mascara
+        elegidos |= bajo
+        mascara ^= bajo
+    return elegidos
+
+class Inventario:
+    """
+    Inventario de aulas del campus con disponibilidad por franja horaria.
+
+    Responde "k aulas del tipo T con capacidad >= C libres en la franja S"
+    mediante máscaras de bits precalculadas por tipo, franja, capacidad y
+    edificio, y devuelve los identificadores concretos de las aulas. Una
+    reserva sin franja ocupa el aula durante todo el semestre.
+
+    No es seguro entre hilos: el dueño (Recursos) lo protege con su lock.
+
+    Args:
+        aulas (list): Diccionarios con "id", "tipo", "capacidad" y opcionalmente "edificio".
+        num_franjas (int): Franjas horarias por semana (e.g., 84).
+    """
+    def __init__(self, aulas, num_franjas=FRANJAS_SEMANA):
+        vistas = set()
+        for aula in aulas:
+            if aula["tipo"] not in TIPOS:
+                raise ValueError(f"Tipo de aula desconocido: {aula['tipo']!r}")
+            if aula["id"] in vistas:
+                raise ValueError(f"Aula repetida en el inventario: {aula['id']!r}")
+            vistas.add(aula["id"])
+        self.num_franjas = num_franjas
+        self.indices = {tipo: _IndiceTipo([a for a in aulas if a["tipo"] == tipo], num_franjas)
+                        for tipo in TIPOS}
+        # id de aula -> (tipo, posición en su índice)
+        self.posiciones = {}
+        for tipo, indice in self.indices.items():
+            for i, id_aula in enumerate(indice.ids):
+                self.posiciones[id_aula] = (tipo, i)
+
+    def copiar(self):
+        """
+        Copia independiente del estado de ocupación (p. ej. para simular
+        asignaciones sin tocar el inventario real).
+        """
+        copia = copy.copy(self)
+        copia.indices = {tipo: indice.copiar() for tipo, indice in self.indices.items()}
+        return copia
+
+    def validar_franja(self, franja):
+        return franja is None or (isinstance(franja, int) and 0 <= franja < self.num_franjas)
+
+    def disponibles(self, tipo, capacidad_minima=0, edificio=None, franja=None):
+        """
+        Número de aulas de `tipo` que cumplen la consulta.
+        """
+        return self.indices[tipo].candidatas(capacidad_minima, edificio, franja).bit_count()
+
+    def asignar(self, cantidades, capacidad_minima=0, edificio=None, franja=None):
+        """
+        Reserva de forma atómica las aulas pedidas por tipo.
+
+        Args:
+            cantidades (dict): Tipo de aula -> número de aulas (e.g., {"salon": 3, "laboratorio": 1}).
+
+        Returns:
+            dict | None: Tipo -> lista de ids reservados, o None si algún tipo no
+            alcanza (en ese caso no se reserva nada).
+        """
+        if not self.validar_franja(franja):
+            return None
+        elegidas = {}
+        for tipo, cantidad in cantidades.items():
+            if cantidad < 0:
+                return None
+            candidatas = self.indices[tipo].candidatas(capacidad_minima, edificio, franja)
+            if candidatas.bit_count() < cantidad:
+                return None
+            elegidas[tipo] = _primeros_bits(candidatas, cantidad)
+        resultado = {}
+        for tipo, bits in elegidas.items():
+            indice = self.indices[tipo]
+            indice.reservar(bits, franja)
+            resultado[tipo] = self._ids(indice, bits)
+        return resultado
+
+    def reservar_ids(self, ids, franja=None):
+        """
+        Marca como ocupadas aulas concretas (al reproducir el WAL o aplicar una
+        replicación). Devuelve los ids que no existen en este inventario.
+        """
+        bits, desconocidos = self._mascaras(ids)
+        for tipo, mascara in bits.items():
+            if mascara:
+                self.indices[tipo].reservar(mascara, franja)
+        return desconocidos
+
+    def ocupadas_ids(self, ids, franja=None):
+        """
+        Ids de `ids` que ya no están libres en la franja (o en todo el
+        semestre, con franja None). Los ids desconocidos se ignoran.
+        """
+        libres = {tipo: indice.candidatas(franja=franja) for tipo, indice in self.indices.items()}
+        ocupadas = []
+        for id_aula in ids:
+            posicion = self.posiciones.get(id_aula)
+            if posicion is not None and not libres[posicion[0]] >> posicion[1] & 1:
+                ocupadas.append(id_aula)
+        return ocupadas
+
+    def ceder(self, cantidades, capacidad_minima=0, edificio=None):
+        """
+        Entrega a otro fragmento hasta `cantidades` aulas por tipo sin ninguna
+        reserva que cumplan las restricciones (las de menor capacidad primero).
+        Puede entregar menos de las pedidas; las entregadas pasan a ser ajenas.
+
+        Returns:
+            dict: Tipo -> lista de ids cedidos.
+        """
+        cedidas = {}
+        for tipo, cantidad in cantidades.items():
+            indice = self.indices[tipo]
+            bits = _primeros_bits(indice.candidatas(capacidad_minima, edificio), max(0, cantidad))
+            indice.ajenas |= bits
+            cedidas[tipo] = self._ids(indice, bits)
+        return cedidas
+
+    def ceder_ids(self, ids):
+        """
+        Marca como ajenas aulas concretas (al reproducir una cesión o al
+        repartir el catálogo entre fragmentos).
+        """
+        bits, desconocidos = self._mascaras(ids)
+        for tipo, mascara in bits.items():
+            self.indices[tipo].ajenas |= mascara
+        return desconocidos
+
+    def recibir_ids(self, ids):
+        """
+        Marca como propias aulas que cedió otro fragmento.
+        """
+        bits, desconocidos = self._mascaras(ids)
+        for tipo, mascara in bits.items():
+            self.indices[tipo].ajenas &= ~mascara
+        return desconocidos
+
+    def _mascaras(self, ids):
+        bits = {tipo: 0 for tipo in TIPOS}
+        desconocidos = []
+        for id_aula in ids:
+            posicion = self.posiciones.get(id_aula)
+            if posicion is None:
+                desconocidos.append(id_aula)
+                continue
+            tipo, i = posicion
+            bits[tipo] |= 1 << i
+        return bits, desconocidos
+
+    def _ids(self, indice, bits):
+        ids = []
+        while bits:
+            bajo = bits & -bits
+            ids.append(indice.ids[bajo.bit_length() - 1])
+            bits ^= bajo
+        return ids
+
+    def capturar(self):
+        """
+        Estado serializable para una instantánea: ocupación de cada aula usada
+        y aulas ajenas (de otros fragmentos).
+        """
+        ocupacion = {}
+        ajenas = []
+        for indice in self.indices.values():
+            for id_aula, bits in zip(indice.ids, indice.ocupacion):
+                if bits:
+                    ocupacion[id_aula] = bits
+            ajenas.extend(self._ids(indice, indice.ajenas))
+        return {"num_franjas": self.num_franjas, "ocupacion": ocupacion, "ajenas": ajenas}
+
+    def restaurar(self, estado):
+        """
+        Reconstruye los índices a partir de una instantánea de `capturar`.
+        """
+        if estado["num_franjas"] != self.num_franjas:
+            raise ValueError(f"La instantánea tiene {estado['num_franjas']} franjas y el "
+                             f"inventario {self.num_franjas}")
+        completa = (1 << self.num_franjas) - 1
+        for indice in self.indices.values():
+            indice.vaciar()
+        if "ajenas" in estado:
+            # Sin la clave (instantánea anterior a los fragmentos) se conserva el reparto inicial
+            for indice in self.indices.values():
+                indice.ajenas = 0
+            self.ceder_ids(estado["ajenas"])
+        for id_aula, bits in estado["ocupacion"].items():
+            posicion = self.posiciones.get(id_aula)
+            if posicion is None:
+                continue
+            tipo, i = posicion
+            indice = self.indices[tipo]
+            if bits == completa:
+                indice.reservar(1 << i)
+                continue
+            franjas = bits
+            while franjas:
+                bajo = franjas & -franjas
+                indice.reservar(1 << i, bajo.bit_length() - 1)
+                franjas ^= bajo
+
+    def resumen(self):
+        """
+        Totales por tipo para las métricas: aulas propias, sin ninguna reserva
+        y reservadas para todo el semestre, más las ajenas (de otros fragmentos).
+        """
+        return {
+            tipo: {
+                "total": len(indice.ids) - indice.ajenas.bit_count(),
+                "sin_uso": (indice.sin_uso & ~indice.ajenas).bit_count(),
+                "ocupadas_semestre": indice.ocupadas_semestre.bit_count(),
+                "ajenas": indice.ajenas.bit_count()
+            }
+            for tipo, indice in self.indices.items()
+        }
+
+def aplicar_registro(inventario, registro):
+    """
+    Reproduce sobre `inventario` una asignación ya decidida (registro del WAL o
+    replicado). Los registros anteriores al inventario no traen ids: se
+    reservan por cantidad con el mismo criterio de mejor ajuste. Reservar dos
+    veces los mismos ids no cambia nada, así que reproducir un registro que ya
+    estaba en la instantánea es inofensivo. Los registros "cedido" y
+    "recibido" (préstamos entre fragmentos) cambian las aulas ajenas.
+    """
+    if registro["estado"] in PRESTAMOS:
+        ids = registro.get("salones_ids", []) + registro.get("laboratorios_ids", [])
+        if registro["estado"] == CEDIDO:
+            inventario.ceder_ids(ids)
+        else:
+            inventario.recibir_ids(ids)
+        return
+    if registro["estado"] != "asignado":
+        return
+    franja = registro.get("franja")
+    if "salones_ids" in registro or "laboratorios_ids" in registro:
+        desconocidos = inventario.reservar_ids(
+            registro.get("salones_ids", []) + registro.get("laboratorios_ids", []), franja)
+        if desconocidos:
+            print(f"⚠️  Aulas fuera del inventario en la secuencia {registro['secuencia']}: {desconocidos}")
+        return
+    inventario.asignar({SALON: registro["salones_asignados"],
+                        LABORATORIO: registro["laboratorios_asignados"]}, franja=franja)
+
+# Campos sin los que una solicitud no se puede asignar
+CAMPOS_SOLICITUD = ("salones", "laboratorios", "facultad", "programa")
+
+def _es_entero(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+def validar_solicitud(solicitud):
+    """
+    Motivo por el que una solicitud no puede asignarse, o None. Se revisa al
+    recibirla, antes de la caché de idempotencia y de los locks, para que un
+    valor mal formado (p. ej. "2" o 1.5 salones) se responda como rechazo en
+    lugar de fallar en medio de la asignación.
+    """
+    faltantes = [campo for campo in CAMPOS_SOLICITUD if campo not in solicitud]
+    if faltantes:
+        return f"faltan los campos {faltantes}"
+    for campo in ("salones", "laboratorios", "capacidad_minima"):
+        valor = solicitud.get(campo, 0)
+        if not _es_entero(valor) or valor < 0:
+            return f"{campo} debe ser un entero no negativo: {valor!r}"
+    franja = solicitud.get("franja")
+    if franja is not None and (not _es_entero(franja) or franja < 0):
+        return f"franja debe ser un entero no negativo: {franja!r}"
+    for campo in ("facultad", "programa", "semestre", "campus", "edificio"):
+        valor = solicitud.get(campo)
+        if valor is not None and not isinstance(valor, str):
+            return f"{campo} debe ser una cadena: {valor!r}"
+    return None
+
+def respuesta_invalida(solicitud, motivo):
+    """
+    Rechazo de una solicitud que no pasó `validar_solicitud`. No se numera ni
+    se replica: no cambió nada del estado.
+    """
+    respuesta = {
+        "facultad": solicitud.get("facultad"),
+        "programa": solicitud.get("programa"),
+        "salones_asignados": 0,
+        "laboratorios_asignados": 0,
+        "estado": "rechazado",
+        "error": motivo
+    }
+    if "id_solicitud" in solicitud:
+        respuesta["id_solicitud"] = solicitud["id_solicitud"]
+    return respuesta
+
+def clave_pool(semestre, campus=""):
+    """
+    Nombre de un pool en métricas e instantáneas (e.g., "2025-10" o "2025-10@Norte").
+    """
+    return f"{semestre}@{campus}" if campus else semestre
+
+class Pool:
+    """
+    Inventario independiente de un semestre y un campus, con su propio lock, y
+    el índice de asignaciones vigentes por facultad para las consultas.
+    """
+    def __init__(self, semestre, campus, inventario):
+        self.semestre     = semestre
+        self.campus       = campus
+        self.inventario   = inventario
+        self.asignaciones = {}    # facultad -> {secuencia: [programa, salones_ids, laboratorios_ids, franja]}
+        self.lock         = threading.Lock()
+
+    def anotar(self, registro):
+        """
+        Agrega una asignación al índice por facultad. Requiere el lock del pool
+        (y al numerar también el global, por las instantáneas); anotar dos
+        veces la misma secuencia no cambia nada.
+
+        Solo se anotan asignaciones que ocupan alguna aula, así el índice no
+        crece más que las aulas por franja del pool (una de 0 salones y 0
+        laboratorios no tiene nada que consultar).
+        """
+        if registro["estado"] != "asignado":
+            return
+        if not any(registro.get(campo) for campo in ("salones_asignados", "laboratorios_asignados",
+                                                     "salones_ids", "laboratorios_ids")):
+            return
+        por_secuencia = self.asignaciones.setdefault(registro["facultad"], {})
+        por_secuencia[registro["secuencia"]] = [
+            registro["programa"],
+            registro.get("salones_ids", []),
+            registro.get("laboratorios_ids", []),
+            registro.get("franja")
+        ]
+
+    def listar(self, facultad):
+        """
+        Asignaciones de una facultad ordenadas por secuencia. Requiere el lock del pool.
+        """
+        return [
+            {"secuencia": secuencia, "programa": programa, "salones_ids": salones_ids,
+             "laboratorios_ids": laboratorios_ids, "franja": franja}
+            for secuencia, (programa, salones_ids, laboratorios_ids, franja)
+            in sorted(self.asignaciones.get(facultad, {}).items())
+        ]
+
+class PoolsAulas:
+    """
+    Pools de aulas por (semestre, campus), creados de forma perezosa con la
+    primera solicitud de cada combinación.
+
+    Cada pool tiene su lock, de modo que los trabajadores que atienden
+    semestres o campus distintos no se bloquean entre sí. El lock del registro
+    solo se toma para crear un pool nuevo; las búsquedas de pools existentes
+    van sin lock (un dict de Python es seguro para lecturas concurrentes).
+
+    En un despliegue por fragmentos cada pool nace con las aulas de otros
+    fragmentos marcadas como ajenas; luego cambian con los préstamos.
+
+    Args:
+        aulas (list): Aulas del catálogo; la clave opcional "campus" las reparte entre campus.
+        num_franjas (int): Franjas horarias por semana.
+        propias (set): Ids de las aulas de este fragmento (None = todas).
+    """
+    def __init__(self, aulas, num_franjas=FRANJAS_SEMANA, propias=None):
+        self.num_franjas      = num_franjas
+        self.aulas_por_campus = {}
+        self.campus_de_aula   = {}
+        self.ajenas           = {}    # campus -> ids de aulas de otros fragmentos
+        for aula in aulas:
+            campus = aula.get("campus", "")
+            self.aulas_por_campus.setdefault(campus, []).append(aula)
+            self.campus_de_aula[aula["id"]] = campus
+            if propias is not None and aula["id"] not in propias:
+                self.ajenas.setdefault(campus, []).append(aula["id"])
+        # Valida tipos e ids repetidos una sola vez, al cargar
+        Inventario(aulas, num_franjas)
+        self.pools = {}
+        # Reentrante: la Réplica rehace los pools con el cerrojo de captura tomado
+        self.lock  = threading.RLock()
+
+    def obtener(self, semestre, campus=""):
+        """
+        Devuelve el pool de (semestre, campus), creándolo si hace falta, o None
+        si el campus no existe en el catálogo.
+        """
+        clave = (semestre, campus)
+        pool = self.pools.get(clave)
+        if pool is None:
+            if campus not in self.aulas_por_campus:
+                return None
+            with self.lock:
+                pool = self.pools.get(clave)
+                if pool is None:
+                    inventario = Inventario(self.aulas_por_campus[campus], self.num_franjas)
+                    inventario.ceder_ids(self.ajenas.get(campus, ()))
+                    pool = self.pools[clave] = Pool(semestre, campus, inventario)
+        return pool
+
+    def campus_de_registro(self, registro):
+        """
+        Campus de un registro: el de sus aulas (los registros replicados no
+        llevan el campus), o su campo "campus" si no tiene aulas.
+        """
+        ids = registro.get("salones_ids", []) + registro.get("laboratorios_ids", [])
+        return self.campus_de_aula.get(ids[0], "") if ids else registro.get("campus", "")
+
+    def pool_de_registro(self, registro):
+        """
+        Pool al que pertenece un registro: su semestre y el campus de sus aulas.
+        """
+        return self.obtener(registro.get("semestre", ""), self.campus_de_registro(registro))
+
+    def aplicar_registro(self, registro, numerar=None):
+        """
+        Reproduce un registro del WAL o de la replicación en su pool.
+
+        Args:
+            registro (dict): Registro con su secuencia.
+            numerar (callable): Se invoca sin argumentos todavía bajo el lock
+                del pool (para avanzar la secuencia en el mismo corte).
+        """
+        pool = None
+        if registro["estado"] == "asignado" or registro["estado"] in PRESTAMOS:
+            pool = self.pool_de_registro(registro)
+            if pool is None:
+                print(f"⚠️  Registro {registro['secuencia']} de un campus desconocido")
+        if pool is None:
+            if numerar is not None:
+                numerar()
+            return
+        with pool.lock:
+            aplicar_registro(pool.inventario, registro)
+            pool.anotar(registro)
+            if numerar is not None:
+                numerar()
+
+    def existentes(self, semestre=None, campus=None):
+        """
+        Pools ya creados, filtrados por semestre y/o campus (None = todos).
+        """
+        return [pool for pool in self._lista()
+                if (semestre is None or pool.semestre == semestre)
+                and (campus is None or pool.campus == campus)]
+
+    def _lista(self):
+        with self.lock:
+            return list(self.pools.values())
+
+    def reiniciar(self):
+        """
+        Descarta todos los pools (antes de instalar una instantánea completa).
+        """
+        with self.lock:
+            self.pools = {}
+
+    def capturar(self):
+        """
+        Estado serializable de todos los pools. Requiere un `CerrojoPools`
+        tomado: así ninguna asignación queda capturada sin su secuencia.
+        """
+        return [
+            {"semestre": pool.semestre, "campus": pool.campus, "inventario": pool.inventario.capturar(),
+             "asignaciones": {facultad: [[secuencia] + datos for secuencia, datos in por_secuencia.items()]
+                              for facultad, por_secuencia in pool.asignaciones.items()}}
+            for pool in self._lista()
+        ]
+
+    def restaurar(self, estado):
+        """
+        Recrea los pools a partir de `capturar`.
+        """
+        for entrada in estado:
+            pool = self.obtener(entrada["semestre"], entrada["campus"])
+            if pool is not None:
+                with pool.lock:
+                    pool.inventario.restaurar(entrada["inventario"])
+                    for facultad, filas in entrada.get("asignaciones", {}).items():
+                        pool.asignaciones[facultad] = {fila[0]: fila[1:] for fila in filas}
+
+    def resumen(self):
+        """
+        Resumen de ocupación de cada pool, por nombre de pool.
+        """
+        resumen = {}
+        for pool in self._lista():
+            with pool.lock:
+                resumen[clave_pool(pool.semestre, pool.campus)] = pool.inventario.resumen()
+        return resumen
+
+class CerrojoPools:
+    """
+    Lock compuesto para capturar un corte exacto del estado. Toma el registro
+    de pools (no se crean pools nuevos), el lock de cada pool en orden de clave
+    y al final el lock global, en el mismo orden pool -> global que los hilos
+    de atención. Como cada asignación se numera sin soltar el lock de su pool,
+    mientras está tomado no hay ninguna decidida y todavía sin secuencia.
+
+    Args:
+        pools (PoolsAulas): Pools a congelar.
+        lock_global (threading.Lock): Lock con el que se numeran las asignaciones.
+    """
+    def __init__(self, pools, lock_global):
+        self.pools       = pools
+        self.lock_global = lock_global
+        self.tomados     = []
+
+    def __enter__(self):
+        self.pools.lock.acquire()
+        # Con el registro tomado solo un hilo a la vez llega hasta aquí
+        self.tomados = [self.pools.pools[clave].lock for clave in sorted(self.pools.pools)]
+        for lock in self.tomados:
+            lock.acquire()
+        self.lock_global.acquire()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.lock_global.release()
+        # Se sueltan los locks tomados aunque `reiniciar` haya cambiado los pools
+        for lock in reversed(self.tomados):
+            lock.release()
+        self.tomados = []
+        self.pools.lock.release()
+
+def aulas_por_defecto(salones=SALONES_POR_DEFECTO, laboratorios=LABORATORIOS_POR_DEFECTO):
+    """
+    Campus clásico del sistema (380 salones y 60 laboratorios) con ids S001.. y L01..
+    """
+    return ([{"id": f"S{i:03d}", "tipo": SALON, "capacidad": 0, "edificio": "", "campus": ""}
+             for i in range(1, salones + 1)] +
+            [{"id": f"L{i:02d}", "tipo": LABORATORIO, "capacidad": 0, "edificio": "", "campus": ""}
+             for i in range(1, laboratorios + 1)])
+
+def leer_aulas(ruta):
+    """
+    Lee las aulas de un CSV (columnas id,tipo,capacidad,edificio,campus) o de
+    un JSON con una lista de objetos con las mismas claves.
+    """
+    with open(ruta, newline="", encoding="utf-8") as f:
+        if ruta.endswith(".json"):
+            filas = json.load(f)
+        else:
+            filas = list(csv.DictReader(f))
+    return [
+        {
+            "id": str(fila["id"]).strip(),
+            "tipo": str(fila["tipo"]).strip().lower(),
+            "capacidad": int(fila.get("capacidad") or 0),
+            "edificio": str(fila.get("edificio") or "").strip(),
+            "campus": str(fila.get("campus") or "").strip()
+        }
+        for fila in filas
+    ]
+
+def cargar_aulas(ruta=ARCHIVO_INVENTARIO):
+    """
+    Aulas de `ruta`; si no se indica o no existe, el campus clásico de aulas_por_defecto().
+    """
+    if ruta is not None and os.path.exists(ruta):
+        aulas = leer_aulas(ruta)
+        print(f"Inventario cargado de {ruta}: {len(aulas)} aulas.")
+        return aulas
+    return aulas_por_defecto()
+
+def cargar_pools(ruta=ARCHIVO_INVENTARIO, num_franjas=FRANJAS_SEMANA):
+    """
+    Crea los pools de aulas desde `ruta`; si no se indica o no existe, usa el
+    campus clásico de aulas_por_defecto().
+    """
+    return PoolsAulas(cargar_aulas(ruta), num_franjas)
@@ -0,0 +1,125 @@
+# latidos.py
+
+import threading
+import time
+
+import zmq
+
+# Cada servidor publica sus latidos en su puerto + DESFASE_LATIDOS (3389 -> 3489)
+DESFASE_LATIDOS     = 100
+INTERVALO_LATIDO    = 0.1    # segundos entre latidos publicados
+UMBRAL_FALLO        = 0.35   # segundos sin latidos para dar un servidor por caído
+ESTABILIDAD_RETORNO = 1.0    # segundos de latidos continuos antes de volver a un servidor preferido
+
+def endpoint_latidos(puerto):
+    """
+    Endpoint PUB de latidos para un servidor que atiende en `puerto`, o None si
+    el servidor usa un endpoint no TCP (p. ej. inproc:// en pruebas de carga).
+    """
+    if isinstance(puerto, str):
+        return None
+    return f"tcp://*:{puerto + DESFASE_LATIDOS}"
+
+class Latidor:
+    """
+    Publica latidos [b"latido", rol, secuencia] por un socket PUB cada
+    INTERVALO_LATIDO segundos. La secuencia permite a los suscriptores saber
+    cuánto va atrasada la Réplica respecto al Central en un failover.
+
+    Args:
+        context (zmq.Context): Contexto ZeroMQ del servidor.
+        endpoint (str): Endpoint donde hacer bind del PUB (e.g., "tcp://*:3489").
+        rol (str): "central" o "respaldo".
+        obtener_secuencia (callable): Devuelve la última secuencia del servidor.
+    """
+    def __init__(self, context, endpoint, rol, obtener_secuencia, intervalo=INTERVALO_LATIDO):
+        self.context           = context
+        self.endpoint          = endpoint
+        self.rol               = rol.encode("utf-8")
+        self.obtener_secuencia = obtener_secuencia
+        self.intervalo         = intervalo
+
+    def iniciar(self):
+        hilo = threading.Thread(target=self._bucle)
+        hilo.daemon = True
+        hilo.start()
+        return hilo
+
+    def _bucle(self):
+        # El socket vive solo en este hilo
+        socket = self.context.socket(zmq.PUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.bind(self.endpoint)
+        while True:
+            secuencia = str(self.obtener_secuencia()).encode("utf-8")
+            socket.send_multipart([b"latido", self.rol, secuencia])
+            time.sleep(self.intervalo)
+
+class MonitorLatidos:
+    """
+    Suscriptor de los latidos de varios servidores ordenados por prioridad
+    (primero el Central, luego la Réplica). Decide cuál debe ser el servidor
+    activo: se cambia al siguiente servidor vivo en cuanto el actual supera
+    UMBRAL_FALLO sin latidos, y se vuelve a uno de mayor prioridad cuando éste
+    lleva ESTABILIDAD_RETORNO segundos publicando sin cortes.
+
+    No tiene hilo propio: el dueño registra `sockets` en su zmq.Poller, llama a
+    `procesar` cuando hay eventos y a `elegir` periódicamente.
+
+    Args:
+        context (zmq.Context): Contexto ZeroMQ.
+        endpoints (list): Endpoints PUB de latidos por prioridad (e.g., ["tcp://ip:3489", "tcp://ip:3490"]).
+    """
+    def __init__(self, context, endpoints, umbral=UMBRAL_FALLO, estabilidad=ESTABILIDAD_RETORNO):
+        self.umbral      = umbral
+        self.estabilidad = estabilidad
+        self.sockets     = []
+        for endpoint in endpoints:
+            socket = context.socket(zmq.SUB)
+            socket.setsockopt(zmq.LINGER, 0)
+            socket.setsockopt(zmq.SUBSCRIBE, b"latido")
+            socket.connect(endpoint)
+            self.sockets.append(socket)
+        self.ultimo      = [None] * len(endpoints)   # instante del último latido
+        self.vivo_desde  = [None] * len(endpoints)   # inicio de la racha actual de latidos
+        self.secuencias  = [0] * len(endpoints)      # última secuencia anunciada
+        self.actual      = 0
+        self.inicio      = time.time()
+
+    def procesar(self, socket, ahora=None):
+        """
+        Consume todos los latidos pendientes de `socket`.
+        """
+        ahora = time.time() if ahora is None else ahora
+        i = self.sockets.index(socket)
+        while True:
+            try:
+                _, _, secuencia = socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if self.vivo_desde[i] is None or not self._vivo(i, ahora):
+                self.vivo_desde[i] = ahora
+            self.ultimo[i] = ahora
+            self.secuencias[i] = int(secuencia)
+
+    def _vivo(self, i, ahora):
+        return self.ultimo[i] is not None and ahora - self.ultimo[i] <= self.umbral
+
+    def elegir(self, ahora=None):
+        """
+        Devuelve el índice del servidor que debe estar activo y lo fija como actual.
+        """
+        ahora = time.time() if ahora is None else ahora
+        # Volver a un servidor de mayor prioridad si ya está estable
+        for i in range(self.actual):
+            if self._vivo(i, ahora) and ahora - self.vivo_desde[i] >= self.estabilidad:
+                self.actual = i
+                return i
+        # Abandonar el actual solo si dejó de latir y hay otro vivo (al arrancar se
+        # le da un umbral de gracia para que lleguen sus primeros latidos)
+        if not self._vivo(self.actual, ahora) and ahora - self.inicio > self.umbral:
+            for i in range(len(self.sockets)):
+                if i != self.actual and self._vivo(i, ahora):
+                    self.actual = i
+                    return i
+        return self.actual
@@ -0,0 +1,352 @@
+# persistencia.py
+
+import os
+import json
+import zlib
+import struct
+import threading
+import time
+
+# --- FORMATO EN DISCO ---
+#
+# Segmentos del WAL:   wal_<primera_secuencia>.log
+#   cabecera:  b"AWAL" + versión (1 byte)
+#   registro:  longitud (uint32) + cuerpo + crc32 del cuerpo (uint32)
+#   cuerpo:    secuencia (uint64), salones (int32), laboratorios (int32),
+#              estado (uint8) y tres cadenas uint16+utf-8: facultad, programa, semestre
+#   versión 2 agrega al cuerpo: franja (int32, -1 = todo el semestre) y dos
+#              listas uint16 de cadenas: ids de salones e ids de laboratorios
+#   versión 3 agrega al final: id_solicitud (cadena uint16+utf-8, vacía si no hay)
+#   estado: 0 rechazado, 1 asignado, 2 cedido y 3 recibido (préstamos entre fragmentos)
+#
+# Instantánea:         instantanea.bin
+#   cabecera:  b"ASNP" + versión (1 byte) + secuencia (uint64) + crc32 (uint32) + longitud (uint32)
+#   cuerpo:    estado en JSON comprimido con zlib
+
+VERSION_FORMATO = 1     # instantánea
+VERSION_WAL     = 3     # segmentos del WAL (se siguen leyendo los de versiones 1 y 2)
+MAGIA_WAL       = b"AWAL"
+MAGIA_SNAPSHOT  = b"ASNP"
+
+CABECERA_WAL      = MAGIA_WAL + bytes([VERSION_WAL])
+LONGITUD          = struct.Struct("<I")
+CUERPO_REGISTRO   = struct.Struct("<QiiB")
+CABECERA_SNAPSHOT = struct.Struct("<4sBQII")
+CADENA            = struct.Struct("<H")
+FRANJA            = struct.Struct("<i")
+
+ESTADOS = {"rechazado": 0, "asignado": 1, "cedido": 2, "recibido": 3}
+ESTADOS_INVERSO = {v: k for k, v in ESTADOS.items()}
+
+# Parámetros por defecto del motor de estado
+INSTANTANEA_CADA_REGISTROS = 10000   # tomar instantánea cada N registros
+INSTANTANEA_CADA_SEGUNDOS  = 60.0    # ... o cada T segundos si hubo cambios
+
+def codificar_registro(registro):
+    """
+    Serializa un registro de asignación al formato binario del WAL.
+    """
+    cuerpo = CUERPO_REGISTRO.pack(
+        registro["secuencia"],
+        registro["salones_asignados"],
+        registro["laboratorios_asignados"],
+        ESTADOS[registro["estado"]]
+    )
+    for campo in ("facultad", "programa", "semestre"):
+        texto = str(registro.get(campo, "")).encode("utf-8")
+        cuerpo += CADENA.pack(len(texto)) + texto
+    franja = registro.get("franja")
+    cuerpo += FRANJA.pack(-1 if franja is None else franja)
+    for campo in ("salones_ids", "laboratorios_ids"):
+        ids = registro.get(campo, [])
+        cuerpo += CADENA.pack(len(ids))
+        for id_aula in ids:
+            texto = id_aula.encode("utf-8")
+            cuerpo += CADENA.pack(len(texto)) + texto
+    texto = registro.get("id_solicitud", "").encode("utf-8")
+    cuerpo += CADENA.pack(len(texto)) + texto
+    return LONGITUD.pack(len(cuerpo)) + cuerpo + LONGITUD.pack(zlib.crc32(cuerpo))
+
+def _leer_cadena(cuerpo, posicion):
+    (largo,) = CADENA.unpack_from(cuerpo, posicion)
+    posicion += CADENA.size
+    return cuerpo[posicion:posicion + largo].decode("utf-8"), posicion + largo
+
+def decodificar_registro(cuerpo, version=VERSION_WAL):
+    """
+    Reconstruye el diccionario de asignación a partir del cuerpo binario.
+    """
+    secuencia, salones, laboratorios, estado = CUERPO_REGISTRO.unpack_from(cuerpo, 0)
+    posicion = CUERPO_REGISTRO.size
+    campos = {}
+    for campo in ("facultad", "programa", "semestre"):
+        campos[campo], posicion = _leer_cadena(cuerpo, posicion)
+    registro = {
+        "secuencia": secuencia,
+        "facultad": campos["facultad"],
+        "programa": campos["programa"],
+        "semestre": campos["semestre"],
+        "salones_asignados": salones,
+        "laboratorios_asignados": laboratorios,
+        "estado": ESTADOS_INVERSO[estado]
+    }
+    if version >= 2:
+        (franja,) = FRANJA.unpack_from(cuerpo, posicion)
+        posicion += FRANJA.size
+        if franja >= 0:
+            registro["franja"] = franja
+        for campo in ("salones_ids", "laboratorios_ids"):
+            (cantidad,) = CADENA.unpack_from(cuerpo, posicion)
+            posicion += CADENA.size
+            ids = []
+            for _ in range(cantidad):
+                id_aula, posicion = _leer_cadena(cuerpo, posicion)
+                ids.append(id_aula)
+            if ids:
+                registro[campo] = ids
+    if version >= 3:
+        id_solicitud, posicion = _leer_cadena(cuerpo, posicion)
+        if id_solicitud:
+            registro["id_solicitud"] = id_solicitud
+    return registro
+
+def leer_segmento(ruta):
+    """
+    Recorre los registros válidos de un segmento. Devuelve (registros, bytes_validos);
+    un registro truncado o con CRC inválido marca el final del segmento.
+    """
+    registros = []
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    if datos[:len(MAGIA_WAL)] != MAGIA_WAL or len(datos) <= len(MAGIA_WAL):
+        return registros, 0
+    version = datos[len(MAGIA_WAL)]
+    if not 1 <= version <= VERSION_WAL:
+        return registros, 0
+    posicion = len(CABECERA_WAL)
+    while posicion + LONGITUD.size <= len(datos):
+        (largo,) = LONGITUD.unpack_from(datos, posicion)
+        fin = posicion + LONGITUD.size + largo + LONGITUD.size
+        if fin > len(datos):
+            break
+        cuerpo = datos[posicion + LONGITUD.size:fin - LONGITUD.size]
+        (crc,) = LONGITUD.unpack_from(datos, fin - LONGITUD.size)
+        if zlib.crc32(cuerpo) != crc:
+            break
+        registros.append(decodificar_registro(cuerpo, version))
+        posicion = fin
+    return registros, posicion
+
+class DiarioEstado:
+    """
+    Motor de estado durable: WAL binario de solo-anexado con group commit e
+    instantáneas periódicas.
+
+    Los hilos de atención llaman a `registrar` bajo el lock del estado (para que
+    el orden del WAL sea el orden real de las asignaciones) y luego a `esperar`
+    fuera del lock. Un hilo escritor vacía en cada pasada todo lo acumulado con
+    un único write + fsync, de modo que un fsync cubre muchas solicitudes bajo
+    carga. Cada cierto número de registros o de segundos el escritor toma una
+    instantánea del estado, abre un segmento nuevo y borra los anteriores, con
+    lo que la recuperación solo reproduce la cola del WAL.
+
+    Args:
+        directorio (str): Carpeta donde viven los segmentos y la instantánea.
+        lock_estado (threading.Lock | CerrojoPools): Lock (o context manager)
+            que congela el estado a capturar.
+        capturar (callable): Devuelve (secuencia, estado_dict); se invoca con
+            `lock_estado` tomado.
+        fsync (bool): Si es False solo se hace flush (más rápido, menos durable).
+    """
+    def __init__(self, directorio, lock_estado, capturar, fsync=True,
+                 cada_registros=INSTANTANEA_CADA_REGISTROS,
+                 cada_segundos=INSTANTANEA_CADA_SEGUNDOS):
+        self.directorio     = directorio
+        self.lock_estado    = lock_estado
+        self.capturar       = capturar
+        self.fsync          = fsync
+        self.cada_registros = cada_registros
+        self.cada_segundos  = cada_segundos
+
+        self.buffer         = []      # registros codificados pendientes de escribir
+        self.ultima         = 0       # última secuencia encolada
+        self.durable        = 0       # última secuencia en disco
+        self.desde_snapshot = 0       # registros escritos desde la última instantánea
+        self.cond           = threading.Condition()
+        # Serializa las escrituras del hilo escritor con `reiniciar`
+        self.escritura      = threading.Lock()
+        self.archivo        = None
+
+        os.makedirs(directorio, exist_ok=True)
+
+    # --- RECUPERACIÓN ---
+
+    def _segmentos(self):
+        nombres = [n for n in os.listdir(self.directorio)
+                   if n.startswith("wal_") and n.endswith(".log")]
+        return sorted(os.path.join(self.directorio, n) for n in nombres)
+
+    def _ruta_snapshot(self):
+        return os.path.join(self.directorio, "instantanea.bin")
+
+    def cargar_instantanea(self):
+        """
+        Devuelve (secuencia, estado) de la última instantánea válida o (0, None).
+        """
+        ruta = self._ruta_snapshot()
+        if not os.path.exists(ruta):
+            return 0, None
+        with open(ruta, "rb") as f:
+            datos = f.read()
+        if len(datos) < CABECERA_SNAPSHOT.size:
+            return 0, None
+        magia, version, secuencia, crc, largo = CABECERA_SNAPSHOT.unpack_from(datos, 0)
+        cuerpo = datos[CABECERA_SNAPSHOT.size:CABECERA_SNAPSHOT.size + largo]
+        if magia != MAGIA_SNAPSHOT or version != VERSION_FORMATO or zlib.crc32(cuerpo) != crc:
+            return 0, None
+        return secuencia, json.loads(zlib.decompress(cuerpo).decode("utf-8"))
+
+    def recuperar(self):
+        """
+        Carga la última instantánea y la cola del WAL posterior a ella. Trunca un
+        registro final incompleto (escritura interrumpida) y deja el diario listo
+        para anexar.
+
+        Returns:
+            tuple: (estado de la instantánea o None, lista de registros a reproducir)
+        """
+        secuencia_snapshot, estado = self.cargar_instantanea()
+        registros = []
+        for ruta in self._segmentos():
+            leidos, validos = leer_segmento(ruta)
+            if validos and validos < os.path.getsize(ruta):
+                with open(ruta, "r+b") as f:
+                    f.truncate(validos)
+            registros.extend(r for r in leidos if r["secuencia"] > secuencia_snapshot)
+
+        self.ultima = self.durable = registros[-1]["secuencia"] if registros else secuencia_snapshot
+        self.desde_snapshot = len(registros)
+        return estado, registros
+
+    # --- ESCRITURA ---
+
+    def iniciar(self):
+        self._abrir_segmento(self.ultima + 1)
+        hilo = threading.Thread(target=self._bucle)
+        hilo.daemon = True
+        hilo.start()
+        return hilo
+
+    def registrar(self, registro):
+        """
+        Encola un registro para el WAL. Debe llamarse bajo el lock que numera los registros.
+        """
+        with self.cond:
+            self.buffer.append(codificar_registro(registro))
+            self.ultima = registro["secuencia"]
+            self.cond.notify_all()
+
+    def esperar(self, secuencia, timeout=None):
+        """
+        Bloquea hasta que `secuencia` esté en disco. Devuelve True si lo está.
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: self.durable >= secuencia, timeout)
+
+    def cerrar(self):
+        """
+        Vacía lo pendiente y cierra el segmento actual.
+        """
+        with self.cond:
+            pendiente, self.buffer = self.buffer, []
+            ultima = self.ultima
+        self._escribir(pendiente, ultima)
+        self.archivo.close()
+
+    def _abrir_segmento(self, primera_secuencia):
+        ruta = os.path.join(self.directorio, f"wal_{primera_secuencia:020d}.log")
+        # Un segmento con solo la cabecera (quizá de una versión anterior) se reescribe
+        nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) <= len(CABECERA_WAL)
+        self.archivo = open(ruta, "wb" if nuevo else "ab")
+        if nuevo:
+            self.archivo.write(CABECERA_WAL)
+            self.archivo.flush()
+
+    def _escribir(self, pendiente, ultima):
+        if pendiente:
+            self.archivo.write(b"".join(pendiente))
+            self.archivo.flush()
+            if self.fsync:
+                os.fsync(self.archivo.fileno())
+        with self.cond:
+            self.durable = max(self.durable, ultima)
+            self.desde_snapshot += len(pendiente)
+            self.cond.notify_all()
+
+    def reiniciar(self, secuencia):
+        """
+        Descarta el WAL y guarda como instantánea el estado recién instalado en
+        `secuencia` (una Réplica que se resincroniza con el Central). Los
+        registros siguientes se anexan a un segmento nuevo.
+        """
+        with self.escritura:
+            with self.cond:
+                self.buffer = []
+                self.ultima = self.durable = secuencia
+            self.archivo.close()
+            for ruta in self._segmentos():
+                os.remove(ruta)
+            self._abrir_segmento(secuencia + 1)
+            self.tomar_instantanea()
+
+    def _bucle(self):
+        ultima_snapshot = time.time()
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.buffer, timeout=1.0)
+            with self.escritura:
+                with self.cond:
+                    pendiente, self.buffer = self.buffer, []
+                    ultima = self.ultima
+                # Group commit: un solo write + fsync para todo lo acumulado
+                self._escribir(pendiente, ultima)
+
+                vencida = (self.desde_snapshot and
+                           time.time() - ultima_snapshot >= self.cada_segundos)
+                if self.desde_snapshot >= self.cada_registros or vencida:
+                    self.tomar_instantanea()
+                    ultima_snapshot = time.time()
+
+    def tomar_instantanea(self):
+        """
+        Captura el estado de forma consistente, lo escribe de forma atómica y
+        descarta los segmentos del WAL que ya quedaron cubiertos.
+        """
+        with self.lock_estado:
+            secuencia, estado = self.capturar()
+            # Lo encolado hasta aquí pertenece al estado capturado
+            with self.cond:
+                pendiente, self.buffer = self.buffer, []
+                ultima = self.ultima
+        self._escribir(pendiente, ultima)
+
+        cuerpo = zlib.compress(json.dumps(estado).encode("utf-8"))
+        cabecera = CABECERA_SNAPSHOT.pack(MAGIA_SNAPSHOT, VERSION_FORMATO, secuencia,
+                                          zlib.crc32(cuerpo), len(cuerpo))
+        temporal = self._ruta_snapshot() + ".tmp"
+        with open(temporal, "wb") as f:
+            f.write(cabecera + cuerpo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self._ruta_snapshot())
+
+        # Los registros posteriores van a un segmento nuevo
+        anteriores = self._segmentos()
+        self.archivo.close()
+        self._abrir_segmento(secuencia + 1)
+        actual = self.archivo.name
+        for ruta in anteriores:
+            if ruta != actual:
+                os.remove(ruta)
+        with self.cond:
+            self.desde_snapshot = 0
@@ -1,9 +1,23 @@
 # Andres Manosalva
+import os
+import csv
 import zmq
 import json
 import time
+import uuid
 from random import randint
 
+from escritor import escritor_compartido
+import protocolo
+import trazas
+
+# Modo masivo: un solo proceso envía todo un catálogo de programas
+VENTANA_MASIVA     = 64     # solicitudes del catálogo esperando resultado a la vez
+TIMEOUT_MASIVO     = 5.0    # segundos sin resultado antes de reintentar (mismo id_solicitud)
+REINTENTOS_MASIVO  = 3      # reintentos por solicitud antes de darla por perdida
+# Campos opcionales del catálogo que se envían tal cual (restricciones de aula)
+CAMPOS_CATALOGO    = ("facultad", "franja", "capacidad_minima", "edificio", "campus")
+
 def programa_aca(nombre_programa, semestre, salones, laboratorios, ip_facultad, puerto_facultad):
     """
     Proceso que representa un programa académico. Envía solicitudes de aulas a la facultad y guarda las solicitudes.
@@ -21,42 +35,193 @@ def programa_aca(nombre_programa, semestre, salones, laboratorios, ip_facultad,
     # Configurar socket REQ para comunicarse con la facultad (request-reply síncrono)
     socket = context.socket(zmq.REQ)
     socket.connect(f"tcp://{ip_facultad}:{puerto_facultad}")
+    # Codec hacia la facultad: JSON hasta que la facultad demuestre entender binario
+    negociacion = protocolo.Negociacion()
+    # Escritor en segundo plano con el archivo de solicitudes siempre abierto
+    escritor = escritor_compartido()
 
     print(f"Programa {nombre_programa} iniciado para el semestre {semestre}...")
 
     while True:
+        trazas.PERFILADOR.revisar()
         # Crear solicitud de aulas en formato JSON
         solicitud = {
+            "id_solicitud": uuid.uuid4().hex,  # Identifica la solicitud ante reenvíos
             "programa": nombre_programa,
             "semestre": semestre,
             "salones": salones,
             "laboratorios": laboratorios
         }
+        # Una fracción de las solicitudes lleva un id de traza hasta la Réplica
+        traza = trazas.muestrear()
+        if traza is not None:
+            solicitud[trazas.CAMPO_TRAZA] = traza
 
-        # Enviar solicitud a la facultad
-        socket.send_json(solicitud)
-        print(f"Programa {nombre_programa} envió solicitud: {solicitud}")
+        with trazas.tramo("programa.ida_vuelta", traza):
+            # Enviar solicitud a la facultad
+            socket.send(negociacion.codificar(solicitud, protocolo.SOLICITUD))
+            print(f"Programa {nombre_programa} envió solicitud: {solicitud}")
 
-        # Recibir confirmación de la facultad
-        respuesta = socket.recv_json()
+            # Recibir confirmación de la facultad
+            respuesta = negociacion.decodificar(socket.recv())
         print(f"Programa {nombre_programa} recibió confirmación: {respuesta}")
 
         # Guardar la solicitud enviada en un archivo para persistencia
-        with open(f"solicitudes_{nombre_programa}_{semestre}.txt", "a") as f:
-            f.write(f"{json.dumps(solicitud)}\n")
+        escritor.escribir(f"solicitudes_{nombre_programa}_{semestre}.txt", f"{json.dumps(solicitud)}\n")
 
         # Esperar 10 segundos antes de enviar la próxima solicitud
         time.sleep(10)
 
+def leer_catalogo(ruta):
+    """
+    Lee un catálogo de programas de un CSV (columnas programa, semestre,
+    salones, laboratorios y opcionalmente facultad, franja, capacidad_minima,
+    edificio, campus) o de un JSONL con un objeto por línea y las mismas claves.
+    """
+    with open(ruta, newline="", encoding="utf-8") as f:
+        if ruta.endswith(".jsonl"):
+            filas = [json.loads(linea) for linea in f if linea.strip()]
+        else:
+            filas = list(csv.DictReader(f))
+    catalogo = []
+    for fila in filas:
+        solicitud = {
+            "programa": str(fila["programa"]).strip(),
+            "semestre": str(fila["semestre"]).strip(),
+            "salones": int(fila["salones"]),
+            "laboratorios": int(fila["laboratorios"])
+        }
+        for campo in CAMPOS_CATALOGO:
+            valor = fila.get(campo)
+            if valor is None or valor == "":
+                continue
+            solicitud[campo] = int(valor) if campo in ("franja", "capacidad_minima") else str(valor).strip()
+        catalogo.append(solicitud)
+    return catalogo
+
+def programa_aca_masivo(ruta_catalogo, ip_facultad, puerto_facultad, archivo_salida=None,
+                        ventana=VENTANA_MASIVA, timeout=TIMEOUT_MASIVO, reintentos=REINTENTOS_MASIVO):
+    """
+    Envía todas las solicitudes de un catálogo desde un solo proceso, en lugar
+    de un proceso `programa_aca` por programa.
+
+    Usa un DEALER con hasta `ventana` solicitudes esperando resultado
+    ("esperar_resultado": true), emparejadas por `id_solicitud`. Una solicitud
+    sin resultado tras `timeout` segundos se reenvía con el mismo id (la
+    facultad reconoce el reintento y no la asigna dos veces); tras
+    `reintentos` reenvíos se anota como "sin_respuesta". Cada resultado se
+    anexa como una línea JSON a `archivo_salida`.
+
+    Args:
+        ruta_catalogo (str): Catálogo CSV o JSONL (e.g., "programas.csv").
+        ip_facultad (str): IP de la máquina donde están las facultades (e.g., "192.168.1.102").
+        puerto_facultad (int | str): Puerto de las facultades (e.g., 3391) o endpoint completo.
+        archivo_salida (str): Archivo de resultados (por defecto resultados_<catálogo>.jsonl).
+    """
+    catalogo = leer_catalogo(ruta_catalogo)
+    if archivo_salida is None:
+        archivo_salida = f"resultados_{os.path.splitext(os.path.basename(ruta_catalogo))[0]}.jsonl"
+
+    context = zmq.Context.instance()
+    socket = context.socket(zmq.DEALER)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(puerto_facultad if isinstance(puerto_facultad, str) else f"tcp://{ip_facultad}:{puerto_facultad}")
+    negociacion = protocolo.Negociacion()
+    escritor = escritor_compartido()
+
+    siguiente = 0
+    en_vuelo = {}   # id_solicitud -> [solicitud, primer envío, último envío, intentos]
+    conteos = {"asignado": 0, "rechazado": 0, "sin_respuesta": 0}
+
+    def anotar(solicitud, primer_envio, intentos, respuesta):
+        estado = respuesta.get("estado", "sin_respuesta")
+        conteos[estado] = conteos.get(estado, 0) + 1
+        fin = time.time()
+        trazas.registrar(solicitud.get(trazas.CAMPO_TRAZA), "programa.ida_vuelta", primer_envio, fin)
+        escritor.escribir(archivo_salida, json.dumps({
+            "id_solicitud": solicitud["id_solicitud"],
+            "programa": solicitud["programa"],
+            "semestre": solicitud["semestre"],
+            "salones": solicitud["salones"],
+            "laboratorios": solicitud["laboratorios"],
+            "estado": estado,
+            "salones_ids": respuesta.get("salones_ids", []),
+            "laboratorios_ids": respuesta.get("laboratorios_ids", []),
+            "intentos": intentos,
+            "tiempo": fin - primer_envio
+        }) + "\n")
+
+    print(f"Modo masivo: {len(catalogo)} solicitudes de {ruta_catalogo} (ventana {ventana})")
+    while siguiente < len(catalogo) or en_vuelo:
+        trazas.PERFILADOR.revisar()
+        # Llenar la ventana con las siguientes filas del catálogo
+        while siguiente < len(catalogo) and len(en_vuelo) < ventana:
+            solicitud = dict(catalogo[siguiente], id_solicitud=uuid.uuid4().hex, esperar_resultado=True)
+            traza = trazas.muestrear()
+            if traza is not None:
+                solicitud[trazas.CAMPO_TRAZA] = traza
+            ahora = time.time()
+            en_vuelo[solicitud["id_solicitud"]] = [solicitud, ahora, ahora, 1]
+            socket.send(negociacion.codificar(solicitud, protocolo.SOLICITUD))
+            siguiente += 1
+
+        # Esperar resultados hasta el próximo vencimiento
+        vence = min(entrada[2] for entrada in en_vuelo.values()) + timeout
+        if socket.poll(max(0, vence - time.time()) * 1000):
+            while True:
+                try:
+                    payload = socket.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                try:
+                    respuesta = negociacion.decodificar(payload)
+                except protocolo.ErrorProtocolo:
+                    continue
+                entrada = en_vuelo.pop(respuesta.get("id_solicitud"), None)
+                if entrada is None:
+                    # Acuse sin id (p. ej. "Facultad desconocida") o resultado de un reintento ya anotado
+                    if "status" in respuesta:
+                        print(f"Modo masivo - la facultad respondió: {respuesta}")
+                    continue
+                anotar(entrada[0], entrada[1], entrada[3], respuesta)
+
+        # Reintentar o dar por perdidas las solicitudes vencidas
+        ahora = time.time()
+        for id_solicitud, entrada in list(en_vuelo.items()):
+            if ahora - entrada[2] < timeout:
+                continue
+            if entrada[3] > reintentos:
+                del en_vuelo[id_solicitud]
+                anotar(entrada[0], entrada[1], entrada[3], {})
+                continue
+            entrada[2] = ahora
+            entrada[3] += 1
+            socket.send(negociacion.codificar(entrada[0], protocolo.SOLICITUD))
+
+    escritor.vaciar()
+    socket.close()
+    print(f"Modo masivo terminado: {conteos} (resultados en {archivo_salida})")
+    return conteos
+
 if __name__ == "__main__":
     # Punto de entrada del programa
     import sys
+    if len(sys.argv) in (4, 5) and sys.argv[1] == "--catalogo":
+        # Modo masivo: python programa_aca.py --catalogo <archivo> <ip_facultad> [archivo_salida]
+        trazas.configurar("programas")
+        trazas.instalar_senal()
+        programa_aca_masivo(sys.argv[2], sys.argv[3], 3391, sys.argv[4] if len(sys.argv) == 5 else None)
+        sys.exit(0)
     if len(sys.argv) != 6:
-        print("Uso: python programa_academico.py <nombre_programa> <semestre> <salones> <laboratorios> <ip_facultad>")
+        print("Uso: python programa_academico.py <nombre_programa> <semestre> <salones> <laboratorios> <ip_facultad>\n"
+              "     python programa_academico.py --catalogo <archivo.csv|archivo.jsonl> <ip_facultad> [archivo_salida]")
         sys.exit(1)
     # IP de la máquina donde están las facultades (PC2)
     ip_facultad = sys.argv[5]
     # Puerto donde las facultades escuchan (fijo en 3391)
     puerto_facultad = 3391
+    # Tramos en trazas_programa_<nombre>.tsv; `kill -USR2 <pid>` alterna el perfilado
+    trazas.configurar(f"programa_{sys.argv[1]}")
+    trazas.instalar_senal()
     # Iniciar el programa académico con los parámetros proporcionados
     programa_aca(sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), ip_facultad, puerto_facultad)
\ No newline at end of file
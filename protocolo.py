@@ -0,0 +1,356 @@
+# protocolo.py
+
+import json
+import struct
+
+# --- CODECS DEL PROTOCOLO DE MENSAJES ---
+#
+# Un payload JSON empieza por "{" o "[". Un payload binario empieza por un byte
+# de versión (VERSION_MINIMA..VERSION_BINARIA), seguido de:
+#   tipo (uint8)
+#   tabla de cadenas internadas: cantidad (uint16) + [longitud (uint16) + utf-8]
+#   registros: cantidad (uint16) + [presencia (uint16) + campos del esquema]
+# Cada cadena (facultad, programa, semestre, ids) se escribe una sola vez por
+# frame y los registros la referencian por su índice en la tabla, de modo que
+# un lote de muchos registros no repite las mismas claves ni los mismos nombres.
+# Cada versión solo agrega campos al final de los esquemas y estados al final de
+# ESTADOS, así que un frame de una versión anterior se lee con los esquemas
+# actuales: los campos que esa versión no conocía simplemente no aparecen.
+
+CODEC_JSON    = "json"
+CODEC_BINARIO = "binario"
+# Binario de una versión anterior: se lee, pero se le responde en JSON
+CODEC_BINARIO_PREVIO = "binario_previo"
+
+VERSION_BINARIA = 7   # 2: franjas, restricciones e ids de aulas; 3: campus; 4: id en registros; 5: trazas;
+                      # 6: estados de préstamo entre fragmentos; 7: duplicados en curso
+VERSION_MINIMA  = 2   # nodos v1 no conocen las aulas por id y ya no se aceptan
+# Codec que usan los clientes una vez que el otro extremo demuestra soportarlo
+CODEC_PREFERIDO = CODEC_BINARIO
+# Campo con el que un cliente JSON anuncia la versión binaria que entiende
+CAMPO_VERSION = "version_protocolo"
+# Campo de la respuesta JSON a un payload ilegible; el cliente vuelve a JSON
+CAMPO_ERROR   = "error_protocolo"
+
+# Tipos de mensaje
+SOLICITUD  = 1   # programa -> facultad y facultad -> servidor
+ASIGNACION = 2   # servidor -> facultad y facultad -> programa
+REGISTRO   = 3   # registro replicado central -> réplica
+ACUSE      = 4   # confirmación de recepción facultad -> programa
+
+ESTADOS = ("rechazado", "asignado", "cedido", "recibido", "en_curso")
+
+# Tipos de campo: s = cadena internada, i = int32, q = uint64, e = estado, b = bool,
+# ls = lista de cadenas internadas, L = lista de registros del subesquema indicado
+_PROGRAMA = (
+    ("programa", "s"),
+    ("salones", "i"),
+    ("laboratorios", "i"),
+)
+
+ESQUEMAS = {
+    SOLICITUD: (
+        ("id_solicitud", "s"),
+        ("semestre", "s"),
+        ("facultad", "s"),
+        ("programa", "s"),
+        ("salones", "i"),
+        ("laboratorios", "i"),
+        ("programas", ("L", _PROGRAMA)),
+        ("esperar_resultado", "b"),
+        ("franja", "i"),
+        ("capacidad_minima", "i"),
+        ("edificio", "s"),
+        ("campus", "s"),
+        ("traza", "s"),
+    ),
+    ASIGNACION: (
+        ("id_solicitud", "s"),
+        ("facultad", "s"),
+        ("programa", "s"),
+        ("salones_asignados", "i"),
+        ("laboratorios_asignados", "i"),
+        ("estado", "e"),
+        ("salones_ids", "ls"),
+        ("laboratorios_ids", "ls"),
+    ),
+    REGISTRO: (
+        ("secuencia", "q"),
+        ("facultad", "s"),
+        ("programa", "s"),
+        ("semestre", "s"),
+        ("salones_asignados", "i"),
+        ("laboratorios_asignados", "i"),
+        ("estado", "e"),
+        ("franja", "i"),
+        ("salones_ids", "ls"),
+        ("laboratorios_ids", "ls"),
+        ("id_solicitud", "s"),
+        ("traza", "s"),
+    ),
+    ACUSE: (
+        ("status", "s"),
+        ("facultad", "s"),
+    ),
+}
+
+_CABECERA = struct.Struct("<BB")
+_U16      = struct.Struct("<H")
+_FORMATOS = {"s": struct.Struct("<H"), "i": struct.Struct("<i"), "q": struct.Struct("<Q"),
+             "e": struct.Struct("<B"), "b": struct.Struct("<B")}
+
+class ErrorProtocolo(ValueError):
+    """Payload que no se puede decodificar (versión desconocida o corrupto)."""
+
+class _NoRepresentable(Exception):
+    """El mensaje no cabe en el esquema binario; se usa JSON."""
+
+# --- CODIFICACIÓN BINARIA ---
+
+def _codificar_registro(registro, esquema, tabla, indices, partes):
+    if len(esquema) > 16 or not set(registro) <= {nombre for nombre, _ in esquema}:
+        raise _NoRepresentable()
+    presencia = 0
+    campos = []
+    for bit, (nombre, tipo) in enumerate(esquema):
+        if nombre not in registro:
+            continue
+        presencia |= 1 << bit
+        valor = registro[nombre]
+        if isinstance(tipo, tuple):
+            if not isinstance(valor, list):
+                raise _NoRepresentable()
+            sub = [_U16.pack(len(valor))]
+            for elemento in valor:
+                if not isinstance(elemento, dict):
+                    raise _NoRepresentable()
+                _codificar_registro(elemento, tipo[1], tabla, indices, sub)
+            campos.append(b"".join(sub))
+            continue
+        if tipo == "ls":
+            if not isinstance(valor, list) or len(valor) > 0xFFFF:
+                raise _NoRepresentable()
+            sub = [_U16.pack(len(valor))]
+            for cadena in valor:
+                if not isinstance(cadena, str):
+                    raise _NoRepresentable()
+                if cadena not in indices:
+                    indices[cadena] = len(tabla)
+                    tabla.append(cadena)
+                if indices[cadena] > 0xFFFF:
+                    raise _NoRepresentable()
+                sub.append(_U16.pack(indices[cadena]))
+            campos.append(b"".join(sub))
+            continue
+        if tipo == "s":
+            if not isinstance(valor, str):
+                raise _NoRepresentable()
+            if valor not in indices:
+                indices[valor] = len(tabla)
+                tabla.append(valor)
+            valor = indices[valor]
+        elif tipo == "e":
+            if valor not in ESTADOS:
+                raise _NoRepresentable()
+            valor = ESTADOS.index(valor)
+        elif tipo == "b":
+            if not isinstance(valor, bool):
+                raise _NoRepresentable()
+            valor = int(valor)
+        elif not isinstance(valor, int) or isinstance(valor, bool):
+            raise _NoRepresentable()
+        try:
+            campos.append(_FORMATOS[tipo].pack(valor))
+        except struct.error:
+            raise _NoRepresentable()
+    partes.append(_U16.pack(presencia))
+    partes.extend(campos)
+
+def _codificar_binario(tipo, registros):
+    tabla, indices, cuerpo = [], {}, []
+    for registro in registros:
+        _codificar_registro(registro, ESQUEMAS[tipo], tabla, indices, cuerpo)
+    if len(tabla) > 0xFFFF or len(registros) > 0xFFFF:
+        raise _NoRepresentable()
+    partes = [_CABECERA.pack(VERSION_BINARIA, tipo), _U16.pack(len(tabla))]
+    for cadena in tabla:
+        datos = cadena.encode("utf-8")
+        if len(datos) > 0xFFFF:
+            raise _NoRepresentable()
+        partes.append(_U16.pack(len(datos)))
+        partes.append(datos)
+    partes.append(_U16.pack(len(registros)))
+    partes.extend(cuerpo)
+    return b"".join(partes)
+
+def _decodificar_registro(datos, posicion, esquema, tabla):
+    (presencia,) = _U16.unpack_from(datos, posicion)
+    posicion += _U16.size
+    registro = {}
+    for bit, (nombre, tipo) in enumerate(esquema):
+        if not presencia & (1 << bit):
+            continue
+        if isinstance(tipo, tuple):
+            (cantidad,) = _U16.unpack_from(datos, posicion)
+            posicion += _U16.size
+            lista = []
+            for _ in range(cantidad):
+                elemento, posicion = _decodificar_registro(datos, posicion, tipo[1], tabla)
+                lista.append(elemento)
+            registro[nombre] = lista
+            continue
+        if tipo == "ls":
+            (cantidad,) = _U16.unpack_from(datos, posicion)
+            posicion += _U16.size
+            indices = struct.unpack_from(f"<{cantidad}H", datos, posicion)
+            posicion += cantidad * _U16.size
+            registro[nombre] = [tabla[i] for i in indices]
+            continue
+        formato = _FORMATOS[tipo]
+        (valor,) = formato.unpack_from(datos, posicion)
+        posicion += formato.size
+        if tipo == "s":
+            valor = tabla[valor]
+        elif tipo == "e":
+            valor = ESTADOS[valor]
+        elif tipo == "b":
+            valor = bool(valor)
+        registro[nombre] = valor
+    return registro, posicion
+
+def _decodificar_binario(datos):
+    version, tipo = _CABECERA.unpack_from(datos, 0)
+    if not VERSION_MINIMA <= version <= VERSION_BINARIA or tipo not in ESQUEMAS:
+        raise ErrorProtocolo(f"Versión {version} o tipo {tipo} no soportado")
+    posicion = _CABECERA.size
+    (num_cadenas,) = _U16.unpack_from(datos, posicion)
+    posicion += _U16.size
+    tabla = []
+    for _ in range(num_cadenas):
+        (largo,) = _U16.unpack_from(datos, posicion)
+        posicion += _U16.size
+        tabla.append(datos[posicion:posicion + largo].decode("utf-8"))
+        posicion += largo
+    (num_registros,) = _U16.unpack_from(datos, posicion)
+    posicion += _U16.size
+    registros = []
+    for _ in range(num_registros):
+        registro, posicion = _decodificar_registro(datos, posicion, ESQUEMAS[tipo], tabla)
+        registros.append(registro)
+    return registros
+
+# --- API PÚBLICA ---
+
+def codificar(mensaje, tipo, codec=CODEC_JSON):
+    """
+    Serializa un mensaje. Con CODEC_BINARIO, si el mensaje trae campos o
+    valores que el esquema no contempla, se usa JSON automáticamente.
+    """
+    if codec == CODEC_BINARIO:
+        try:
+            return _codificar_binario(tipo, [mensaje])
+        except _NoRepresentable:
+            pass
+    return json.dumps(mensaje).encode("utf-8")
+
+def codificar_lote(mensajes, tipo, codec=CODEC_JSON):
+    """
+    Serializa varios registros del mismo tipo en un único frame.
+    """
+    if codec == CODEC_BINARIO:
+        try:
+            return _codificar_binario(tipo, mensajes)
+        except _NoRepresentable:
+            pass
+    return json.dumps(mensajes).encode("utf-8")
+
+def codec_de(payload):
+    """
+    Identifica el codec de un payload por su primer byte.
+    """
+    if payload[:1] in (b"{", b"["):
+        return CODEC_JSON
+    if payload[:1] == bytes([VERSION_BINARIA]):
+        return CODEC_BINARIO
+    if payload[:1] and VERSION_MINIMA <= payload[0] < VERSION_BINARIA:
+        return CODEC_BINARIO_PREVIO
+    raise ErrorProtocolo(f"Payload con versión desconocida: {payload[:1]!r}")
+
+def decodificar_lote(payload):
+    """
+    Devuelve (lista de mensajes, codec) de un frame JSON o binario. Un objeto
+    JSON suelto se devuelve como lista de un elemento.
+    """
+    codec = codec_de(payload)
+    try:
+        if codec == CODEC_JSON:
+            mensajes = json.loads(payload.decode("utf-8"))
+            if isinstance(mensajes, dict):
+                mensajes = [mensajes]
+        else:
+            mensajes = _decodificar_binario(payload)
+    except (ValueError, struct.error, IndexError) as e:
+        raise ErrorProtocolo(str(e))
+    return mensajes, codec
+
+def decodificar(payload):
+    """
+    Devuelve (mensaje, codec) de un frame con un único mensaje.
+    """
+    mensajes, codec = decodificar_lote(payload)
+    if len(mensajes) != 1:
+        raise ErrorProtocolo(f"Se esperaba un mensaje y llegaron {len(mensajes)}")
+    return mensajes[0], codec
+
+def codec_respuesta(codec, mensaje):
+    """
+    Codec con el que un servidor debe responder: el mismo de la solicitud, o
+    binario si un cliente JSON anunció que entiende la versión binaria actual.
+    A un cliente binario de una versión anterior se le responde en JSON, que
+    todas las versiones leen. El campo de anuncio se retira del mensaje.
+    """
+    version = mensaje.pop(CAMPO_VERSION, None) if isinstance(mensaje, dict) else None
+    if codec == CODEC_JSON and CODEC_PREFERIDO == CODEC_BINARIO and version == VERSION_BINARIA:
+        return CODEC_BINARIO
+    if codec == CODEC_BINARIO_PREVIO:
+        return CODEC_JSON
+    return codec
+
+def respuesta_ilegible(error):
+    """
+    Respuesta JSON a un payload que no se pudo decodificar (versión
+    desconocida o frame corrupto). Lleva CAMPO_ERROR para que el cliente
+    vuelva a JSON y reenvíe.
+    """
+    return codificar({"status": "Solicitud ilegible", CAMPO_ERROR: str(error),
+                      CAMPO_VERSION: VERSION_BINARIA}, ACUSE)
+
+class Negociacion:
+    """
+    Estado de negociación de un cliente con su servidor.
+
+    Arranca en JSON anunciando VERSION_BINARIA; cuando el servidor responde en
+    binario (porque lo soporta) pasa a enviar en binario. Un servidor antiguo
+    ignora el anuncio y sigue respondiendo JSON, así ambos conviven durante un
+    despliegue gradual. Si el servidor responde con CAMPO_ERROR (no pudo leer
+    el frame binario), vuelve a JSON. Tras un cambio de servidor conviene
+    `reiniciar()`.
+    """
+    def __init__(self):
+        self.codec = CODEC_JSON
+
+    def reiniciar(self):
+        self.codec = CODEC_JSON
+
+    def codificar(self, mensaje, tipo):
+        if self.codec == CODEC_JSON and CODEC_PREFERIDO == CODEC_BINARIO:
+            mensaje = dict(mensaje, **{CAMPO_VERSION: VERSION_BINARIA})
+        return codificar(mensaje, tipo, self.codec)
+
+    def decodificar(self, payload):
+        mensaje, codec = decodificar(payload)
+        if codec == CODEC_BINARIO:
+            self.codec = CODEC_BINARIO
+        elif codec == CODEC_JSON and isinstance(mensaje, dict) and CAMPO_ERROR in mensaje:
+            self.reiniciar()
+        return mensaje
@@ -4,126 +4,1113 @@ import zmq
 import threading
 import json
 import time
+import zlib
+from collections import deque
 
-# Clase para gestionar recursos (380 salones, 60 laboratorios)
+from persistencia import DiarioEstado
+from histograma import Histograma, VentanaDeslizante
+import protocolo
+import trazas
+from latidos import Latidor, endpoint_latidos
+from idempotencia import CacheIdempotencia, respuesta_de_registro, respuesta_en_curso, EN_CURSO
+from admision import Admision, ordenar, CRITERIOS, CRITERIO_FCFS
+from consultas import es_consulta, atender_consulta
+from inventario import (cargar_pools, cargar_aulas, clave_pool, PoolsAulas, CerrojoPools, ARCHIVO_INVENTARIO,
+                        aplicar_registro, validar_solicitud, respuesta_invalida, SALON, LABORATORIO, CEDIDO,
+                        RECIBIDO)
+from fragmentos import MapaFragmentos, Prestamos, puerto_de
+
+# Endpoint interno entre el broker y los hilos trabajadores
+BACKEND_TRABAJADORES = "inproc://trabajadores"
+
+# IP y puerto donde escucha la Réplica
+IP_REPLICA     = "192.168.1.101"
+PUERTO_REPLICA = 3390
+
+# Parámetros del canal de replicación asíncrona
+REPLICACION_LOTE            = 64    # registros máximos por lote
+REPLICACION_VENTANA         = 8     # lotes sin ACK permitidos en vuelo
+REPLICACION_INTERVALO_MS    = 2     # espera máxima para acumular un lote
+REPLICACION_TIMEOUT_ACK     = 1.0   # segundos antes de reenviar lotes sin ACK
+REPLICACION_SINCRONIZAR_CADA = 0    # 0 = nunca esperar a la Réplica, N = cada N asignaciones
+REPLICACION_HISTORIAL       = 10000 # últimos registros enviados que se guardan para poner al día a la Réplica
+REPLICACION_SONDEO          = 1.0   # sin tráfico, cada cuánto se anuncia la secuencia a la Réplica
+
+# Resincronización de una Réplica que vuelve atrasada o sin estado (instantánea por partes)
+RESINCRONIZACION_PARTE       = 64 * 1024         # bytes por parte de la instantánea
+RESINCRONIZACION_VENTANA     = 4                 # partes sin ACK permitidas en vuelo
+RESINCRONIZACION_BYTES_SEG   = 4 * 1024 * 1024   # ritmo máximo de envío de la instantánea
+RESINCRONIZACION_ABANDONO    = 10.0              # segundos sin ACK tras los que se abandona
+
+# Id con el que se reincorpora una escritura de la Réplica que no traía id_solicitud
+PREFIJO_REINCORPORADO = "respaldo-"
+
+# Carpeta del WAL y las instantáneas del Central
+DIRECTORIO_ESTADO = "estado_central"
+
+# Clase para gestionar recursos (un pool de aulas por semestre y campus)
 class Recursos:
-    def __init__(self):
-        self.salones_disponibles = 380
-        self.laboratorios_disponibles = 60
+    def __init__(self, replicador=None, pools=None):
+        self.pools = pools if pools is not None else cargar_pools(None)
+        self.secuencia = 0      # número de la última asignación decidida
+        # Lock corto y global: solo numera la asignación y la encola en el WAL y
+        # el replicador para que el orden de las secuencias sea el orden real.
+        # La decisión se toma bajo el lock del pool (orden: pool -> global).
         self.lock = threading.Lock()
+        # Instantáneas: todos los pools y luego el lock global (corte exacto)
+        self.cerrojo = CerrojoPools(self.pools, self.lock)
+        self.replicador = replicador
+        self.diario = None
+        # Cliente de préstamos de aulas a otros fragmentos (solo en modo fragmentado)
+        self.prestamos = None
+        # Respuestas ya enviadas por id_solicitud (se persiste y se replica con los registros)
+        self.idempotencia = CacheIdempotencia()
 
-    def asignar_aulas(self, salones_solicitados, laboratorios_solicitados, facultad, programa):
-        with self.lock:
-            if (salones_solicitados <= self.salones_disponibles and
-                laboratorios_solicitados <= self.laboratorios_disponibles):
-                self.salones_disponibles -= salones_solicitados
-                self.laboratorios_disponibles -= laboratorios_solicitados
-                asignacion = {
-                    "facultad": facultad,
-                    "programa": programa,
-                    "salones_asignados": salones_solicitados,
-                    "laboratorios_asignados": laboratorios_solicitados,
-                    "estado": "asignado"
-                }
+    def capturar(self):
+        """
+        Devuelve (secuencia, estado) para una instantánea. Requiere `cerrojo` tomado.
+        """
+        return self.secuencia, {"pools": self.pools.capturar(),
+                               "idempotencia": self.idempotencia.capturar()}
+
+    def restaurar(self, estado, registros):
+        """
+        Aplica una instantánea y los registros posteriores del WAL.
+        """
+        if estado is not None:
+            if "pools" in estado:
+                self.pools.restaurar(estado["pools"])
+            elif "inventario" in estado:
+                # Instantánea de antes de los pools: un único inventario global
+                self.pools.restaurar([{"semestre": "", "campus": "", "inventario": estado["inventario"]}])
             else:
-                asignacion = {
-                    "facultad": facultad,
-                    "programa": programa,
-                    "salones_asignados": 0,
-                    "laboratorios_asignados": 0,
-                    "estado": "rechazado"
-                }
+                # Instantánea de antes del inventario: solo había contadores
+                inventario = self.pools.obtener("").inventario
+                inventario.asignar({
+                    SALON: inventario.disponibles(SALON) - estado["salones_disponibles"],
+                    LABORATORIO: inventario.disponibles(LABORATORIO) - estado["laboratorios_disponibles"]
+                })
+            self.idempotencia.restaurar(estado.get("idempotencia", []))
+        for registro in registros:
+            self.pools.aplicar_registro(registro)
+            self.recordar(registro)
+
+    def recordar(self, registro):
+        """
+        Guarda en la caché de idempotencia la respuesta de un registro con id.
+        """
+        if "id_solicitud" in registro:
+            self.idempotencia.completar(registro["id_solicitud"], respuesta_de_registro(registro),
+                                        registro["secuencia"])
+
+    def etiqueta(self):
+        """
+        Etiqueta de las respuestas a consultas: el Central tiene el estado al
+        día; "retraso_replica" dice cuántos registros le faltan a la Réplica.
+        """
+        etiqueta = {"rol": "central", "secuencia": self.secuencia, "retraso": 0}
+        if self.replicador is not None:
+            etiqueta["retraso_replica"] = self.replicador.estado()["retraso"]
+        return etiqueta
+
+    def instantanea(self):
+        """
+        (secuencia, estado) consistentes para resincronizar la Réplica. Toma el
+        cerrojo de captura el tiempo de capturar, como las instantáneas del diario.
+        """
+        with self.cerrojo:
+            return self.capturar()
+
+    def habilitar_persistencia(self, directorio):
+        """
+        Recupera el estado desde la última instantánea más la cola del WAL y
+        arranca el diario para las asignaciones siguientes.
+        """
+        self.diario = DiarioEstado(directorio, self.cerrojo, self.capturar)
+        estado, registros = self.diario.recuperar()
+        self.restaurar(estado, registros)
+        with self.lock:
+            self.secuencia = self.diario.ultima
+        self.diario.iniciar()
+        print(f"Estado recuperado hasta la secuencia {self.secuencia} "
+              f"({len(registros)} registros del WAL reproducidos).")
+
+    def asignar_aulas(self, salones_solicitados, laboratorios_solicitados, facultad, programa, semestre="",
+                      franja=None, capacidad_minima=0, edificio=None, campus="",
+                      id_solicitud=None):
+        """
+        Reserva aulas concretas del pool de (semestre, campus). Sin `franja` las
+        aulas quedan ocupadas todo el semestre; con ella, solo en esa franja.
+
+        En modo fragmentado, si faltan aulas se piden prestadas a los otros
+        fragmentos (sin el lock del pool, para no bloquear a los demás hilos
+        mientras se espera) y se reintenta una vez antes de rechazar.
+        """
+        rechazo = {
+            "facultad": facultad,
+            "programa": programa,
+            "salones_asignados": 0,
+            "laboratorios_asignados": 0,
+            "estado": "rechazado"
+        }
+        pool = self.pools.obtener(semestre, campus)
+        if pool is None:
+            # Campus desconocido: se rechaza sin tocar ningún pool
+            return self._numerar(rechazo, semestre, franja, id_solicitud)
+        traza = trazas.activa()
+        cantidades = {SALON: salones_solicitados, LABORATORIO: laboratorios_solicitados}
+        for intento in range(2):
+            inicio = time.time()
+            with pool.lock:
+                trazas.registrar(traza, "central.espera_lock", inicio, time.time())
+                with trazas.tramo("central.asignacion", traza):
+                    elegidas = pool.inventario.asignar(cantidades, capacidad_minima, edificio, franja)
+                if elegidas is not None:
+                    asignacion = {
+                        "facultad": facultad,
+                        "programa": programa,
+                        "salones_asignados": salones_solicitados,
+                        "laboratorios_asignados": laboratorios_solicitados,
+                        "salones_ids": elegidas[SALON],
+                        "laboratorios_ids": elegidas[LABORATORIO],
+                        "estado": "asignado"
+                    }
+                    # Numerar dentro del lock del pool: en cada pool las secuencias siguen
+                    # el orden de las decisiones
+                    return self._numerar(asignacion, semestre, franja, id_solicitud, pool)
+                if (intento > 0 or self.prestamos is None or not pool.inventario.validar_franja(franja)
+                        or min(cantidades.values()) < 0):
+                    return self._numerar(rechazo, semestre, franja, id_solicitud)
+                faltantes = {tipo: cantidad - pool.inventario.disponibles(tipo, capacidad_minima, edificio, franja)
+                             for tipo, cantidad in cantidades.items()}
+            with trazas.tramo("central.prestamo", traza):
+                if not self.pedir_prestamo(pool, faltantes, capacidad_minima, edificio):
+                    return self._numerar(rechazo, semestre, franja, id_solicitud)
+
+    def pedir_prestamo(self, pool, faltantes, capacidad_minima, edificio):
+        """
+        Pide a los otros fragmentos las aulas que faltan en `pool` y registra
+        las recibidas como propias. Devuelve True si llegaron todas las que
+        faltaban (las recibidas se quedan aunque no alcancen). Antes reclama
+        los préstamos anteriores cuya respuesta se había perdido.
+        """
+        for pedido, aulas in self.prestamos.recuperar():
+            otro = self.pools.obtener(pedido["semestre"], pedido["campus"])
+            if otro is not None:
+                self._recibir(otro, aulas)
+        recibidas = self.prestamos.pedir(pool.semestre, pool.campus, faltantes, capacidad_minima, edificio)
+        self._recibir(pool, recibidas)
+        return all(len(recibidas[tipo]) >= faltan for tipo, faltan in faltantes.items())
+
+    def _recibir(self, pool, recibidas):
+        # Registra como propias las aulas recibidas de otro fragmento
+        if any(recibidas.values()):
+            with pool.lock:
+                pool.inventario.recibir_ids(recibidas[SALON] + recibidas[LABORATORIO])
+                self._numerar(self._prestamo(RECIBIDO, recibidas), pool.semestre, None, pool=pool)
+
+    def ceder(self, semestre, campus, cantidades, capacidad_minima=0, edificio=None, fragmento="",
+              id_prestamo=None):
+        """
+        Atiende el préstamo que pide otro fragmento: entrega aulas del pool sin
+        ninguna reserva y registra la cesión (WAL y Réplica) antes de
+        responder, para no volver a usarlas tras un reinicio.
+
+        La cesión queda en la caché de idempotencia con su `id_prestamo`: un
+        reenvío del mismo pedido (p. ej. porque la respuesta se perdió)
+        recibe las mismas aulas sin ceder otras.
+
+        Returns:
+            dict: Tipo -> ids cedidos (pueden ser menos de los pedidos).
+        """
+        pool = self.pools.obtener(semestre, campus)
+        if pool is None:
+            return {SALON: [], LABORATORIO: []}
+        previa = self.idempotencia.reservar(id_prestamo) if id_prestamo is not None else None
+        if previa == EN_CURSO:
+            return {SALON: [], LABORATORIO: []}
+        if previa is not None:
+            return {SALON: previa[0].get("salones_ids", []), LABORATORIO: previa[0].get("laboratorios_ids", [])}
+        try:
+            with pool.lock:
+                cedidas = pool.inventario.ceder(cantidades, capacidad_minima, edificio)
+                cedidas = {tipo: cedidas.get(tipo, []) for tipo in (SALON, LABORATORIO)}
+                if not any(cedidas.values()):
+                    # Nada cedido: un reenvío puede volver a intentarlo
+                    if id_prestamo is not None:
+                        self.idempotencia.cancelar(id_prestamo)
+                    return cedidas
+                registro = self._numerar(self._prestamo(CEDIDO, cedidas, fragmento), semestre, None, id_prestamo,
+                                         pool=pool)
+        except Exception:
+            # Sin esto el id quedaría en curso y cada reenvío recibiría "nada cedido"
+            if id_prestamo is not None:
+                self.idempotencia.cancelar(id_prestamo)
+            raise
+        if self.diario is not None:
+            self.diario.esperar(registro["secuencia"])
+        return cedidas
+
+    def reincorporar(self, registros):
+        """
+        Incorpora las escrituras que la Réplica atendió por su cuenta durante
+        un failover. Cada una recibe una secuencia nueva del Central y pasa por
+        el WAL y la replicación con sus mismas aulas, porque la facultad ya
+        recibió esa respuesta. Si el Central también había dado alguna de esas
+        aulas (asignaciones que no alcanzó a replicar antes de caer), se avisa
+        y se cuenta como conflicto, pero el registro no se descarta.
+
+        Un registro cuyo id ya conoce el Central se salta, así que la Réplica
+        puede reenviar la devolución sin duplicar nada.
+
+        Returns:
+            tuple: (secuencia de la Réplica hasta la que todo quedó en disco, conflictos).
+        """
+        hasta, conflictos, ultima = 0, 0, None
+        for registro in registros:
+            id_solicitud = registro.get("id_solicitud") or f"{PREFIJO_REINCORPORADO}{registro['secuencia']}"
+            previa = self.idempotencia.reservar(id_solicitud, timeout=0)
+            if previa == EN_CURSO:
+                # Un reenvío de la facultad lo está atendiendo: sigue en la próxima devolución
+                break
+            if previa is None:
+                ocupadas, ultima = self._reincorporar(registro, id_solicitud)
+                if ocupadas:
+                    conflictos += 1
+                    print(f"⚠️  La escritura #{registro['secuencia']} de la Réplica usa aulas que el Central "
+                          f"también asignó: {ocupadas}")
+            hasta = registro["secuencia"]
+        if ultima is not None and self.diario is not None:
+            self.diario.esperar(ultima)
+        return hasta, conflictos
+
+    def _reincorporar(self, registro, id_solicitud):
+        # Devuelve (aulas en conflicto, secuencia nueva en el Central)
+        asignacion = {campo: valor for campo, valor in registro.items()
+                      if campo not in ("secuencia", "semestre", "franja", trazas.CAMPO_TRAZA)}
+        semestre, franja = registro.get("semestre", ""), registro.get("franja")
+        pool = None
+        if registro["estado"] in ("asignado", CEDIDO, RECIBIDO):
+            pool = self.pools.pool_de_registro(registro)
+        if pool is None:
+            return [], self._numerar(asignacion, semestre, franja, id_solicitud)["secuencia"]
+        with pool.lock:
+            ocupadas = []
+            if registro["estado"] == "asignado":
+                ocupadas = pool.inventario.ocupadas_ids(
+                    registro.get("salones_ids", []) + registro.get("laboratorios_ids", []), franja)
+            aplicar_registro(pool.inventario, registro)
+            return ocupadas, self._numerar(asignacion, semestre, franja, id_solicitud, pool)["secuencia"]
+
+    def _prestamo(self, estado, aulas, fragmento=""):
+        # Registro de una cesión o recepción de aulas; "facultad" lleva el otro fragmento
+        return {
+            "facultad": fragmento,
+            "programa": "",
+            "salones_asignados": len(aulas[SALON]),
+            "laboratorios_asignados": len(aulas[LABORATORIO]),
+            "salones_ids": aulas[SALON],
+            "laboratorios_ids": aulas[LABORATORIO],
+            "estado": estado
+        }
+
+    def asignar_ventana(self, solicitudes, admision):
+        """
+        Asigna juntas las solicitudes de una ventana de admisión.
+
+        Las solicitudes se agrupan por pool y cada pool se resuelve una sola
+        vez sobre toda la ventana. `admision.py` ordena sus solicitudes
+        midiendo cada una contra lo que queda para sus propias restricciones
+        (franja, capacidad mínima, edificio); como esas aulas se solapan, la
+        admisión se decide asignando en ese orden sobre una copia del
+        inventario, y FCFS se simula igual sobre otra copia. Luego se asignan
+        de verdad en ese orden (las no admitidas al final, por si alguna cabe
+        todavía), cada una con su secuencia, WAL y replicación como en FCFS.
+
+        Returns:
+            list: Asignaciones en el mismo orden que `solicitudes`.
+        """
+        por_pool = {}
+        for i, solicitud in enumerate(solicitudes):
+            por_pool.setdefault((solicitud.get("semestre", ""), solicitud.get("campus", "")), []).append(i)
+
+        def simular(inventario, i):
+            solicitud = solicitudes[i]
+            cantidades = {SALON: solicitud["salones"], LABORATORIO: solicitud["laboratorios"]}
+            return inventario.asignar(cantidades, solicitud.get("capacidad_minima", 0), solicitud.get("edificio"),
+                                      solicitud.get("franja")) is not None
+
+        orden = []
+        aceptadas_fcfs = 0
+        for (semestre, campus), indices in por_pool.items():
+            pool = self.pools.obtener(semestre, campus)
+            if pool is None:
+                orden.extend(indices)
+                continue
+            with pool.lock:
+                inventario = pool.inventario.copiar()
+            capacidades = []
+            for i in indices:
+                solicitud = solicitudes[i]
+                franja = solicitud.get("franja")
+                capacidades.append([inventario.disponibles(tipo, solicitud.get("capacidad_minima", 0),
+                                                           solicitud.get("edificio"), franja)
+                                    if inventario.validar_franja(franja) else 0
+                                    for tipo in (SALON, LABORATORIO)])
+            demandas = [[solicitudes[i]["salones"], solicitudes[i]["laboratorios"]] for i in indices]
+            facultades = [solicitudes[i]["facultad"] for i in indices]
+            prioridad = [indices[k] for k in ordenar(demandas, capacidades, admision.criterio, facultades)]
+            fcfs = inventario.copiar()
+            admitidas = [i for i in prioridad if simular(inventario, i)]
+            aceptadas_fcfs += sum(1 for i in indices if simular(fcfs, i))
+            elegidas = set(admitidas)
+            orden.extend(admitidas + [i for i in indices if i not in elegidas])
+
+        asignaciones = [None] * len(solicitudes)
+        for i in orden:
+            asignaciones[i] = asignar(self, solicitudes[i])
+        aceptadas = sum(1 for asignacion in asignaciones if asignacion["estado"] == "asignado")
+        admision.registrar(len(solicitudes), aceptadas, aceptadas_fcfs)
+        return asignaciones
+
+    def _numerar(self, asignacion, semestre, franja, id_solicitud=None, pool=None):
+        if id_solicitud is not None:
+            asignacion["id_solicitud"] = id_solicitud
+        traza = trazas.activa()
+        inicio = time.time()
+        with self.lock:
+            self.secuencia += 1
+            registro = dict(asignacion, secuencia=self.secuencia, semestre=semestre)
+            if franja is not None:
+                registro["franja"] = franja
+            if traza is not None:
+                # La traza viaja con el registro hasta la Réplica (el WAL no la guarda)
+                registro[trazas.CAMPO_TRAZA] = traza
+            if self.diario is not None:
+                self.diario.registrar(registro)
+            if self.replicador is not None:
+                self.replicador.registrar(registro)
+            if id_solicitud is not None:
+                self.idempotencia.completar(id_solicitud, dict(asignacion), self.secuencia)
+            if pool is not None:
+                # Bajo el lock global: una instantánea ve la asignación indexada
+                # en cuanto ve su secuencia
+                pool.anotar(registro)
+            asignacion["secuencia"] = self.secuencia
+        trazas.registrar(traza, "central.numerar", inicio, time.time())
         return asignacion
 
+# Clase para replicar asignaciones a la Réplica de forma asíncrona
+class Replicador:
+    """
+    Canal de replicación asíncrona hacia el Servidor Réplica.
+
+    Cada asignación confirmada recibe un número de secuencia monotónico. Un hilo
+    de fondo agrupa los registros en lotes multipart y mantiene una ventana
+    acotada de lotes sin confirmar; la Réplica aplica los lotes en orden y
+    responde con la secuencia más alta aplicada. El Central solo espera a la
+    Réplica en los puntos de sincronización configurados.
+
+    Sin tráfico, cada REPLICACION_SONDEO segundos se envía [b"sondeo",
+    secuencia]. Una Réplica que encuentra un hueco o que con el sondeo ve que
+    le faltan registros (reinició atrasada o sin estado) pide
+    [b"resincronizar", <secuencia aplicada>]. Si los registros que le faltan
+    siguen en el historial, se le reenvían como lotes normales. Si no, se
+    captura una instantánea (`obtener_instantanea`) y se envía comprimida en
+    partes [b"instantanea", secuencia, índice, total, datos], con su propia
+    ventana y a no más de RESINCRONIZACION_BYTES_SEG. Mientras tanto los
+    registros nuevos se acumulan y se envían después como lotes normales
+    (el delta desde la instantánea), con lo que la Réplica vuelve a la
+    replicación en vivo. Todo ocurre en el hilo del replicador: los hilos que
+    atienden solicitudes solo pagan la captura bajo el lock global.
+
+    Una Réplica que atendió escrituras durante un failover no se resincroniza
+    hasta devolverlas: envía [b"devolver", lote] y el Central las incorpora
+    con `reincorporar`, responde [b"reincorporados", <secuencia de la
+    Réplica>] cuando están en disco y le envía una instantánea que ya las
+    contiene.
+    """
+    def __init__(self, context, endpoint,
+                 tamano_lote=REPLICACION_LOTE,
+                 ventana=REPLICACION_VENTANA,
+                 intervalo_ms=REPLICACION_INTERVALO_MS,
+                 timeout_ack=REPLICACION_TIMEOUT_ACK,
+                 historial=REPLICACION_HISTORIAL):
+        self.context      = context
+        self.endpoint     = endpoint
+        self.tamano_lote  = tamano_lote
+        self.ventana      = ventana
+        self.intervalo_ms = intervalo_ms
+        self.timeout_ack  = timeout_ack
+
+        self.codec      = protocolo.CODEC_JSON  # pasa a binario si la Réplica lo anuncia
+        self.secuencia  = 0            # última secuencia asignada
+        self.confirmada = 0            # última secuencia confirmada por la Réplica
+        self.pendientes = deque()      # registros aún no enviados
+        self.ultimo_envio = 0.0        # instante del último lote o sondeo enviado
+        self.en_vuelo   = deque()      # lotes enviados: (hasta, frames, instante_envio)
+        self.historial  = deque(maxlen=historial)   # últimos registros ya enviados
+        self.cond       = threading.Condition()
+
+        # Resincronización: callable que devuelve (secuencia, estado) y envío en curso
+        self.obtener_instantanea = None
+        self.resincronizacion    = None
+        self.resincronizaciones  = {"delta": 0, "instantanea": 0}
+
+        # Fail-back: callable que incorpora las escrituras de la Réplica y sus contadores
+        self.reincorporar   = None
+        self.reincorporados = 0
+        self.conflictos     = 0
+
+    def registrar(self, registro):
+        """
+        Encola un registro de asignación (ya numerado) para replicar.
+        """
+        with self.cond:
+            self.secuencia = registro["secuencia"]
+            self.pendientes.append(registro)
+
+    def esperar(self, secuencia, timeout=REPLICACION_TIMEOUT_ACK):
+        """
+        Bloquea hasta que la Réplica confirme `secuencia` o venza el timeout.
+        Devuelve True si quedó confirmada.
+        """
+        limite = time.time() + timeout
+        with self.cond:
+            while self.confirmada < secuencia:
+                restante = limite - time.time()
+                if restante <= 0:
+                    return False
+                self.cond.wait(restante)
+            return True
+
+    def estado(self):
+        """
+        Devuelve cuánto va atrasada la Réplica respecto al Central.
+        """
+        with self.cond:
+            return {
+                "secuencia": self.secuencia,
+                "confirmada": self.confirmada,
+                "retraso": self.secuencia - self.confirmada,
+                "lotes_en_vuelo": len(self.en_vuelo),
+                "resincronizando": self.resincronizacion is not None,
+                "resincronizaciones": dict(self.resincronizaciones),
+                "reincorporados": self.reincorporados,
+                "conflictos": self.conflictos
+            }
+
+    def iniciar(self):
+        hilo = threading.Thread(target=self._bucle)
+        hilo.daemon = True
+        hilo.start()
+        return hilo
+
+    def _bucle(self):
+        # El socket vive solo en este hilo
+        socket = self.context.socket(zmq.DEALER)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect(self.endpoint)
+
+        while True:
+            if socket.poll(self.intervalo_ms):
+                self._recibir_acks(socket)
+
+            if self.resincronizacion is not None:
+                # Los lotes esperan a que la Réplica tenga la instantánea completa
+                self._enviar_partes(socket)
+                continue
+
+            with self.cond:
+                # Reenviar toda la ventana si el lote más antiguo no tuvo ACK a tiempo
+                ahora = time.time()
+                if self.en_vuelo and ahora - self.en_vuelo[0][2] > self.timeout_ack:
+                    reenviar = list(self.en_vuelo)
+                    self.en_vuelo = deque((hasta, frames, ahora) for hasta, frames, _ in reenviar)
+                else:
+                    reenviar = []
+
+                # Armar lotes nuevos mientras haya espacio en la ventana
+                nuevos = []
+                while self.pendientes and len(self.en_vuelo) < self.ventana:
+                    registros = []
+                    while self.pendientes and len(registros) < self.tamano_lote:
+                        registros.append(self.pendientes.popleft())
+                    frames = [b"lote", protocolo.codificar_lote(registros, protocolo.REGISTRO, self.codec)]
+                    self.en_vuelo.append((registros[-1]["secuencia"], frames, ahora))
+                    self.historial.extend(registros)
+                    nuevos.append(frames)
+
+                sondear = (not self.en_vuelo and not self.pendientes
+                           and ahora - self.ultimo_envio >= REPLICACION_SONDEO)
+                secuencia = self.secuencia
+                if reenviar or nuevos or sondear:
+                    self.ultimo_envio = ahora
+
+            for _, frames, _ in reenviar:
+                socket.send_multipart(frames)
+            for frames in nuevos:
+                socket.send_multipart(frames)
+            if sondear:
+                socket.send_multipart([b"sondeo", str(secuencia).encode("utf-8")])
+
+    def _recibir_acks(self, socket):
+        while True:
+            try:
+                frames = socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if len(frames) >= 2 and frames[0] == b"resincronizar":
+                # Un tercer frame pide la instantánea completa (la Réplica devolvió sus escrituras)
+                self._resincronizar(int(frames[1]), completa=len(frames) > 2)
+                continue
+            if len(frames) >= 2 and frames[0] == b"devolver":
+                self._recibir_devolucion(socket, frames[1:])
+                continue
+            if len(frames) >= 3 and frames[0] == b"ack_instantanea":
+                self._confirmar_parte(int(frames[1]), int(frames[2]))
+                continue
+            if len(frames) < 2 or frames[0] != b"ack":
+                continue
+            aplicada = int(frames[1])
+            # Una Réplica que entiende el protocolo binario anuncia su versión en el ACK
+            if (len(frames) > 2 and protocolo.CODEC_PREFERIDO == protocolo.CODEC_BINARIO
+                    and int(frames[2]) == protocolo.VERSION_BINARIA):
+                self.codec = protocolo.CODEC_BINARIO
+            with self.cond:
+                if aplicada > self.confirmada:
+                    self.confirmada = aplicada
+                    while self.en_vuelo and self.en_vuelo[0][0] <= aplicada:
+                        self.en_vuelo.popleft()
+                    self.cond.notify_all()
+
+    def _recibir_devolucion(self, socket, payloads):
+        """
+        Incorpora las escrituras que la Réplica atendió durante un failover, le
+        confirma hasta dónde quedaron en disco y la resincroniza con una
+        instantánea (su estado ya no sigue la numeración del Central).
+        """
+        if self.reincorporar is None:
+            print("⚠️  La Réplica devolvió escrituras y no hay dónde incorporarlas")
+            return
+        registros = []
+        try:
+            for payload in payloads:
+                registros.extend(protocolo.decodificar_lote(payload)[0])
+        except protocolo.ErrorProtocolo as error:
+            print(f"⚠️  Devolución ilegible de la Réplica: {error}")
+            return
+        # Fuera del lock del replicador: incorporar numera con el lock global
+        hasta, conflictos = self.reincorporar(registros)
+        with self.cond:
+            self.reincorporados += sum(1 for registro in registros if registro["secuencia"] <= hasta)
+            self.conflictos += conflictos
+        socket.send_multipart([b"reincorporados", str(hasta).encode("utf-8")])
+        print(f"Reincorporadas las escrituras de la Réplica hasta su secuencia {hasta} "
+              f"({conflictos} con aulas en conflicto)")
+        if registros and hasta == registros[-1]["secuencia"]:
+            self._resincronizar(hasta, completa=True)
+
+    def _resincronizar(self, desde, completa=False):
+        """
+        Atiende el pedido de una Réplica que solo tiene hasta `desde`. Con
+        `completa` se envía la instantánea aunque el historial cubra `desde`.
+        """
+        ahora = time.time()
+        if self.resincronizacion is not None and ahora - self.resincronizacion["actividad"] < RESINCRONIZACION_ABANDONO:
+            # Pedido repetido (llegaron lotes viejos durante el envío): sigue el actual
+            return
+        with self.cond:
+            if not completa and self.historial and self.historial[0]["secuencia"] <= desde + 1 and desde <= self.secuencia:
+                # Delta desde el historial: se vuelven a encolar los registros posteriores a `desde`
+                faltantes = [registro for registro in self.historial if registro["secuencia"] > desde]
+                while self.historial and self.historial[-1]["secuencia"] > desde:
+                    self.historial.pop()
+                self.pendientes.extendleft(reversed(faltantes))
+                self.en_vuelo.clear()
+                self.confirmada = desde
+                self.resincronizaciones["delta"] += 1
+                print(f"Resincronizando la Réplica desde {desde}: {len(faltantes)} registros del historial")
+                return
+        if self.obtener_instantanea is None:
+            print(f"⚠️  La Réplica pidió resincronizar desde {desde} y no hay instantánea disponible")
+            return
+
+        # Fuera del lock del replicador: `registrar` lo toma con el lock global
+        # tomado, así que aquí el orden debe ser el mismo (global -> replicador)
+        secuencia, estado = self.obtener_instantanea()
+        with self.cond:
+            # Lo encolado hasta `secuencia` ya está en la instantánea; lo posterior es el delta
+            self.pendientes = deque(r for r in self.pendientes if r["secuencia"] > secuencia)
+            self.en_vuelo.clear()
+            self.historial.clear()
+            self.confirmada = min(self.confirmada, desde)
+            self.resincronizaciones["instantanea"] += 1
+        cuerpo = zlib.compress(json.dumps(estado).encode("utf-8"))
+        partes = [cuerpo[i:i + RESINCRONIZACION_PARTE] for i in range(0, len(cuerpo), RESINCRONIZACION_PARTE)]
+        self.resincronizacion = {
+            "secuencia": secuencia,
+            "partes": partes,
+            "confirmadas": set(),
+            "base": 0,            # primera parte sin ACK
+            "siguiente": 0,       # próxima parte a enviar
+            "enviada_base": 0.0,  # instante del último envío de la parte base
+            "credito": float(RESINCRONIZACION_PARTE),
+            "instante": ahora,
+            "actividad": ahora
+        }
+        print(f"Resincronizando la Réplica desde {desde} con una instantánea en la secuencia {secuencia} "
+              f"({len(cuerpo)} bytes en {len(partes)} partes)")
+
+    def _enviar_partes(self, socket):
+        """
+        Envía las partes de la instantánea dentro de la ventana y del ritmo
+        permitido; si la parte base no tiene ACK a tiempo, vuelve a enviar desde ella.
+        """
+        r = self.resincronizacion
+        ahora = time.time()
+        if ahora - r["actividad"] > RESINCRONIZACION_ABANDONO:
+            print(f"⚠️  La Réplica dejó de confirmar la instantánea {r['secuencia']}; se espera un nuevo pedido")
+            self.resincronizacion = None
+            return
+        # Crédito de bytes (cubeta de fichas), como mucho una ventana completa
+        r["credito"] = min(r["credito"] + (ahora - r["instante"]) * RESINCRONIZACION_BYTES_SEG,
+                           float(RESINCRONIZACION_VENTANA * RESINCRONIZACION_PARTE))
+        r["instante"] = ahora
+        if r["siguiente"] > r["base"] and ahora - r["enviada_base"] > self.timeout_ack:
+            r["siguiente"] = r["base"]
+        total = str(len(r["partes"])).encode("utf-8")
+        secuencia = str(r["secuencia"]).encode("utf-8")
+        while (r["siguiente"] < len(r["partes"]) and r["siguiente"] - r["base"] < RESINCRONIZACION_VENTANA
+               and r["credito"] >= len(r["partes"][r["siguiente"]])):
+            indice = r["siguiente"]
+            if indice in r["confirmadas"]:
+                r["siguiente"] += 1
+                continue
+            parte = r["partes"][indice]
+            socket.send_multipart([b"instantanea", secuencia, str(indice).encode("utf-8"), total, parte])
+            r["credito"] -= len(parte)
+            if indice == r["base"]:
+                r["enviada_base"] = ahora
+            r["siguiente"] += 1
+
+    def _confirmar_parte(self, secuencia, indice):
+        r = self.resincronizacion
+        if r is None or secuencia != r["secuencia"]:
+            return
+        r["confirmadas"].add(indice)
+        r["actividad"] = time.time()
+        while r["base"] in r["confirmadas"]:
+            r["base"] += 1
+            r["enviada_base"] = r["actividad"]
+        if r["base"] < len(r["partes"]):
+            return
+        # La Réplica instaló la instantánea: el delta acumulado sale como lotes normales
+        with self.cond:
+            self.confirmada = secuencia
+            self.resincronizacion = None
+            self.cond.notify_all()
+            delta = len(self.pendientes)
+        print(f"Réplica resincronizada en la secuencia {secuencia}; {delta} registros de delta en cola")
+
 # Clase para registrar métricas de tiempo
 class Metricas:
+    """
+    Métricas de latencia con memoria fija: histogramas logarítmicos global, por
+    facultad, por estado y por pool (semestre/campus), más una ventana
+    deslizante del último minuto. El lock cubre la inserción O(1) y la copia
+    de los conteos; combinar la ventana y calcular los percentiles se hace
+    fuera de él sobre las copias.
+    """
     def __init__(self):
-        self.tiempos_totales = []
-        self.atendidos = 0
-        self.no_atendidos = 0
-        self.lock = threading.Lock()
+        self.total         = Histograma()
+        self.por_facultad  = {}
+        self.por_estado    = {}
+        self.por_pool      = {}      # pool -> [histograma, atendidos, no_atendidos]
+        self.ventana       = VentanaDeslizante(num_ranuras=60, duracion_ranura=1.0)
+        self.atendidos     = 0
+        self.no_atendidos  = 0
+        self.lock          = threading.Lock()
 
-    def registrar_respuesta(self, inicio, fin, asignacion):
+    def registrar_respuesta(self, inicio, fin, asignacion, pool=""):
         tiempo_total = fin - inicio
+        facultad = asignacion.get("facultad", "")
+        estado   = asignacion["estado"]
         with self.lock:
-            self.tiempos_totales.append(tiempo_total)
-            if asignacion["estado"] == "asignado":
+            self.total.registrar(tiempo_total)
+            if facultad not in self.por_facultad:
+                self.por_facultad[facultad] = Histograma()
+            self.por_facultad[facultad].registrar(tiempo_total)
+            if estado not in self.por_estado:
+                self.por_estado[estado] = Histograma()
+            self.por_estado[estado].registrar(tiempo_total)
+            if pool not in self.por_pool:
+                self.por_pool[pool] = [Histograma(), 0, 0]
+            datos_pool = self.por_pool[pool]
+            datos_pool[0].registrar(tiempo_total)
+            self.ventana.registrar(tiempo_total, fin)
+            if estado == "asignado":
                 self.atendidos += 1
+                datos_pool[1] += 1
             else:
                 self.no_atendidos += 1
+                datos_pool[2] += 1
 
     def obtener_metricas(self):
+        # Copiar bajo el lock (tamaño fijo) y calcular percentiles fuera de él
+        ahora = time.time()
         with self.lock:
-            tiempos = self.tiempos_totales
-            if tiempos:
-                promedio = sum(tiempos) / len(tiempos)
-                minimo = min(tiempos)
-                maximo = max(tiempos)
-            else:
-                promedio = minimo = maximo = 0
-            return {
-                "promedio_respuesta": promedio,
-                "min_respuesta": minimo,
-                "max_respuesta": maximo,
-                "atendidos": self.atendidos,
-                "no_atendidos": self.no_atendidos
+            total        = self.total.copiar()
+            por_facultad = {k: h.copiar() for k, h in self.por_facultad.items()}
+            por_estado   = {k: h.copiar() for k, h in self.por_estado.items()}
+            por_pool     = {k: (h.copiar(), a, n) for k, (h, a, n) in self.por_pool.items()}
+            ventana      = self.ventana.copiar()
+            atendidos    = self.atendidos
+            no_atendidos = self.no_atendidos
+        # Combinar las ranuras (60 histogramas) ya sin el lock
+        ultimo_minuto = ventana.combinado(ahora=ahora)
+        ultimos_10s   = ventana.combinado(10, ahora=ahora)
+        resumen = total.resumen()
+        return {
+            "promedio_respuesta": resumen["promedio"],
+            "min_respuesta": resumen["min"],
+            "max_respuesta": resumen["max"],
+            "atendidos": atendidos,
+            "no_atendidos": no_atendidos,
+            "latencia": resumen,
+            "por_facultad": {k: h.resumen() for k, h in por_facultad.items()},
+            "por_estado": {k: h.resumen() for k, h in por_estado.items()},
+            "por_pool": {
+                k: {"atendidos": a, "no_atendidos": n, "latencia": h.resumen()}
+                for k, (h, a, n) in por_pool.items()
+            },
+            "ventanas": {
+                "ultimos_10s": ultimos_10s.resumen(),
+                "ultimo_minuto": ultimo_minuto.resumen()
             }
+        }
+
+def asignar(recursos, solicitud):
+    """
+    Asigna una solicitud decodificada; el id vuelve en la respuesta para que la
+    facultad la empareje con su lote. La traza de la solicitud queda activa en
+    el hilo para los tramos que mide Recursos.
+    """
+    trazas.activar(solicitud.get(trazas.CAMPO_TRAZA))
+    return recursos.asignar_aulas(
+        solicitud["salones"],
+        solicitud["laboratorios"],
+        solicitud["facultad"],
+        solicitud["programa"],
+        solicitud.get("semestre", ""),
+        solicitud.get("franja"),
+        solicitud.get("capacidad_minima", 0),
+        solicitud.get("edificio"),
+        solicitud.get("campus", ""),
+        solicitud.get("id_solicitud")
+    )
+
+def responder(socket, recursos, metricas, destinos, solicitud, asignacion, secuencia, tiempo_inicio,
+              sincronizar_cada, registrar_metricas=True):
+    """
+    Envía la asignación a cada destino (identidad, codec) una vez que es durable
+    y, en los puntos de sincronización, confirmada por la Réplica.
+    """
+    traza = solicitud.get(trazas.CAMPO_TRAZA)
+    # No responder hasta que la asignación esté en disco (group commit)
+    if recursos.diario is not None:
+        with trazas.tramo("central.wal", traza):
+            recursos.diario.esperar(secuencia)
+
+    # Punto de sincronización: esperar a que la Réplica confirme esta secuencia
+    replicador = recursos.replicador
+    if replicador is not None and sincronizar_cada > 0 and secuencia % sincronizar_cada == 0:
+        with trazas.tramo("central.replicacion", traza):
+            confirmada = replicador.esperar(secuencia)
+        if not confirmada:
+            print(f"⚠️  La Réplica no confirmó la secuencia {secuencia}: {replicador.estado()}")
+
+    tiempo_fin = time.time()
+    if registrar_metricas:
+        metricas.registrar_respuesta(tiempo_inicio, tiempo_fin, asignacion,
+                                     clave_pool(solicitud.get("semestre", ""), solicitud.get("campus", "")))
 
-def manejar_solicitud(socket, recursos, metricas):
+    with trazas.tramo("central.envio", traza):
+        for identity, codec in destinos:
+            socket.send_multipart([identity, protocolo.codificar(asignacion, protocolo.ASIGNACION, codec)])
+    with trazas.tramo("central.print", traza):
+        print(f"Servidor respondió: {asignacion}")
+
+def resolver_ventana(socket, recursos, metricas, admision, ventana, sincronizar_cada):
     """
-    Procesa solicitudes de las facultades de forma secuencial en un solo hilo.
+    Asigna juntas las solicitudes de una ventana con el criterio de admisión y
+    las responde todas.
+    """
+    ahora = time.time()
+    for entrada in ventana:
+        trazas.registrar(entrada["solicitud"].get(trazas.CAMPO_TRAZA), "central.ventana", entrada["inicio"], ahora)
+    asignaciones = recursos.asignar_ventana([entrada["solicitud"] for entrada in ventana], admision)
+    secuencias = [asignacion.pop("secuencia") for asignacion in asignaciones]
+    # Un solo esperar por la secuencia más alta cubre toda la ventana
+    if recursos.diario is not None:
+        recursos.diario.esperar(max(secuencias))
+    for entrada, asignacion, secuencia in zip(ventana, asignaciones, secuencias):
+        responder(socket, recursos, metricas, entrada["destinos"], entrada["solicitud"], asignacion,
+                  secuencia, entrada["inicio"], sincronizar_cada)
+
+def obtener_estadisticas(recursos, metricas, admision=None):
+    """
+    Métricas del Central junto con el estado de la replicación, los pools, la
+    caché de idempotencia y la admisión por ventana.
+    """
+    estadisticas = metricas.obtener_metricas()
+    if recursos.replicador is not None:
+        estadisticas["replicacion"] = recursos.replicador.estado()
+    estadisticas["pools"] = recursos.pools.resumen()
+    estadisticas["idempotencia"] = recursos.idempotencia.estado()
+    if admision is not None:
+        estadisticas["admision"] = admision.estado()
+    if recursos.prestamos is not None:
+        estadisticas["fragmento"] = recursos.prestamos.estado()
+    return estadisticas
+
+def manejar_solicitud(socket, recursos, metricas, sincronizar_cada=REPLICACION_SINCRONIZAR_CADA,
+                      admision=None):
     """
+    Procesa solicitudes de las facultades de forma secuencial sobre un socket
+    (el ROUTER en modo de hilo único o el DEALER de un trabajador del broker).
+
+    Sin `admision` cada solicitud se asigna al llegar (FCFS). Con ella, las
+    solicitudes se acumulan en una ventana de `admision.ventana` segundos o
+    `admision.max_solicitudes` solicitudes y se asignan todas juntas.
+    """
+    ventana    = []   # entradas de la ventana de admisión en curso
+    en_ventana = {}   # id_solicitud -> entrada (reenvíos que llegan en la misma ventana)
     while True:
+        trazas.PERFILADOR.revisar()
+        if ventana:
+            restante = ventana[0]["inicio"] + admision.ventana - time.time()
+            if restante <= 0 or not socket.poll(restante * 1000):
+                resolver_ventana(socket, recursos, metricas, admision, ventana, sincronizar_cada)
+                ventana, en_ventana = [], {}
+                continue
+
         # Recibir multipart: identidad + payload
         frames   = socket.recv_multipart()
         identity = frames[0]
         mensaje  = frames[-1]
 
+        # Consulta de métricas: se atiende sin detener el servidor
+        if mensaje == b"metricas":
+            estadisticas = obtener_estadisticas(recursos, metricas, admision)
+            socket.send_multipart(frames[:-1] + [json.dumps(estadisticas).encode('utf-8')])
+            continue
+
+        # Consultas de solo lectura (disponibilidad, asignaciones, métricas)
+        if es_consulta(frames):
+            socket.send_multipart(atender_consulta(
+                frames, recursos.pools, recursos.etiqueta(),
+                lambda: obtener_estadisticas(recursos, metricas, admision)
+            ))
+            continue
+
         tiempo_inicio = time.time()
-        solicitud = json.loads(mensaje.decode('utf-8'))
-        print(f"Servidor recibió solicitud: {solicitud}")
-
-        asignacion = recursos.asignar_aulas(
-            solicitud["salones"],
-            solicitud["laboratorios"],
-            solicitud["facultad"],
-            solicitud["programa"]
-        )
+        try:
+            solicitud, codec = protocolo.decodificar(mensaje)
+        except protocolo.ErrorProtocolo as e:
+            # Se responde en JSON para que el cliente deje el binario y reenvíe
+            print(f"⚠️  Solicitud ilegible descartada: {e}")
+            socket.send_multipart(frames[:-1] + [protocolo.respuesta_ilegible(e)])
+            continue
+        # Responder en el codec de la solicitud (o en binario si el cliente lo anunció)
+        codec = protocolo.codec_respuesta(codec, solicitud)
+        trazas.registrar(solicitud.get(trazas.CAMPO_TRAZA), "central.decodificar", tiempo_inicio, time.time())
+        with trazas.tramo("central.print", solicitud.get(trazas.CAMPO_TRAZA)):
+            print(f"Servidor recibió solicitud: {solicitud}")
+        motivo = validar_solicitud(solicitud)
+        if motivo is not None:
+            # Se rechaza con el motivo (sin numerar): la facultad no la reenvía
+            print(f"⚠️  Solicitud inválida rechazada ({motivo}): {solicitud}")
+            socket.send_multipart([identity, protocolo.codificar(respuesta_invalida(solicitud, motivo),
+                                                                 protocolo.ASIGNACION, codec)])
+            continue
 
-        tiempo_fin = time.time()
-        metricas.registrar_respuesta(tiempo_inicio, tiempo_fin, asignacion)
+        # Un reenvío (mismo id_solicitud) recibe la respuesta original sin tocar Recursos
+        id_solicitud = solicitud.get("id_solicitud")
+        if id_solicitud in en_ventana:
+            en_ventana[id_solicitud]["destinos"].append((identity, codec))
+            continue
+        previa = recursos.idempotencia.reservar(id_solicitud) if id_solicitud is not None else None
+        if previa == EN_CURSO:
+            # El original sigue sin terminar: se pide reintentar en vez de asignar dos veces
+            print(f"Servidor pide reintentar {id_solicitud}: el original sigue en curso")
+            socket.send_multipart([identity, protocolo.codificar(respuesta_en_curso(solicitud),
+                                                                 protocolo.ASIGNACION, codec)])
+            continue
+        if previa is not None:
+            asignacion, secuencia = dict(previa[0]), previa[1]
+            print(f"Servidor reconoció el reenvío de {id_solicitud} (secuencia {secuencia})")
+            responder(socket, recursos, metricas, [(identity, codec)], solicitud, asignacion, secuencia,
+                      tiempo_inicio, sincronizar_cada, registrar_metricas=False)
+            continue
 
-        respuesta = json.dumps(asignacion).encode('utf-8')
-        socket.send_multipart([identity, respuesta])
-        print(f"Servidor respondió: {asignacion}")
+        if admision is None:
+            asignacion = asignar(recursos, solicitud)
+            secuencia = asignacion.pop("secuencia")
+            responder(socket, recursos, metricas, [(identity, codec)], solicitud, asignacion, secuencia,
+                      tiempo_inicio, sincronizar_cada)
+            continue
 
-def servidor_central(puerto):
+        entrada = {"solicitud": solicitud, "destinos": [(identity, codec)], "inicio": tiempo_inicio}
+        ventana.append(entrada)
+        if id_solicitud is not None:
+            en_ventana[id_solicitud] = entrada
+        if len(ventana) >= admision.max_solicitudes:
+            resolver_ventana(socket, recursos, metricas, admision, ventana, sincronizar_cada)
+            ventana, en_ventana = [], {}
+
+def trabajador(context, recursos, metricas, sincronizar_cada, admision=None):
+    """
+    Hilo trabajador del modo broker: abre su propio socket DEALER contra el
+    backend inproc y atiende solicitudes con la misma lógica que el hilo único.
     """
-    Inicia el servidor central en el puerto indicado, usando un único hilo.
+    socket = context.socket(zmq.DEALER)
+    socket.connect(BACKEND_TRABAJADORES)
+    manejar_solicitud(socket, recursos, metricas, sincronizar_cada, admision)
+
+def servidor_central(puerto, trabajadores=1,
+                     endpoint_replica=f"tcp://{IP_REPLICA}:{PUERTO_REPLICA}",
+                     sincronizar_cada=REPLICACION_SINCRONIZAR_CADA,
+                     directorio_estado=DIRECTORIO_ESTADO,
+                     endpoint_pub_latidos=None,
+                     archivo_inventario=ARCHIVO_INVENTARIO,
+                     criterio_admision=CRITERIO_FCFS,
+                     mapa_fragmentos=None, fragmento=None):
     """
-    context = zmq.Context()
+    Inicia el servidor central en el puerto indicado.
+
+    Con un solo trabajador se usa un único hilo sobre el socket ROUTER. Con más
+    de uno se levanta un broker ROUTER/DEALER: el frontend ROUTER reparte las
+    solicitudes por un backend inproc a un pool de hilos, cada uno con su propio
+    socket, y todos comparten los mismos Recursos protegidos por su lock.
+
+    Si `endpoint_replica` no es None, las asignaciones se replican de forma
+    asíncrona a la Réplica; `sincronizar_cada` fija cada cuántas asignaciones
+    se espera su ACK antes de responder (0 = nunca).
+
+    Si `directorio_estado` no es None, el estado se recupera de ese directorio
+    al arrancar y cada asignación se registra en el WAL antes de responder.
+
+    Los latidos se publican en `endpoint_pub_latidos` (por defecto en el
+    puerto + DESFASE_LATIDOS) para que las facultades detecten caídas sin sondeo.
+
+    Las aulas se cargan de `archivo_inventario` (CSV o JSON); si no existe se
+    usa el campus clásico de 380 salones y 60 laboratorios. Cada semestre (y
+    campus) tiene su propio pool con su lock.
+
+    Con `criterio_admision` distinto de "fcfs" ("max_solicitudes" o
+    "equitativo") cada hilo acumula las solicitudes en ventanas cortas y las
+    asigna juntas para satisfacer más solicitudes; la métrica "admision" compara
+    la tasa de aceptación con la que habría dado FCFS.
+
+    Con `mapa_fragmentos` (MapaFragmentos) el servidor es el fragmento
+    `fragmento` de un despliegue de varios Centrales: solo son suyas las aulas
+    que le da el reparto del mapa (o que le presten), atiende en otro hilo los
+    préstamos que piden sus pares y, si le faltan aulas, las pide antes de
+    rechazar. Las facultades llegan a él según el anillo del mapa.
+    """
+    # Contexto compartido del proceso: permite endpoints inproc:// en pruebas de carga
+    context = zmq.Context.instance()
     socket  = context.socket(zmq.ROUTER)
-    socket.bind(f"tcp://*:{puerto}")
+    # `puerto` puede ser un número (tcp://*:<puerto>) o un endpoint completo
+    socket.bind(puerto if isinstance(puerto, str) else f"tcp://*:{puerto}")
 
-    recursos = Recursos()
+    replicador = None
+    if endpoint_replica is not None:
+        replicador = Replicador(context, endpoint_replica)
+        replicador.iniciar()
+
+    if mapa_fragmentos is None:
+        pools = cargar_pools(archivo_inventario)
+    else:
+        aulas = cargar_aulas(archivo_inventario)
+        pools = PoolsAulas(aulas, propias=mapa_fragmentos.aulas_de(fragmento, aulas))
+    recursos = Recursos(replicador, pools)
+    if replicador is not None:
+        replicador.obtener_instantanea = recursos.instantanea
+        replicador.reincorporar = recursos.reincorporar
+    if directorio_estado is not None:
+        recursos.habilitar_persistencia(directorio_estado)
+        if replicador is not None:
+            replicador.secuencia = recursos.secuencia
     metricas = Metricas()
+    admision = None if criterio_admision == CRITERIO_FCFS else Admision(criterio_admision)
+    if mapa_fragmentos is not None:
+        # Los préstamos se atienden después de recuperar el estado, para no ceder aulas ya usadas
+        recursos.prestamos = Prestamos(context, mapa_fragmentos, fragmento)
+        recursos.prestamos.atender(recursos)
 
-    # Un solo hilo para no compartir el socket ROUTER
-    thread = threading.Thread(
-        target=manejar_solicitud,
-        args=(socket, recursos, metricas)
-    )
-    thread.daemon = True
-    thread.start()
+    endpoint_pub_latidos = endpoint_pub_latidos or endpoint_latidos(puerto)
+    if endpoint_pub_latidos is not None:
+        Latidor(context, endpoint_pub_latidos, "central", lambda: recursos.secuencia).iniciar()
 
-    print(f"Servidor central iniciado en puerto {puerto}.")
-    while True:
-        time.sleep(1)
+    if trabajadores <= 1:
+        # Un solo hilo para no compartir el socket ROUTER
+        thread = threading.Thread(
+            target=manejar_solicitud,
+            args=(socket, recursos, metricas, sincronizar_cada, admision)
+        )
+        thread.daemon = True
+        thread.start()
+
+        print(f"Servidor central iniciado en puerto {puerto}.")
+        while True:
+            time.sleep(1)
+
+    # Modo broker: el backend debe enlazarse antes de que conecten los trabajadores
+    backend = context.socket(zmq.DEALER)
+    backend.bind(BACKEND_TRABAJADORES)
+
+    for _ in range(trabajadores):
+        thread = threading.Thread(
+            target=trabajador,
+            args=(context, recursos, metricas, sincronizar_cada, admision)
+        )
+        thread.daemon = True
+        thread.start()
+
+    print(f"Servidor central iniciado en puerto {puerto} con {trabajadores} trabajadores.")
+    # El hilo principal reenvía mensajes entre frontend y backend
+    zmq.proxy(socket, backend)
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) != 2:
-        print("Uso: python3 servidor_central.py <puerto>")
+    if len(sys.argv) in (4, 5, 6) and sys.argv[1] == "--fragmento":
+        # Modo fragmentado: python3 servidor_central.py --fragmento <nombre> <mapa.json> [trabajadores] [archivo_aulas]
+        nombre = sys.argv[2]
+        mapa = MapaFragmentos.leer(sys.argv[3])
+        if nombre not in mapa.fragmentos:
+            print(f"El fragmento {nombre} no está en {sys.argv[3]}")
+            sys.exit(1)
+        trazas.configurar(f"central_{nombre}")
+        trazas.instalar_senal()
+        servidor_central(puerto_de(mapa.endpoint(nombre)),
+                         int(sys.argv[4]) if len(sys.argv) >= 5 else 1,
+                         endpoint_replica=mapa.replica(nombre),
+                         directorio_estado=f"{DIRECTORIO_ESTADO}_{nombre}",
+                         archivo_inventario=sys.argv[5] if len(sys.argv) == 6 else ARCHIVO_INVENTARIO,
+                         mapa_fragmentos=mapa, fragmento=nombre)
+    if len(sys.argv) not in (2, 3, 4, 5) or (len(sys.argv) == 5 and sys.argv[4] not in CRITERIOS):
+        print("Uso: python3 servidor_central.py <puerto> [trabajadores] [archivo_aulas] "
+              "[fcfs|max_solicitudes|equitativo]\n"
+              "     python3 servidor_central.py --fragmento <nombre> <mapa.json> [trabajadores] [archivo_aulas]")
         sys.exit(1)
     puerto = int(sys.argv[1])
-    servidor_central(puerto)
+    trabajadores = int(sys.argv[2]) if len(sys.argv) >= 3 else 1
+    archivo_inventario = sys.argv[3] if len(sys.argv) >= 4 else ARCHIVO_INVENTARIO
+    criterio_admision = sys.argv[4] if len(sys.argv) == 5 else CRITERIO_FCFS
+    # Tramos en trazas_central.tsv; `kill -USR2 <pid>` alterna el perfilado
+    trazas.configurar("central")
+    trazas.instalar_senal()
+    servidor_central(puerto, trabajadores, archivo_inventario=archivo_inventario,
+                     criterio_admision=criterio_admision)
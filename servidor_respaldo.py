@@ -1,124 +1,660 @@
+import os
 import zmq
 import threading
 import json
 import time
+import zlib
+
+from persistencia import DiarioEstado
+from histograma import Histograma, VentanaDeslizante
+import protocolo
+import trazas
+from latidos import Latidor, endpoint_latidos
+from idempotencia import CacheIdempotencia, respuesta_de_registro, respuesta_en_curso, EN_CURSO
+from consultas import es_consulta, atender_consulta
+from inventario import (cargar_pools, cargar_aulas, clave_pool, PoolsAulas, CerrojoPools, ARCHIVO_INVENTARIO,
+                        validar_solicitud, respuesta_invalida, SALON, LABORATORIO)
+from fragmentos import MapaFragmentos, puerto_de
+
+# Carpeta del WAL y las instantáneas de la Réplica
+DIRECTORIO_ESTADO = "estado_respaldo"
+
+# Segundos sin recibir partes de la instantánea antes de volver a pedir la resincronización
+RESINCRONIZACION_REINTENTO = 5.0
+
+# Archivo (en la carpeta de estado) con la última secuencia del Central antes
+# de la primera escritura propia; existe mientras la Réplica no se resincronizó
+ARCHIVO_CERCO = "cerco.json"
 
 # --- CLASES DE NEGOCIO (idénticas a Central) ---
 
 class Recursos:
-    def __init__(self):
-        self.salones_disponibles    = 380
-        self.laboratorios_disponibles = 60
-        self.lock = threading.Lock()
+    def __init__(self, pools=None):
+        self.pools              = pools if pools is not None else cargar_pools(None)
+        self.secuencia_aplicada = 0   # última secuencia replicada aplicada
+        self.secuencia_vista    = 0   # secuencia más alta recibida del Central
+        self.ultimo_lote        = None   # instante del último lote recibido
+        # Resincronización con el Central: instante del último pedido o parte
+        # recibida, partes de la instantánea en curso y última instalada
+        self.resincronizacion   = None
+        self.recepcion          = None
+        self.instalada          = None
+        # Escrituras atendidas por la Réplica (failover) que el Central aún no
+        # confirmó; `cerco` es la secuencia del Central previa a la primera
+        self.cerco              = None
+        self.propias            = []
+        self.archivo_cerco      = None
+        self.aviso_adelantada   = None
+        # Lock corto y global para numerar y encolar en el WAL; cada pool tiene el suyo
+        self.lock    = threading.Lock()
+        # Instantáneas: todos los pools y luego el lock global (corte exacto)
+        self.cerrojo = CerrojoPools(self.pools, self.lock)
+        self.diario  = None
+        # Respuestas ya enviadas por id_solicitud (se persiste y se replica con los registros)
+        self.idempotencia = CacheIdempotencia()
+
+    def capturar(self):
+        """
+        Devuelve (secuencia, estado) para una instantánea. Requiere `cerrojo` tomado.
+        """
+        return self.secuencia_aplicada, {"pools": self.pools.capturar(),
+                                        "idempotencia": self.idempotencia.capturar(),
+                                        "propias": list(self.propias)}
+
+    def restaurar(self, estado, registros):
+        """
+        Aplica una instantánea y los registros posteriores del WAL.
+        """
+        if estado is not None:
+            if "pools" in estado:
+                self.pools.restaurar(estado["pools"])
+            elif "inventario" in estado:
+                # Instantánea de antes de los pools: un único inventario global
+                self.pools.restaurar([{"semestre": "", "campus": "", "inventario": estado["inventario"]}])
+            else:
+                # Instantánea de antes del inventario: solo había contadores
+                inventario = self.pools.obtener("").inventario
+                inventario.asignar({
+                    SALON:       inventario.disponibles(SALON) - estado["salones_disponibles"],
+                    LABORATORIO: inventario.disponibles(LABORATORIO) - estado["laboratorios_disponibles"]
+                })
+            self.idempotencia.restaurar(estado.get("idempotencia", []))
+            self.propias = list(estado.get("propias", []))
+        for registro in registros:
+            self.pools.aplicar_registro(registro)
+            self.recordar(registro)
+            if self.cerco is not None and registro["secuencia"] > self.cerco:
+                # Escritura propia posterior a la instantánea: sigue sin devolver
+                self.propias.append(registro)
 
-    def asignar_aulas(self, salones_solicitados, laboratorios_solicitados, facultad, programa):
+    def recordar(self, registro):
+        """
+        Guarda en la caché de idempotencia la respuesta de un registro con id.
+        """
+        if "id_solicitud" in registro:
+            self.idempotencia.completar(registro["id_solicitud"], respuesta_de_registro(registro),
+                                        registro["secuencia"])
+
+    def etiqueta(self):
+        """
+        Etiqueta de las respuestas a consultas: secuencia aplicada, registros
+        ya recibidos del Central que faltan por aplicar y segundos desde el
+        último lote (con el Central inactivo crece aunque no falte nada).
+        """
+        return {
+            "rol": "respaldo",
+            "secuencia": self.secuencia_aplicada,
+            "retraso": max(0, self.secuencia_vista - self.secuencia_aplicada),
+            "antiguedad": None if self.ultimo_lote is None else time.time() - self.ultimo_lote,
+            "resincronizando": self.resincronizacion is not None,
+            "sin_devolver": len(self.propias)
+        }
+
+    def pedir_resincronizacion(self):
+        """
+        Indica si hay que pedir al Central una resincronización: no si ya se
+        pidió (o llegó una parte) hace menos de RESINCRONIZACION_REINTENTO.
+        """
+        ahora = time.time()
+        if self.resincronizacion is not None and ahora - self.resincronizacion < RESINCRONIZACION_REINTENTO:
+            return False
+        self.resincronizacion = ahora
+        print(f"Servidor Réplica - Pide resincronizar desde la secuencia {self.secuencia_aplicada} "
+              f"(el Central va en {self.secuencia_vista})")
+        return True
+
+    def reconciliar(self):
+        """
+        Mensaje para el Central mientras la Réplica tiene escrituras propias:
+        [b"devolver", lote] con las que el Central aún no confirmó o, si ya
+        las confirmó todas, el pedido de la instantánea completa. None si se
+        envió hace menos de RESINCRONIZACION_REINTENTO.
+        """
+        ahora = time.time()
+        if self.resincronizacion is not None and ahora - self.resincronizacion < RESINCRONIZACION_REINTENTO:
+            return None
+        self.resincronizacion = ahora
+        with self.lock:
+            propias = list(self.propias)
+            aplicada = str(self.secuencia_aplicada).encode("utf-8")
+        if not propias:
+            print("Servidor Réplica - Pide la instantánea del Central tras devolver sus escrituras")
+            return [b"resincronizar", aplicada, b"instantanea"]
+        print(f"Servidor Réplica - Devuelve al Central {len(propias)} escrituras atendidas en el failover "
+              f"(desde la secuencia {self.cerco})")
+        return [b"devolver", protocolo.codificar_lote(propias, protocolo.REGISTRO, protocolo.CODEC_JSON)]
+
+    def confirmar_devolucion(self, hasta):
+        """
+        El Central tiene en disco las escrituras propias hasta `hasta`: dejan
+        de estar pendientes. El cerco sigue hasta instalar su instantánea.
+        """
         with self.lock:
-            if (salones_solicitados <= self.salones_disponibles and
-                laboratorios_solicitados <= self.laboratorios_disponibles):
-                self.salones_disponibles    -= salones_solicitados
-                self.laboratorios_disponibles -= laboratorios_solicitados
+            self.propias = [registro for registro in self.propias if registro["secuencia"] > hasta]
+        self.resincronizacion = None
+        print(f"Servidor Réplica - El Central confirmó sus escrituras hasta la secuencia {hasta}")
+
+    def adelantada(self, secuencia_central):
+        """
+        Avisa (una vez por secuencia) que el Central va detrás sin que la
+        Réplica haya escrito por su cuenta: no se resincroniza, porque eso
+        borraría registros que el Central ya confirmó y perdió.
+        """
+        if self.aviso_adelantada == secuencia_central:
+            return
+        self.aviso_adelantada = secuencia_central
+        print(f"⚠️  Servidor Réplica - El Central anuncia la secuencia {secuencia_central} y la Réplica va en "
+              f"{self.secuencia_aplicada}: no se resincroniza para no perder registros confirmados")
+
+    def _guardar_cerco(self):
+        # Requiere self.lock tomado; escritura atómica como las instantáneas
+        if self.archivo_cerco is None:
+            return
+        if self.cerco is None:
+            if os.path.exists(self.archivo_cerco):
+                os.remove(self.archivo_cerco)
+            return
+        with open(self.archivo_cerco + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"cerco": self.cerco}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.archivo_cerco + ".tmp", self.archivo_cerco)
+
+    def recibir_parte(self, secuencia, indice, total, parte):
+        """
+        Guarda una parte de la instantánea que envía el Central y, con la
+        última, la instala. Las partes repetidas de una instantánea ya
+        instalada se ignoran (solo se confirman).
+
+        Returns:
+            bool: False si la parte se rechaza porque quedan escrituras propias
+            sin devolver (instalarla las borraría).
+        """
+        if self.propias:
+            return False
+        if secuencia == self.instalada:
+            return True
+        self.resincronizacion = time.time()
+        if self.recepcion is None or self.recepcion["secuencia"] != secuencia:
+            self.recepcion = {"secuencia": secuencia, "total": total, "partes": {}}
+        self.recepcion["partes"][indice] = parte
+        if len(self.recepcion["partes"]) < total:
+            return True
+        partes = self.recepcion["partes"]
+        estado = json.loads(zlib.decompress(b"".join(partes[i] for i in range(total))).decode("utf-8"))
+        self.instalar(secuencia, estado)
+        return True
+
+    def instalar(self, secuencia, estado):
+        """
+        Reemplaza todo el estado por la instantánea del Central en `secuencia`
+        y la guarda como instantánea propia (el WAL anterior se descarta).
+        Los pools y la caché se rehacen con el cerrojo de captura tomado, así
+        que ni una consulta ni la instantánea del diario ven el estado a medias.
+        Solo se llega aquí sin escrituras propias pendientes: las devueltas ya
+        están en la instantánea, así que el cerco se levanta.
+        """
+        with self.cerrojo:
+            self.pools.reiniciar()
+            self.idempotencia = CacheIdempotencia()
+            self.cerco = None
+            self.restaurar(estado, [])
+            self.secuencia_aplicada = secuencia
+            self.secuencia_vista = max(self.secuencia_vista, secuencia)
+        if self.diario is not None:
+            self.diario.reiniciar(secuencia)
+        with self.lock:
+            self._guardar_cerco()
+        self.instalada = secuencia
+        self.recepcion = None
+        self.resincronizacion = None
+        print(f"Servidor Réplica - Instantánea del Central instalada en la secuencia {secuencia}")
+
+    def habilitar_persistencia(self, directorio):
+        """
+        Recupera el estado desde la última instantánea más la cola del WAL y
+        arranca el diario para los registros siguientes.
+        """
+        self.diario = DiarioEstado(directorio, self.cerrojo, self.capturar)
+        self.archivo_cerco = os.path.join(directorio, ARCHIVO_CERCO)
+        if os.path.exists(self.archivo_cerco):
+            with open(self.archivo_cerco, encoding="utf-8") as f:
+                self.cerco = json.load(f)["cerco"]
+        estado, registros = self.diario.recuperar()
+        self.restaurar(estado, registros)
+        with self.lock:
+            self.secuencia_aplicada = self.diario.ultima
+        self.diario.iniciar()
+        print(f"Servidor Réplica - Estado recuperado hasta la secuencia {self.secuencia_aplicada} "
+              f"({len(registros)} registros del WAL reproducidos).")
+        if self.cerco is not None:
+            print(f"Servidor Réplica - {len(self.propias)} escrituras propias sin devolver al Central "
+                  f"(cerco en la secuencia {self.cerco})")
+
+    def asignar_aulas(self, salones_solicitados, laboratorios_solicitados, facultad, programa, semestre="",
+                      franja=None, capacidad_minima=0, edificio=None, campus="",
+                      id_solicitud=None):
+        asignacion = {
+            "facultad": facultad,
+            "programa": programa,
+            "salones_asignados": 0,
+            "laboratorios_asignados": 0,
+            "estado": "rechazado"
+        }
+        pool = self.pools.obtener(semestre, campus)
+        if pool is None:
+            return self._numerar(asignacion, semestre, franja, id_solicitud)
+        with pool.lock:
+            elegidas = pool.inventario.asignar(
+                {SALON: salones_solicitados, LABORATORIO: laboratorios_solicitados},
+                capacidad_minima, edificio, franja
+            )
+            if elegidas is not None:
                 asignacion = {
                     "facultad": facultad,
                     "programa": programa,
                     "salones_asignados": salones_solicitados,
                     "laboratorios_asignados": laboratorios_solicitados,
+                    "salones_ids": elegidas[SALON],
+                    "laboratorios_ids": elegidas[LABORATORIO],
                     "estado": "asignado"
                 }
-            else:
-                asignacion = {
-                    "facultad": facultad,
-                    "programa": programa,
-                    "salones_asignados": 0,
-                    "laboratorios_asignados": 0,
-                    "estado": "rechazado"
-                }
+            return self._numerar(asignacion, semestre, franja, id_solicitud, pool)
+
+    def _numerar(self, asignacion, semestre, franja, id_solicitud=None, pool=None):
+        # Atendida directamente (tras un failover): continúa la numeración del Central
+        # y queda pendiente de devolverle hasta que la confirme
+        if id_solicitud is not None:
+            asignacion["id_solicitud"] = id_solicitud
+        with self.lock:
+            if self.cerco is None:
+                # Primera escritura propia: desde aquí no se aplica la replicación
+                self.cerco = self.secuencia_aplicada
+                self._guardar_cerco()
+            self.secuencia_aplicada += 1
+            registro = dict(asignacion, secuencia=self.secuencia_aplicada, semestre=semestre)
+            if franja is not None:
+                registro["franja"] = franja
+            if self.diario is not None:
+                self.diario.registrar(registro)
+            self.propias.append(registro)
+            if id_solicitud is not None:
+                self.idempotencia.completar(id_solicitud, dict(asignacion), self.secuencia_aplicada)
+            if pool is not None:
+                # Bajo el lock global: una instantánea ve la asignación indexada
+                # en cuanto ve su secuencia
+                pool.anotar(registro)
+            asignacion["secuencia"] = self.secuencia_aplicada
         return asignacion
 
+    def aplicar_replicacion(self, registro):
+        """
+        Aplica una asignación ya decidida por el Central (con sus aulas
+        concretas). Devuelve False si la secuencia no es la siguiente esperada
+        (duplicada o con huecos).
+
+        La secuencia avanza sin soltar el lock del pool, como al asignar: una
+        instantánea nunca ve el registro aplicado sin su secuencia.
+        """
+        if registro["secuencia"] != self.secuencia_aplicada + 1:
+            return False
+
+        def numerar():
+            with self.lock:
+                self.secuencia_aplicada = registro["secuencia"]
+                if self.diario is not None:
+                    self.diario.registrar(registro)
+                # La caché se replica con los registros: tras un failover la Réplica
+                # reconoce los reenvíos de solicitudes que ya atendió el Central
+                self.recordar(registro)
+        self.pools.aplicar_registro(registro, numerar)
+        return True
+
 class Metricas:
+    """
+    Métricas de latencia con memoria fija: histogramas logarítmicos global, por
+    facultad, por estado y por pool (semestre/campus), más una ventana
+    deslizante del último minuto. El lock cubre la inserción O(1) y la copia
+    de los conteos; combinar la ventana y calcular los percentiles se hace
+    fuera de él sobre las copias.
+    """
     def __init__(self):
-        self.tiempos_totales = []
-        self.atendidos       = 0
-        self.no_atendidos    = 0
-        self.lock            = threading.Lock()
+        self.total         = Histograma()
+        self.por_facultad  = {}
+        self.por_estado    = {}
+        self.por_pool      = {}      # pool -> [histograma, atendidos, no_atendidos]
+        self.ventana       = VentanaDeslizante(num_ranuras=60, duracion_ranura=1.0)
+        self.atendidos     = 0
+        self.no_atendidos  = 0
+        self.lock          = threading.Lock()
 
-    def registrar_respuesta(self, inicio, fin, asignacion):
+    def registrar_respuesta(self, inicio, fin, asignacion, pool=""):
         tiempo_total = fin - inicio
+        facultad = asignacion.get("facultad", "")
+        estado   = asignacion["estado"]
         with self.lock:
-            self.tiempos_totales.append(tiempo_total)
-            if asignacion["estado"] == "asignado":
+            self.total.registrar(tiempo_total)
+            if facultad not in self.por_facultad:
+                self.por_facultad[facultad] = Histograma()
+            self.por_facultad[facultad].registrar(tiempo_total)
+            if estado not in self.por_estado:
+                self.por_estado[estado] = Histograma()
+            self.por_estado[estado].registrar(tiempo_total)
+            if pool not in self.por_pool:
+                self.por_pool[pool] = [Histograma(), 0, 0]
+            datos_pool = self.por_pool[pool]
+            datos_pool[0].registrar(tiempo_total)
+            self.ventana.registrar(tiempo_total, fin)
+            if estado == "asignado":
                 self.atendidos += 1
+                datos_pool[1] += 1
             else:
                 self.no_atendidos += 1
+                datos_pool[2] += 1
 
     def obtener_metricas(self):
+        # Copiar bajo el lock (tamaño fijo) y calcular percentiles fuera de él
+        ahora = time.time()
         with self.lock:
-            tiempos = self.tiempos_totales
-            if tiempos:
-                promedio = sum(tiempos) / len(tiempos)
-                minimo   = min(tiempos)
-                maximo   = max(tiempos)
-            else:
-                promedio = minimo = maximo = 0
-            return {
-                "promedio_respuesta": promedio,
-                "min_respuesta": minimo,
-                "max_respuesta": maximo,
-                "atendidos": self.atendidos,
-                "no_atendidos": self.no_atendidos
+            total        = self.total.copiar()
+            por_facultad = {k: h.copiar() for k, h in self.por_facultad.items()}
+            por_estado   = {k: h.copiar() for k, h in self.por_estado.items()}
+            por_pool     = {k: (h.copiar(), a, n) for k, (h, a, n) in self.por_pool.items()}
+            ventana      = self.ventana.copiar()
+            atendidos    = self.atendidos
+            no_atendidos = self.no_atendidos
+        # Combinar las ranuras (60 histogramas) ya sin el lock
+        ultimo_minuto = ventana.combinado(ahora=ahora)
+        ultimos_10s   = ventana.combinado(10, ahora=ahora)
+        resumen = total.resumen()
+        return {
+            "promedio_respuesta": resumen["promedio"],
+            "min_respuesta": resumen["min"],
+            "max_respuesta": resumen["max"],
+            "atendidos": atendidos,
+            "no_atendidos": no_atendidos,
+            "latencia": resumen,
+            "por_facultad": {k: h.resumen() for k, h in por_facultad.items()},
+            "por_estado": {k: h.resumen() for k, h in por_estado.items()},
+            "por_pool": {
+                k: {"atendidos": a, "no_atendidos": n, "latencia": h.resumen()}
+                for k, (h, a, n) in por_pool.items()
+            },
+            "ventanas": {
+                "ultimos_10s": ultimos_10s.resumen(),
+                "ultimo_minuto": ultimo_minuto.resumen()
             }
+        }
 
 # --- FUNCIÓN QUE ATIENDE LA REPLICACIÓN EN UN HILO ---
 
+def aplicar_lote(payloads, recursos, metricas):
+    """
+    Aplica en orden los registros de un lote replicado. Cada frame puede traer
+    uno o varios registros (JSON o binario). Los registros con secuencia ya
+    aplicada se ignoran; si aparece un hueco se detiene y devuelve True para
+    pedir al Central la resincronización.
+    """
+    registros = []
+    inicio = time.time()
+    for payload in payloads:
+        registros.extend(protocolo.decodificar_lote(payload)[0])
+    recursos.ultimo_lote = time.time()
+    for registro in registros:
+        trazas.registrar(registro.get(trazas.CAMPO_TRAZA), "respaldo.decodificar", inicio, recursos.ultimo_lote)
+    if registros:
+        recursos.secuencia_vista = max(recursos.secuencia_vista, max(r["secuencia"] for r in registros))
+    for registro in registros:
+        if registro["secuencia"] <= recursos.secuencia_aplicada:
+            continue
+        tiempo_inicio = time.time()
+        if not recursos.aplicar_replicacion(registro):
+            return True
+        tiempo_fin = time.time()
+        traza = registro.get(trazas.CAMPO_TRAZA)
+        trazas.registrar(traza, "respaldo.aplicar", tiempo_inicio, tiempo_fin)
+        pool = clave_pool(registro.get("semestre", ""), recursos.pools.campus_de_registro(registro))
+        metricas.registrar_respuesta(tiempo_inicio, tiempo_fin, registro, pool)
+        with trazas.tramo("respaldo.print", traza):
+            print(f"Servidor Réplica - Aplicó replicación #{registro['secuencia']}: {registro}")
+    return False
+
+def obtener_estadisticas(recursos, metricas):
+    """
+    Métricas de la Réplica junto con el estado de los pools y de la caché de idempotencia.
+    """
+    estadisticas = metricas.obtener_metricas()
+    estadisticas["pools"] = recursos.pools.resumen()
+    estadisticas["idempotencia"] = recursos.idempotencia.estado()
+    return estadisticas
+
 def manejar_solicitud(socket_router, recursos, metricas):
     """
-    Bucle único en un solo hilo para procesar las solicitudes replicadas desde Central.
-    Cada mensaje contiene [identity, ..., payload], donde payload es el JSON original.
+    Bucle único en un solo hilo para procesar los mensajes que llegan a la Réplica:
+      - [identity, b"lote", frame, ...]: lote replicado desde el Central; se
+        aplica en orden y se responde [identity, b"ack", <secuencia aplicada>, <versión>].
+        Si falta algún registro anterior se responde [identity, b"resincronizar", <secuencia aplicada>].
+      - [identity, b"sondeo", <secuencia del Central>]: sin tráfico; si a la
+        Réplica le faltan registros, pide la resincronización. Si el Central va
+        detrás, solo se avisa: resincronizar borraría registros confirmados.
+      - Con escrituras propias (failover) la Réplica no aplica lotes ni pide
+        resincronizar: a los lotes y sondeos responde [identity, b"devolver",
+        lote] hasta que el Central contesta [identity, b"reincorporados",
+        <secuencia>], y luego pide la instantánea completa.
+      - [identity, b"instantanea", <secuencia>, <índice>, <total>, datos]: parte
+        de la instantánea de una resincronización; se responde
+        [identity, b"ack_instantanea", <secuencia>, <índice>] (no se confirma
+        mientras queden escrituras propias sin devolver).
+      - [identity, ..., b"ping"]: health-check; se responde "pong <secuencia>".
+      - [identity, ..., b"metricas"]: se responde el JSON de obtener_estadisticas().
+      - [identity, ..., b"consulta", JSON]: consulta de solo lectura (consultas.py)
+        sobre el estado replicado, etiquetada con la secuencia aplicada.
+      - [identity, ..., payload]: solicitud JSON o binaria directa (p. ej. de una Facultad tras un failover).
     """
     while True:
+        trazas.PERFILADOR.revisar()
         # 1) Recibir multipart
         frames   = socket_router.recv_multipart()
         identity = frames[0]
+
+        # Con escrituras propias, la replicación espera a que el Central las incorpore
+        if len(frames) > 1 and frames[1] in (b"lote", b"sondeo") and recursos.cerco is not None:
+            mensaje = recursos.reconciliar()
+            if mensaje is not None:
+                socket_router.send_multipart([identity] + mensaje)
+            continue
+        if len(frames) > 2 and frames[1] == b"reincorporados":
+            recursos.confirmar_devolucion(int(frames[2]))
+            continue
+
+        # 2) Lote replicado desde el Central
+        if len(frames) > 1 and frames[1] == b"lote":
+            try:
+                hueco = aplicar_lote(frames[2:], recursos, metricas)
+            except (protocolo.ErrorProtocolo, KeyError):
+                # Si llegara algo corrupto, el ACK hará que el Central reenvíe
+                hueco = False
+            if hueco:
+                if recursos.pedir_resincronizacion():
+                    aplicada = str(recursos.secuencia_aplicada).encode("utf-8")
+                    socket_router.send_multipart([identity, b"resincronizar", aplicada])
+                continue
+            if recursos.secuencia_aplicada >= recursos.secuencia_vista:
+                # Al día con el Central (p. ej. tras recibir el delta del historial)
+                recursos.resincronizacion = None
+            # Confirmar solo lo que ya está en disco
+            if recursos.diario is not None:
+                recursos.diario.esperar(recursos.secuencia_aplicada)
+            aplicada = str(recursos.secuencia_aplicada).encode("utf-8")
+            # El tercer frame anuncia la versión binaria que entiende la Réplica
+            version = str(protocolo.VERSION_BINARIA).encode("utf-8")
+            socket_router.send_multipart([identity, b"ack", aplicada, version])
+            continue
+
+        # Sondeo del Central sin tráfico: anuncia su secuencia
+        if len(frames) > 2 and frames[1] == b"sondeo":
+            secuencia_central = int(frames[2])
+            recursos.secuencia_vista = max(recursos.secuencia_vista, secuencia_central)
+            if secuencia_central < recursos.secuencia_aplicada:
+                recursos.adelantada(secuencia_central)
+            elif secuencia_central > recursos.secuencia_aplicada and recursos.pedir_resincronizacion():
+                aplicada = str(recursos.secuencia_aplicada).encode("utf-8")
+                socket_router.send_multipart([identity, b"resincronizar", aplicada])
+            continue
+
+        # Parte de la instantánea de una resincronización
+        if len(frames) > 5 and frames[1] == b"instantanea":
+            secuencia, indice, total = int(frames[2]), int(frames[3]), int(frames[4])
+            try:
+                aceptada = recursos.recibir_parte(secuencia, indice, total, frames[5])
+            except (zlib.error, ValueError) as error:
+                # Instantánea ilegible: se descarta y se vuelve a pedir con el próximo hueco
+                print(f"⚠️  Servidor Réplica - Instantánea {secuencia} inválida: {error}")
+                recursos.recepcion = None
+                continue
+            if not aceptada:
+                # Sin ACK el Central la abandona; se vuelve a pedir tras devolver las escrituras
+                continue
+            socket_router.send_multipart([identity, b"ack_instantanea", frames[2], frames[3]])
+            continue
+
         payload  = frames[-1]
-        texto    = payload.decode("utf-8")
+        if payload == b"ping":
+            # Responder con la secuencia aplicada para medir el atraso en un failover
+            pong = f"pong {recursos.secuencia_aplicada}".encode("utf-8")
+            socket_router.send_multipart(frames[:-1] + [pong])
+            continue
+        if payload == b"metricas":
+            # Consulta de métricas sin detener la Réplica
+            estadisticas = obtener_estadisticas(recursos, metricas)
+            socket_router.send_multipart(frames[:-1] + [json.dumps(estadisticas).encode("utf-8")])
+            continue
+        if es_consulta(frames):
+            # Lecturas desde el estado replicado: el Central no las ve pasar
+            socket_router.send_multipart(atender_consulta(
+                frames, recursos.pools, recursos.etiqueta(),
+                lambda: obtener_estadisticas(recursos, metricas)
+            ))
+            continue
 
-        # 2) Parsear JSON
+        # 3) Decodificar (JSON o binario)
         try:
-            solicitud = json.loads(texto)
-        except json.JSONDecodeError:
-            # Si llegara algo corrupto, lo ignoramos
+            solicitud, codec = protocolo.decodificar(payload)
+        except protocolo.ErrorProtocolo as e:
+            # Se responde en JSON para que el cliente deje el binario y reenvíe
+            socket_router.send_multipart(frames[:-1] + [protocolo.respuesta_ilegible(e)])
             continue
+        codec = protocolo.codec_respuesta(codec, solicitud)
 
-        # 3) Procesar localmente en la Réplica
+        # 4) Procesar localmente en la Réplica. Un reenvío de algo que ya atendió
+        #    el Central (replicado) o la propia Réplica recibe la respuesta original
         tiempo_inicio = time.time()
-        asignacion = recursos.asignar_aulas(
-            solicitud["salones"],
-            solicitud["laboratorios"],
-            solicitud["facultad"],
-            solicitud["programa"]
-        )
+        traza = solicitud.get(trazas.CAMPO_TRAZA)
+        motivo = validar_solicitud(solicitud)
+        if motivo is not None:
+            print(f"⚠️  Servidor Réplica - Solicitud inválida rechazada ({motivo}): {solicitud}")
+            socket_router.send_multipart([identity, protocolo.codificar(respuesta_invalida(solicitud, motivo),
+                                                                        protocolo.ASIGNACION, codec)])
+            continue
+        id_solicitud = solicitud.get("id_solicitud")
+        previa = recursos.idempotencia.reservar(id_solicitud) if id_solicitud is not None else None
+        if previa == EN_CURSO:
+            print(f"Servidor Réplica - Pide reintentar {id_solicitud}: el original sigue en curso")
+            socket_router.send_multipart([identity, protocolo.codificar(respuesta_en_curso(solicitud),
+                                                                        protocolo.ASIGNACION, codec)])
+            continue
+        if previa is not None:
+            asignacion, secuencia = dict(previa[0]), previa[1]
+            print(f"Servidor Réplica - Reconoció el reenvío de {id_solicitud} (secuencia {secuencia})")
+        else:
+            try:
+                asignacion = recursos.asignar_aulas(
+                    solicitud["salones"],
+                    solicitud["laboratorios"],
+                    solicitud["facultad"],
+                    solicitud["programa"],
+                    solicitud.get("semestre", ""),
+                    solicitud.get("franja"),
+                    solicitud.get("capacidad_minima", 0),
+                    solicitud.get("edificio"),
+                    solicitud.get("campus", ""),
+                    id_solicitud
+                )
+            except KeyError:
+                if id_solicitud is not None:
+                    recursos.idempotencia.cancelar(id_solicitud)
+                continue
+            secuencia = asignacion.pop("secuencia")
+            trazas.registrar(traza, "respaldo.asignacion", tiempo_inicio, time.time())
+        # No responder hasta que la asignación esté en disco
+        if recursos.diario is not None:
+            with trazas.tramo("respaldo.wal", traza):
+                recursos.diario.esperar(secuencia)
         tiempo_fin = time.time()
-        metricas.registrar_respuesta(tiempo_inicio, tiempo_fin, asignacion)
+        if previa is None:
+            metricas.registrar_respuesta(tiempo_inicio, tiempo_fin, asignacion,
+                                         clave_pool(solicitud.get("semestre", ""), solicitud.get("campus", "")))
 
-        # 4) Enviar un ACK (“pong”) de vuelta al Central
-        socket_router.send_multipart([identity, b"pong"])
+        # 5) Responder con la asignación, igual que el Central, para que la
+        #    Facultad pueda emparejarla con su lote tras un failover
+        with trazas.tramo("respaldo.envio", traza):
+            socket_router.send_multipart([identity, protocolo.codificar(asignacion, protocolo.ASIGNACION, codec)])
 
-        # 5) Log en consola para que veas la misma info que en Central
-        print(f"Servidor Réplica - Recibió replicación: {solicitud}")
-        print(f"Servidor Réplica - Procesó asignación: {asignacion}")
+        # 6) Log en consola para que veas la misma info que en Central
+        with trazas.tramo("respaldo.print", traza):
+            print(f"Servidor Réplica - Recibió replicación: {solicitud}")
+            print(f"Servidor Réplica - Procesó asignación: {asignacion}")
 
-def servidor_respaldo(puerto):
+def servidor_respaldo(puerto, directorio_estado=DIRECTORIO_ESTADO, endpoint_pub_latidos=None,
+                      archivo_inventario=ARCHIVO_INVENTARIO, propias=None):
     """
-    1) Crea un único zmq.Context()
-    2) ROUTER bind en tcp://*:<puerto>
-    3) Lanza UN solo hilo que ejecuta manejar_solicitud(...)
+    1) Usa el zmq.Context() compartido del proceso
+    2) ROUTER bind en tcp://*:<puerto> (o en el endpoint indicado si `puerto` es texto)
+    3) Recupera el estado desde `directorio_estado` (WAL + instantánea), si se indica
+    4) Publica latidos en `endpoint_pub_latidos` (por defecto puerto + DESFASE_LATIDOS)
+    5) Lanza UN solo hilo que ejecuta manejar_solicitud(...)
+
+    El inventario de `archivo_inventario` debe ser el mismo que usa el Central,
+    porque la replicación transmite ids concretos de aulas. La Réplica de un
+    fragmento recibe en `propias` las aulas que el reparto da a su Central.
     """
-    context      = zmq.Context()
+    context      = zmq.Context.instance()
     socket_router = context.socket(zmq.ROUTER)
-    socket_router.bind(f"tcp://*:{puerto}")
+    socket_router.bind(puerto if isinstance(puerto, str) else f"tcp://*:{puerto}")
 
-    recursos = Recursos()
+    if propias is None:
+        pools = cargar_pools(archivo_inventario)
+    else:
+        pools = PoolsAulas(cargar_aulas(archivo_inventario), propias=propias)
+    recursos = Recursos(pools)
+    if directorio_estado is not None:
+        recursos.habilitar_persistencia(directorio_estado)
     metricas = Metricas()
 
+    endpoint_pub_latidos = endpoint_pub_latidos or endpoint_latidos(puerto)
+    if endpoint_pub_latidos is not None:
+        Latidor(context, endpoint_pub_latidos, "respaldo", lambda: recursos.secuencia_aplicada).iniciar()
+
     # UN solo hilo para evitar compartir sockets
     hilo = threading.Thread(
         target=manejar_solicitud,
@@ -133,8 +669,26 @@ def servidor_respaldo(puerto):
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) != 2:
-        print("Uso: python3 servidor_respaldo.py <puerto>")
+    if len(sys.argv) in (4, 5) and sys.argv[1] == "--fragmento":
+        # Réplica de un fragmento: python3 servidor_respaldo.py --fragmento <nombre> <mapa.json> [archivo_aulas]
+        nombre = sys.argv[2]
+        mapa = MapaFragmentos.leer(sys.argv[3])
+        if mapa.replica(nombre) is None:
+            print(f"El fragmento {nombre} no tiene réplica en {sys.argv[3]}")
+            sys.exit(1)
+        archivo_inventario = sys.argv[4] if len(sys.argv) == 5 else ARCHIVO_INVENTARIO
+        trazas.configurar(f"respaldo_{nombre}")
+        trazas.instalar_senal()
+        servidor_respaldo(puerto_de(mapa.replica(nombre)), f"{DIRECTORIO_ESTADO}_{nombre}",
+                          archivo_inventario=archivo_inventario,
+                          propias=mapa.aulas_de(nombre, cargar_aulas(archivo_inventario)))
+    if len(sys.argv) not in (2, 3):
+        print("Uso: python3 servidor_respaldo.py <puerto> [archivo_aulas]\n"
+              "     python3 servidor_respaldo.py --fragmento <nombre> <mapa.json> [archivo_aulas]")
         sys.exit(1)
     puerto = int(sys.argv[1])
-    servidor_respaldo(puerto)
+    archivo_inventario = sys.argv[2] if len(sys.argv) == 3 else ARCHIVO_INVENTARIO
+    # Tramos en trazas_respaldo.tsv; `kill -USR2 <pid>` alterna el perfilado
+    trazas.configurar("respaldo")
+    trazas.instalar_senal()
+    servidor_respaldo(puerto, archivo_inventario=archivo_inventario)
@@ -0,0 +1,44 @@
+# test_admision.py
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from admision import Admision, ordenar, CRITERIO_MAX, CRITERIO_EQUITATIVO, CRITERIO_FCFS
+
+def test_max_solicitudes_ordena_por_cuota_dominante():
+    demandas = [[10, 0], [1, 0], [0, 2], [5, 5]]
+    # La última pide más laboratorios de los que hay: no cabe ni sola
+    assert list(ordenar(demandas, [10, 4], CRITERIO_MAX)) == [1, 2, 0]
+
+def test_max_solicitudes_mide_cada_solicitud_contra_su_propia_capacidad():
+    demandas = [[2, 0], [2, 0], [2, 0]]
+    capacidades = [[4, 0], [20, 0], [1, 0]]
+    assert list(ordenar(demandas, capacidades, CRITERIO_MAX)) == [1, 0]
+
+def test_empates_conservan_el_orden_de_llegada():
+    assert list(ordenar([[1, 1], [1, 1], [1, 1]], [10, 10], CRITERIO_MAX)) == [0, 1, 2]
+
+def test_equitativo_intercala_las_facultades_por_turnos():
+    demandas = [[1, 0], [2, 0], [3, 0], [4, 0], [5, 0]]
+    grupos = ["A", "A", "A", "B", "B"]
+    # Turno 0: la más pequeña de cada facultad; turno 1: la segunda; ...
+    assert list(ordenar(demandas, [100, 100], CRITERIO_EQUITATIVO, grupos)) == [0, 3, 1, 4, 2]
+
+def test_equitativo_descarta_las_que_no_caben():
+    demandas = [[1, 0], [50, 0], [2, 0]]
+    assert list(ordenar(demandas, [10, 10], CRITERIO_EQUITATIVO, ["A", "B", "B"])) == [0, 2]
+
+def test_admision_compara_con_fcfs():
+    admision = Admision(CRITERIO_MAX)
+    admision.registrar(10, 8, 5)
+    admision.registrar(10, 6, 5)
+    estado = admision.estado()
+    assert (estado["ventanas"], estado["aceptadas"], estado["aceptadas_fcfs"]) == (2, 14, 10)
+    assert estado["tasa_aceptacion"] == pytest.approx(0.7)
+    assert estado["tasa_aceptacion_fcfs"] == pytest.approx(0.5)
+
+def test_admision_rechaza_fcfs_y_criterios_desconocidos():
+    for criterio in (CRITERIO_FCFS, "azar"):
+        with pytest.raises(ValueError):
+            Admision(criterio)
@@ -0,0 +1,90 @@
+# test_almacen.py
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import almacen
+from almacen import AlmacenAsignaciones, LectorAlmacen, CABECERA, CLAVES
+
+def poblar(directorio, cantidad):
+    escritor = AlmacenAsignaciones(str(directorio), vaciar_cada=3)
+    for i in range(cantidad):
+        facultad = f"Facultad {i % 3}"
+        escritor.agregar("solicitud", "pendiente", facultad, "2025-10", f"Programa {i % 5}", 2, 1)
+        escritor.agregar("asignacion", "asignado" if i % 2 else "rechazado", facultad, "2025-10",
+                         f"Programa {i % 5}", 2, 1, 2 if i % 2 else 0, 1 if i % 2 else 0,
+                         [f"S{i:03d}", f"S{i + 1:03d}"] if i % 2 else (), [f"L{i:02d}"] if i % 2 else ())
+    return escritor
+
+def test_ida_y_vuelta(tmp_path):
+    poblar(tmp_path, 10).cerrar()
+    lector = LectorAlmacen(str(tmp_path))
+    assert len(lector.registros()) == 20
+
+    asignaciones = lector.registros(facultad="Facultad 1", tipo="asignacion")
+    assert [lector.cadenas[r] for r in asignaciones["programa"]] == ["Programa 1", "Programa 4", "Programa 2"]
+    assert lector.ids(asignaciones) == [(["S001", "S002"], ["L01"]), ([], []), (["S007", "S008"], ["L07"])]
+    assert len(lector.registros(facultad="Facultad 9")) == 0
+
+    resumen = {fila["facultad"]: fila for fila in lector.resumen(lector.registros())}
+    assert resumen["Facultad 1"]["solicitudes"] == 3
+    assert (resumen["Facultad 1"]["asignadas"], resumen["Facultad 1"]["rechazadas"]) == (2, 1)
+    assert resumen["Facultad 1"]["salones_asignados"] == 4
+
+def test_segmentos_llenos_usan_el_indice_ordenado(tmp_path, monkeypatch):
+    monkeypatch.setattr(almacen, "REGISTROS_POR_SEGMENTO", 8)
+    poblar(tmp_path, 15).cerrar()
+    lector = LectorAlmacen(str(tmp_path))
+    assert almacen._segmentos(str(tmp_path)) == [1, 2, 3, 4]
+
+    # El .ord del escritor (sin NumPy) coincide con un argsort estable
+    registros, _ = lector._segmento(1)
+    orden = lector._orden(1, len(registros))
+    for campo in CLAVES:
+        esperado = np.argsort(registros[campo], kind="stable")
+        assert list(orden[campo]["posicion"]) == list(esperado)
+        assert list(orden[campo]["valor"]) == list(registros[campo][esperado])
+
+    filtrados = lector.registros(facultad="Facultad 2", programa="Programa 2")
+    assert len(filtrados) == 2
+    assert lector.ids(filtrados) == [([], []), ([], [])]
+    assert len(lector.registros(semestre="2025-10")) == 30
+
+def test_registro_a_medio_escribir_se_ignora_y_se_descarta(tmp_path):
+    poblar(tmp_path, 2).cerrar()
+    ruta = almacen._ruta_segmento(str(tmp_path), 1, "dat")
+    with open(ruta, "ab") as f:
+        f.write(b"\x01" * 20)
+    with open(os.path.join(tmp_path, "cadenas.txt"), "ab") as f:
+        f.write(b'"Facultad a medi')
+    assert len(LectorAlmacen(str(tmp_path)).registros()) == 4
+
+    escritor = AlmacenAsignaciones(str(tmp_path))
+    assert escritor.cantidad == 4
+    escritor.agregar("solicitud", "pendiente", "Facultad nueva", "2025-10", "Programa 0", 1, 0)
+    escritor.cerrar()
+    assert os.path.getsize(ruta) == CABECERA.size + 5 * almacen._REGISTRO.size
+    lector = LectorAlmacen(str(tmp_path))
+    assert len(lector.registros()) == 5
+    assert len(lector.registros(facultad="Facultad nueva")) == 1
+
+def test_el_escritor_no_necesita_numpy(tmp_path):
+    codigo = ("import sys; sys.modules['numpy'] = None\n"
+              "import almacen\n"
+              "a = almacen.AlmacenAsignaciones(sys.argv[1])\n"
+              "a.agregar('solicitud', 'pendiente', 'F', '2025-10', 'P', 1, 1)\n"
+              "a.cerrar()\n")
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", codigo, str(tmp_path)], cwd=raiz, check=True)
+    assert len(LectorAlmacen(str(tmp_path)).registros()) == 1
+
+def test_un_solo_escritor_por_directorio(tmp_path):
+    escritor = AlmacenAsignaciones(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        AlmacenAsignaciones(str(tmp_path))
+    escritor.cerrar()
@@ -0,0 +1,46 @@
+# test_escritor.py
+
+import threading
+
+import pytest
+
+from escritor import EscritorArchivos
+
+def leer(ruta):
+    with open(ruta) as f:
+        return f.read().splitlines()
+
+def test_vaciar_y_cerrar(tmp_path):
+    escritor = EscritorArchivos(max_lineas=1000, max_espera=60)
+    ruta_a, ruta_b = str(tmp_path / "a.txt"), str(tmp_path / "b.txt")
+    escritor.escribir(ruta_a, "uno\n")
+    escritor.escribir_varias(ruta_b, ["x\n", "y\n"])
+    escritor.vaciar()
+    assert leer(ruta_a) == ["uno"] and leer(ruta_b) == ["x", "y"]
+
+    escritor.escribir(ruta_a, "dos\n")
+    escritor.cerrar()
+    assert leer(ruta_a) == ["uno", "dos"]
+    with pytest.raises(ValueError):
+        escritor.escribir(ruta_a, "tres\n")
+
+def test_los_lotes_llegan_al_disco_en_orden(tmp_path):
+    # El hilo de fondo (cada 8 líneas) y varios vaciar() compiten por los lotes
+    escritor = EscritorArchivos(max_lineas=8, max_espera=0.001)
+    ruta = str(tmp_path / "orden.txt")
+    total = 20000
+    listo = threading.Event()
+
+    def vaciar_sin_parar():
+        while not listo.is_set():
+            escritor.vaciar()
+    hilos = [threading.Thread(target=vaciar_sin_parar) for _ in range(3)]
+    for hilo in hilos:
+        hilo.start()
+    for i in range(total):
+        escritor.escribir(ruta, f"{i}\n")
+    listo.set()
+    for hilo in hilos:
+        hilo.join()
+    escritor.cerrar()
+    assert leer(ruta) == [str(i) for i in range(total)]
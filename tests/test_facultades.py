@@ -0,0 +1,58 @@
+# test_facultades.py
+
+import json
+import time
+
+import zmq
+
+import protocolo
+from facultades import Facultad
+
+class EscritorEnMemoria:
+    def __init__(self):
+        self.archivos = {}
+
+    def escribir(self, ruta, linea):
+        self.archivos.setdefault(ruta, []).append(linea)
+
+    def escribir_varias(self, ruta, lineas):
+        self.archivos.setdefault(ruta, []).extend(lineas)
+
+def programa(nombre, semestre, id_solicitud):
+    return {"programa": nombre, "semestre": semestre, "salones": 1, "laboratorios": 0, "id_solicitud": id_solicitud}
+
+def test_cada_lote_se_registra_en_los_archivos_de_su_semestre():
+    context = zmq.Context.instance()
+    servidor = context.socket(zmq.ROUTER)
+    servidor.bind("inproc://facultad-semestres")
+    facultad = Facultad(context, "F", "2025-10", "inproc://facultad-semestres")
+    facultad.escritor = EscritorEnMemoria()
+
+    ahora = time.time()
+    facultad.agregar(programa("P1", "2025-10", "a"), ahora, None)
+    facultad.agregar(programa("P2", "2026-10", "b"), ahora, None)
+    facultad.agregar(programa("P3", "2026-10", "c"), ahora, None)
+    # Un programa de otro semestre corta el lote: cada pool se pide por separado
+    while facultad.lote_listo(time.time() + 1):
+        facultad.enviar_lote()
+
+    for _ in range(2):
+        identidad, payload = servidor.recv_multipart()
+        solicitud, _ = protocolo.decodificar(payload)
+        respuesta = {"id_solicitud": solicitud["id_solicitud"], "facultad": "F", "programa": solicitud["programa"],
+                     "salones_asignados": solicitud["salones"], "laboratorios_asignados": 0,
+                     "salones_ids": [f"S{i}" for i in range(solicitud["salones"])], "estado": "asignado"}
+        servidor.send_multipart([identidad, protocolo.codificar(respuesta, protocolo.ASIGNACION)])
+    while facultad.en_vuelo:
+        facultad.socket_servidor.poll(2000)
+        facultad.recibir_respuestas(None)
+
+    archivos = facultad.escritor.archivos
+    assert sorted(archivos) == ["asignaciones_F_2025-10.txt", "asignaciones_F_2026-10.txt",
+                                "metricas_F_2025-10.txt", "metricas_F_2026-10.txt"]
+    assert len(archivos["metricas_F_2026-10.txt"]) == 2
+    lote = json.loads(archivos["asignaciones_F_2026-10.txt"][0])
+    assert [p["programa"] for p in lote["programas"]] == ["P2", "P3"]
+    assert facultad.duplicado({"id_solicitud": "c"})[1]["salones_ids"] == ["S1"]
+    facultad.socket_servidor.close()
+    servidor.close()
@@ -0,0 +1,117 @@
+# test_fragmentos.py
+
+import pytest
+import zmq
+
+from fragmentos import (AnilloConsistente, MapaFragmentos, Prestamos, crear_mapa, _validar_pedido,
+                        DESFASE_PRESTAMOS, PASO_PUERTOS, PUERTO_FRAGMENTOS)
+from inventario import PoolsAulas, aulas_por_defecto, SALON, LABORATORIO
+from servidor_central import Recursos
+
+NUM_FRANJAS = 4
+CLAVES      = [f"Facultad {i}" for i in range(600)]
+
+def test_anillo_reparte_las_claves_de_forma_estable():
+    anillo = AnilloConsistente(["f1", "f2", "f3"])
+    dueños = [anillo.ubicar(clave) for clave in CLAVES]
+    # El hash no depende del proceso: otro anillo igual ubica igual
+    assert dueños == [AnilloConsistente(["f3", "f1", "f2"]).ubicar(clave) for clave in CLAVES]
+    for nombre in ("f1", "f2", "f3"):
+        assert 0.2 < dueños.count(nombre) / len(CLAVES) < 0.5
+
+def test_agregar_un_fragmento_solo_le_mueve_claves_a_el():
+    antes = AnilloConsistente(["f1", "f2", "f3"])
+    despues = AnilloConsistente(["f1", "f2", "f3", "f4"])
+    movidas = [clave for clave in CLAVES if antes.ubicar(clave) != despues.ubicar(clave)]
+    assert movidas
+    assert all(despues.ubicar(clave) == "f4" for clave in movidas)
+
+def test_recorrido_empieza_en_el_dueño_y_visita_cada_fragmento_una_vez():
+    anillo = AnilloConsistente(["f1", "f2", "f3", "f4"])
+    for clave in CLAVES[:50]:
+        recorrido = anillo.recorrido(clave)
+        assert recorrido[0] == anillo.ubicar(clave)
+        assert sorted(recorrido) == ["f1", "f2", "f3", "f4"]
+
+def test_mapa_pares_endpoints_y_reparto_de_aulas():
+    mapa = crear_mapa(3)
+    assert mapa.endpoint("f2") == f"tcp://127.0.0.1:{PUERTO_FRAGMENTOS + PASO_PUERTOS}"
+    assert mapa.endpoint_prestamos("f2") == f"tcp://127.0.0.1:{PUERTO_FRAGMENTOS + PASO_PUERTOS + DESFASE_PRESTAMOS}"
+    assert sorted(mapa.pares("f1")) == ["f2", "f3"]
+
+    aulas = aulas_por_defecto(30, 6)
+    repartos = [mapa.aulas_de(nombre, aulas) for nombre in ("f1", "f2", "f3")]
+    assert set().union(*repartos) == {aula["id"] for aula in aulas}
+    assert sum(len(propias) for propias in repartos) == len(aulas)
+    assert all(len(propias) == 12 for propias in repartos)
+
+    # Un fragmento agregado fuera del reparto arranca sin aulas
+    datos = dict(mapa.datos(), fragmentos=dict(mapa.fragmentos, f4={"endpoint": "tcp://127.0.0.1:4419"}))
+    assert MapaFragmentos(datos).aulas_de("f4", aulas) == set()
+
+@pytest.mark.parametrize("pedido", [
+    [],
+    {"semestre": "2025-10"},
+    {"cantidades": {"auditorio": 1}},
+    {"cantidades": {SALON: -1}},
+    {"cantidades": {SALON: 1.5}},
+    {"cantidades": {LABORATORIO: "2"}},
+    {"cantidades": {SALON: True}},
+    {"cantidades": {SALON: 1}, "capacidad_minima": -5},
+])
+def test_pedidos_de_prestamo_mal_formados(pedido):
+    with pytest.raises(ValueError):
+        _validar_pedido(pedido)
+
+def fragmentos(nombre_prueba):
+    # Dos fragmentos en el mismo proceso; los préstamos viajan por inproc
+    aulas = aulas_por_defecto(20, 4)
+    mapa = crear_mapa(2)
+    for nombre in mapa.fragmentos:
+        mapa.fragmentos[nombre]["prestamos"] = f"inproc://{nombre_prueba}-{nombre}"
+    context = zmq.Context()
+    recursos = {}
+    for nombre in mapa.fragmentos:
+        recursos[nombre] = Recursos(pools=PoolsAulas(aulas, NUM_FRANJAS, mapa.aulas_de(nombre, aulas)))
+        recursos[nombre].prestamos = Prestamos(context, mapa, nombre, timeout=2.0)
+        recursos[nombre].prestamos.atender(recursos[nombre], mapa.endpoint_prestamos(nombre))
+    return recursos
+
+def test_prestamo_entre_fragmentos():
+    recursos = fragmentos("prestamo")
+    pool_f2 = recursos["f2"].pools.obtener("2025-10")
+    propias_f2 = pool_f2.inventario.disponibles(SALON, 0, None, None)
+
+    # f1 tiene 10 salones propios: los 4 que faltan se piden a f2
+    asignacion = recursos["f1"].asignar_aulas(14, 0, "Facultad", "Programa", "2025-10")
+    assert asignacion["estado"] == "asignado"
+    assert len(set(asignacion["salones_ids"])) == 14
+    assert pool_f2.inventario.disponibles(SALON, 0, None, None) == propias_f2 - 4
+    assert recursos["f1"].prestamos.estado()["aulas_recibidas"] == 4
+    assert recursos["f2"].prestamos.estado()["aulas_cedidas"] == 4
+
+def test_reenviar_un_prestamo_devuelve_las_mismas_aulas():
+    recursos = fragmentos("reenvio")
+    prestamos = recursos["f1"].prestamos
+    pedido = {"id_prestamo": "p-1", "semestre": "2025-10", "campus": "", "cantidades": {LABORATORIO: 2},
+              "capacidad_minima": 0, "edificio": None, "fragmento": "f1"}
+    primera = prestamos._enviar("f2", pedido)
+    assert len(primera[LABORATORIO]) == 2
+    assert prestamos._enviar("f2", pedido) == primera
+    assert prestamos._enviar("f2", dict(pedido, id_prestamo="p-2"))[LABORATORIO] != primera[LABORATORIO]
+    assert "error" in prestamos._enviar("f2", dict(pedido, id_prestamo="p-3", cantidades={SALON: -1}))
+
+def test_una_cesion_que_falla_no_deja_el_id_en_curso(monkeypatch):
+    recursos = Recursos(pools=PoolsAulas(aulas_por_defecto(4, 2), NUM_FRANJAS))
+    pool = recursos.pools.obtener("2025-10")
+
+    def fallar(*args):
+        raise RuntimeError("inventario no disponible")
+    monkeypatch.setattr(pool.inventario, "ceder", fallar)
+    with pytest.raises(RuntimeError):
+        recursos.ceder("2025-10", "", {SALON: 1}, id_prestamo="p-1")
+    monkeypatch.undo()
+
+    assert recursos.idempotencia.reservar("p-1") is None
+    recursos.idempotencia.cancelar("p-1")
+    assert len(recursos.ceder("2025-10", "", {SALON: 1}, id_prestamo="p-1")[SALON]) == 1
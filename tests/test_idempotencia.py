@@ -0,0 +1,44 @@
+# test_idempotencia.py
+
+import threading
+import time
+
+from idempotencia import EN_CURSO, CacheIdempotencia
+
+def test_las_respuestas_vencen_tras_el_ttl():
+    cache = CacheIdempotencia(ttl=10)
+    assert cache.reservar("viejo") is None
+    cache.completar("viejo", {"estado": "asignado"}, 1, time.time() - 11)
+    assert cache.reservar("nuevo") is None
+    cache.completar("nuevo", {"estado": "asignado"}, 2)
+    # La vencida se purga al completar otra y el id vuelve a atenderse
+    assert cache.estado()["ids"] == 1
+    assert cache.reservar("viejo") is None
+    assert cache.reservar("nuevo") == ({"estado": "asignado"}, 2)
+
+def test_se_descarta_el_menos_usado():
+    cache = CacheIdempotencia(capacidad=2)
+    for secuencia, id_solicitud in enumerate(["a", "b"]):
+        cache.reservar(id_solicitud)
+        cache.completar(id_solicitud, {"id_solicitud": id_solicitud}, secuencia)
+    assert cache.reservar("a") == ({"id_solicitud": "a"}, 0)   # "a" pasa a ser el más reciente
+    cache.reservar("c")
+    cache.completar("c", {"id_solicitud": "c"}, 2)
+    assert [fila[0] for fila in cache.capturar()] == ["a", "c"]
+    assert cache.estado() == {"ids": 2, "en_curso": 0, "duplicados": 1}
+
+def test_duplicado_en_curso_espera_cancelar_y_completar():
+    cache = CacheIdempotencia()
+    assert cache.reservar("x") is None
+    assert cache.reservar("x", timeout=0.05) == EN_CURSO
+    cache.cancelar("x")
+    # Tras cancelar, el siguiente intento lo atiende como nuevo
+    assert cache.reservar("x") is None
+
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(cache.reservar("x", timeout=5)))
+    hilo.start()
+    time.sleep(0.05)
+    cache.completar("x", {"estado": "asignado"}, 7)
+    hilo.join()
+    assert resultado == [({"estado": "asignado"}, 7)]
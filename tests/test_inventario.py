@@ -0,0 +1,178 @@
+# test_inventario.py
+
+import threading
+
+import pytest
+
+from inventario import (Inventario, PoolsAulas, CerrojoPools, aplicar_registro, aulas_por_defecto,
+                        validar_solicitud, respuesta_invalida, SALON, LABORATORIO, CEDIDO, RECIBIDO)
+
+NUM_FRANJAS = 4
+
+def aula(id_aula, tipo=SALON, capacidad=30, edificio="A", campus=""):
+    return {"id": id_aula, "tipo": tipo, "capacidad": capacidad, "edificio": edificio, "campus": campus}
+
+AULAS = [
+    aula("S1", capacidad=20), aula("S2", capacidad=30), aula("S3", capacidad=40, edificio="B"),
+    aula("S4", capacidad=60, edificio="B"), aula("L1", LABORATORIO, 25), aula("L2", LABORATORIO, 25, "B"),
+]
+
+def inventario():
+    return Inventario(AULAS, NUM_FRANJAS)
+
+def test_rechaza_aulas_repetidas_o_de_tipo_desconocido():
+    with pytest.raises(ValueError):
+        Inventario(AULAS + [aula("S1")], NUM_FRANJAS)
+    with pytest.raises(ValueError):
+        Inventario([aula("X1", "auditorio")], NUM_FRANJAS)
+
+def test_asigna_las_de_menor_capacidad_que_cumplen():
+    inv = inventario()
+    assert inv.asignar({SALON: 2}, capacidad_minima=30) == {SALON: ["S2", "S3"]}
+    assert inv.asignar({SALON: 1}, edificio="B") == {SALON: ["S4"]}
+    assert inv.disponibles(SALON) == 1
+
+def test_asignacion_atomica_por_tipo():
+    inv = inventario()
+    assert inv.asignar({SALON: 1, LABORATORIO: 3}) is None
+    assert inv.disponibles(SALON) == 4 and inv.disponibles(LABORATORIO) == 2
+
+def test_franjas_independientes_y_semestre_completo():
+    inv = inventario()
+    assert inv.asignar({LABORATORIO: 2}, franja=0) == {LABORATORIO: ["L1", "L2"]}
+    assert inv.disponibles(LABORATORIO, franja=0) == 0
+    assert inv.disponibles(LABORATORIO, franja=1) == 2
+    # Con uso en alguna franja ya no sirven para todo el semestre
+    assert inv.asignar({LABORATORIO: 1}) is None
+    assert inv.asignar({SALON: 1}) == {SALON: ["S1"]}
+    assert all(inv.disponibles(SALON, franja=f) == 3 for f in range(NUM_FRANJAS))
+    assert inv.asignar({SALON: 1}, franja=NUM_FRANJAS) is None
+
+def test_ocupada_franja_a_franja_cuenta_como_semestre():
+    inv = inventario()
+    for franja in range(NUM_FRANJAS):
+        assert inv.reservar_ids(["S1"], franja) == []
+    assert inv.resumen()[SALON]["ocupadas_semestre"] == 1
+
+def test_capturar_y_restaurar_ida_y_vuelta():
+    inv = inventario()
+    inv.asignar({SALON: 1}, franja=2)
+    inv.asignar({SALON: 1, LABORATORIO: 1})
+    inv.ceder_ids(["S4"])
+    estado = inv.capturar()
+
+    restaurado = inventario()
+    restaurado.restaurar(estado)
+    assert restaurado.capturar() == estado
+    assert restaurado.resumen() == inv.resumen()
+    # Ambos deciden igual la siguiente asignación
+    assert restaurado.asignar({SALON: 2}) == inv.asignar({SALON: 2})
+
+def test_restaurar_con_otras_franjas_falla():
+    estado = Inventario(AULAS, NUM_FRANJAS + 1).capturar()
+    with pytest.raises(ValueError):
+        inventario().restaurar(estado)
+
+def test_reproducir_registros_reconstruye_el_estado():
+    original = inventario()
+    registros = []
+    for secuencia, (cantidades, franja) in enumerate([({SALON: 1}, 0), ({SALON: 2, LABORATORIO: 1}, None),
+                                                      ({LABORATORIO: 1}, 3)], 1):
+        elegidas = original.asignar(cantidades, franja=franja)
+        registro = {"secuencia": secuencia, "estado": "asignado", "franja": franja,
+                    "salones_ids": elegidas.get(SALON, []), "laboratorios_ids": elegidas.get(LABORATORIO, [])}
+        registros.append(registro)
+    cedidas = original.ceder({SALON: 1})
+    registros.append({"secuencia": 4, "estado": CEDIDO, "salones_ids": cedidas[SALON]})
+
+    recuperado = inventario()
+    # Reproducir dos veces (WAL que ya estaba en la instantánea) no cambia nada
+    for registro in registros + registros:
+        aplicar_registro(recuperado, registro)
+    assert recuperado.capturar() == original.capturar()
+
+def test_ceder_y_recibir_aulas():
+    inv = inventario()
+    assert inv.ceder({SALON: 2}, capacidad_minima=40) == {SALON: ["S3", "S4"]}
+    assert inv.asignar({SALON: 1}, capacidad_minima=40) is None
+    aplicar_registro(inv, {"secuencia": 1, "estado": RECIBIDO, "salones_ids": ["S4"]})
+    assert inv.asignar({SALON: 1}, capacidad_minima=40) == {SALON: ["S4"]}
+
+def test_ocupadas_ids():
+    inv = inventario()
+    inv.reservar_ids(["S1"], 1)
+    assert inv.ocupadas_ids(["S1", "S2", "X9"], 1) == ["S1"]
+    assert inv.ocupadas_ids(["S1", "S2"], 0) == []
+    assert inv.ocupadas_ids(["S1", "S2"]) == ["S1"]
+
+def test_copiar_no_comparte_estado():
+    inv = inventario()
+    copia = inv.copiar()
+    copia.asignar({SALON: 4})
+    assert inv.disponibles(SALON) == 4 and copia.disponibles(SALON) == 0
+
+def test_pools_independientes_por_semestre_y_campus():
+    pools = PoolsAulas(AULAS + [aula("N1", campus="Norte")], NUM_FRANJAS)
+    primero = pools.obtener("2025-10")
+    primero.inventario.asignar({SALON: 4})
+    assert pools.obtener("2025-20").inventario.disponibles(SALON) == 4
+    assert pools.obtener("2025-10", "Norte").inventario.disponibles(SALON) == 1
+    assert pools.obtener("2025-10", "Sur") is None
+    assert pools.obtener("2025-10") is primero
+
+def test_pools_capturar_y_restaurar():
+    pools = PoolsAulas(aulas_por_defecto(20, 4), NUM_FRANJAS)
+    cerrojo = CerrojoPools(pools, threading.Lock())
+    for secuencia, semestre in enumerate(["2025-10", "2025-20", "2025-10"], 1):
+        pool = pools.obtener(semestre)
+        elegidas = pool.inventario.asignar({SALON: 2}, franja=secuencia % NUM_FRANJAS)
+        pool.anotar({"secuencia": secuencia, "estado": "asignado", "facultad": "F", "programa": "P",
+                     "salones_ids": elegidas[SALON], "franja": secuencia % NUM_FRANJAS})
+    with cerrojo:
+        estado = pools.capturar()
+
+    restaurados = PoolsAulas(aulas_por_defecto(20, 4), NUM_FRANJAS)
+    restaurados.restaurar(estado)
+    with CerrojoPools(restaurados, threading.Lock()):
+        assert restaurados.capturar() == estado
+    assert [a["secuencia"] for a in restaurados.obtener("2025-10").listar("F")] == [1, 3]
+
+def test_anotar_ignora_asignaciones_sin_aulas():
+    pool = PoolsAulas(AULAS, NUM_FRANJAS).obtener("2025-10")
+    vacia = {"estado": "asignado", "facultad": "F", "programa": "P", "salones_asignados": 0,
+             "laboratorios_asignados": 0, "salones_ids": [], "laboratorios_ids": []}
+    for secuencia in range(1, 100):
+        pool.anotar(dict(vacia, secuencia=secuencia))
+    pool.anotar(dict(vacia, secuencia=100, salones_asignados=1, salones_ids=["S1"]))
+    pool.anotar(dict(vacia, secuencia=101, estado="rechazado"))
+    assert [a["secuencia"] for a in pool.listar("F")] == [100]
+
+SOLICITUD = {"id_solicitud": "x1", "facultad": "F", "programa": "P", "semestre": "2025-10",
+             "salones": 2, "laboratorios": 0}
+
+def test_validar_solicitud_acepta_la_normal():
+    assert validar_solicitud(SOLICITUD) is None
+    assert validar_solicitud(dict(SOLICITUD, franja=3, capacidad_minima=40, edificio="B", campus="Norte")) is None
+
+@pytest.mark.parametrize("cambios", [
+    {"salones": "2"}, {"laboratorios": 1.5}, {"salones": -1}, {"laboratorios": True},
+    {"capacidad_minima": "40"}, {"franja": -2}, {"franja": 1.0}, {"facultad": 3}, {"edificio": ["B"]},
+])
+def test_validar_solicitud_rechaza_tipos_y_rangos(cambios):
+    motivo = validar_solicitud(dict(SOLICITUD, **cambios))
+    assert motivo is not None and next(iter(cambios)) in motivo
+
+def test_respuesta_invalida_lleva_el_motivo_y_el_id():
+    solicitud = {campo: valor for campo, valor in SOLICITUD.items() if campo != "programa"}
+    motivo = validar_solicitud(solicitud)
+    assert "programa" in motivo
+    respuesta = respuesta_invalida(solicitud, motivo)
+    assert respuesta["estado"] == "rechazado" and respuesta["error"] == motivo
+    assert respuesta["id_solicitud"] == "x1"
+
+def test_campus_de_registro_sale_de_sus_aulas():
+    pools = PoolsAulas(AULAS + [aula("N1", campus="Norte")], NUM_FRANJAS)
+    assert pools.campus_de_registro({"semestre": "2025-10", "salones_ids": ["N1"]}) == "Norte"
+    assert pools.campus_de_registro({"semestre": "2025-10", "salones_ids": ["S1"]}) == ""
+    assert pools.campus_de_registro({"semestre": "2025-10", "campus": "Norte", "estado": "rechazado"}) == "Norte"
+    assert pools.pool_de_registro({"semestre": "2025-10", "laboratorios_ids": ["N1"]}).campus == "Norte"
@@ -0,0 +1,43 @@
+# test_latidos.py
+
+import zmq
+
+from latidos import MonitorLatidos
+
+def latir(monitor, i, ahora):
+    # Igual que `procesar` al recibir un latido del servidor i
+    if monitor.vivo_desde[i] is None or not monitor._vivo(i, ahora):
+        monitor.vivo_desde[i] = ahora
+    monitor.ultimo[i] = ahora
+
+def test_failover_y_retorno_al_preferido():
+    monitor = MonitorLatidos(zmq.Context.instance(), ["inproc://latidos-central", "inproc://latidos-respaldo"],
+                             umbral=0.3, estabilidad=1.0)
+    inicio = monitor.inicio
+    # Durante el periodo de gracia no se abandona al Central aunque no haya latido
+    latir(monitor, 1, inicio + 0.1)
+    assert monitor.elegir(inicio + 0.2) == 0
+    # Pasado el umbral sin latidos del Central se cambia a la Réplica viva
+    latir(monitor, 1, inicio + 0.4)
+    assert monitor.elegir(inicio + 0.5) == 1
+    # El Central vuelve, pero no se regresa hasta que lleve `estabilidad` latiendo
+    for paso in range(1, 10):
+        latir(monitor, 0, inicio + 1 + paso * 0.1)
+        latir(monitor, 1, inicio + 1 + paso * 0.1)
+        assert monitor.elegir(inicio + 1 + paso * 0.1) == 1
+    # Un corte en su racha reinicia la cuenta
+    for paso in range(12):
+        ahora = inicio + 2.5 + paso * 0.1
+        latir(monitor, 0, ahora)
+        latir(monitor, 1, ahora)
+        if paso < 10:
+            assert monitor.elegir(ahora) == 1
+    assert monitor.elegir(ahora) == 0
+    for socket in monitor.sockets:
+        socket.close()
+
+def test_sin_otro_servidor_vivo_se_mantiene_el_actual():
+    monitor = MonitorLatidos(zmq.Context.instance(), ["inproc://latidos-a", "inproc://latidos-b"], umbral=0.3)
+    assert monitor.elegir(monitor.inicio + 5) == 0
+    for socket in monitor.sockets:
+        socket.close()
@@ -0,0 +1,146 @@
+# test_persistencia.py
+
+import os
+import threading
+
+from persistencia import DiarioEstado, codificar_registro, decodificar_registro, LONGITUD
+
+def registro(secuencia, **extra):
+    base = {
+        "secuencia": secuencia,
+        "facultad": "Facultad de Ingeniería",
+        "programa": f"Programa {secuencia}",
+        "semestre": "2025-10",
+        "salones_asignados": 2,
+        "laboratorios_asignados": 1,
+        "salones_ids": ["S001", "S002"],
+        "laboratorios_ids": ["L01"],
+        "estado": "asignado"
+    }
+    base.update(extra)
+    return base
+
+def nuevo_diario(directorio, estado=None):
+    """
+    Diario sin fsync cuya instantánea captura `estado` (secuencia, dict).
+    """
+    estado = estado if estado is not None else {"secuencia": 0, "datos": {}}
+    return DiarioEstado(str(directorio), threading.Lock(),
+                        lambda: (estado["secuencia"], estado["datos"]), fsync=False)
+
+def test_registro_ida_y_vuelta():
+    original = registro(7, franja=3, id_solicitud="abc-123")
+    cuerpo = codificar_registro(original)[LONGITUD.size:-LONGITUD.size]
+    assert decodificar_registro(cuerpo) == original
+
+def test_registro_sin_campos_opcionales():
+    original = {"secuencia": 1, "facultad": "F", "programa": "P", "semestre": "",
+                "salones_asignados": 0, "laboratorios_asignados": 0, "estado": "rechazado"}
+    cuerpo = codificar_registro(original)[LONGITUD.size:-LONGITUD.size]
+    assert decodificar_registro(cuerpo) == original
+
+def test_recupera_el_wal_tras_reiniciar(tmp_path):
+    diario = nuevo_diario(tmp_path)
+    diario.recuperar()
+    diario.iniciar()
+    for secuencia in range(1, 6):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(5, timeout=5)
+    diario.cerrar()
+
+    estado, registros = nuevo_diario(tmp_path).recuperar()
+    assert estado is None
+    assert registros == [registro(s) for s in range(1, 6)]
+
+def test_trunca_un_registro_final_incompleto(tmp_path):
+    diario = nuevo_diario(tmp_path)
+    diario.recuperar()
+    diario.iniciar()
+    for secuencia in range(1, 4):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(3, timeout=5)
+    diario.cerrar()
+    ruta = diario.archivo.name
+    valido = os.path.getsize(ruta)
+    # Escritura interrumpida: solo la mitad del cuarto registro llegó al disco
+    with open(ruta, "ab") as f:
+        f.write(codificar_registro(registro(4))[:20])
+
+    recuperado = nuevo_diario(tmp_path)
+    _, registros = recuperado.recuperar()
+    assert [r["secuencia"] for r in registros] == [1, 2, 3]
+    assert os.path.getsize(ruta) == valido
+    assert recuperado.ultima == 3
+
+def test_ignora_un_registro_con_crc_invalido(tmp_path):
+    diario = nuevo_diario(tmp_path)
+    diario.recuperar()
+    diario.iniciar()
+    for secuencia in range(1, 4):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(3, timeout=5)
+    diario.cerrar()
+    ruta = diario.archivo.name
+    with open(ruta, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        ultimo = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([ultimo[0] ^ 0xFF]))
+
+    _, registros = nuevo_diario(tmp_path).recuperar()
+    assert [r["secuencia"] for r in registros] == [1, 2]
+
+def test_instantanea_mas_cola_del_wal(tmp_path):
+    estado = {"secuencia": 0, "datos": {}}
+    diario = nuevo_diario(tmp_path, estado)
+    diario.recuperar()
+    diario.iniciar()
+    for secuencia in range(1, 4):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(3, timeout=5)
+    estado["secuencia"], estado["datos"] = 3, {"asignadas": 3}
+    diario.tomar_instantanea()
+    for secuencia in range(4, 6):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(5, timeout=5)
+    diario.cerrar()
+
+    recuperado = nuevo_diario(tmp_path)
+    datos, registros = recuperado.recuperar()
+    assert datos == {"asignadas": 3}
+    assert [r["secuencia"] for r in registros] == [4, 5]
+    assert recuperado.ultima == 5
+    # Los segmentos cubiertos por la instantánea se borraron
+    assert len(recuperado._segmentos()) == 1
+
+def test_instantanea_corrupta_se_descarta(tmp_path):
+    estado = {"secuencia": 2, "datos": {"asignadas": 2}}
+    diario = nuevo_diario(tmp_path, estado)
+    diario.recuperar()
+    diario.iniciar()
+    diario.tomar_instantanea()
+    diario.cerrar()
+    with open(diario._ruta_snapshot(), "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x00")
+
+    assert nuevo_diario(tmp_path).cargar_instantanea() == (0, None)
+
+def test_reiniciar_descarta_el_wal(tmp_path):
+    estado = {"secuencia": 0, "datos": {}}
+    diario = nuevo_diario(tmp_path, estado)
+    diario.recuperar()
+    diario.iniciar()
+    for secuencia in range(1, 4):
+        diario.registrar(registro(secuencia))
+    assert diario.esperar(3, timeout=5)
+    # Instantánea instalada desde el Central en la secuencia 10
+    estado["secuencia"], estado["datos"] = 10, {"instalada": True}
+    diario.reiniciar(10)
+    diario.registrar(registro(11))
+    assert diario.esperar(11, timeout=5)
+    diario.cerrar()
+
+    datos, registros = nuevo_diario(tmp_path).recuperar()
+    assert datos == {"instalada": True}
+    assert [r["secuencia"] for r in registros] == [11]
@@ -0,0 +1,26 @@
+# test_programa_aca.py
+
+import json
+
+from programa_aca import leer_catalogo
+
+def test_catalogo_csv_con_campos_opcionales(tmp_path):
+    ruta = tmp_path / "programas.csv"
+    ruta.write_text("programa,semestre,salones,laboratorios,facultad,franja,capacidad_minima,edificio,campus\n"
+                    " Sistemas ,2025-10,3,1,Ingeniería,4,40, B ,\n"
+                    "Derecho,2026-10,2,0,,,,,Norte\n", encoding="utf-8")
+    assert leer_catalogo(str(ruta)) == [
+        {"programa": "Sistemas", "semestre": "2025-10", "salones": 3, "laboratorios": 1,
+         "facultad": "Ingeniería", "franja": 4, "capacidad_minima": 40, "edificio": "B"},
+        {"programa": "Derecho", "semestre": "2026-10", "salones": 2, "laboratorios": 0, "campus": "Norte"},
+    ]
+
+def test_catalogo_jsonl(tmp_path):
+    ruta = tmp_path / "programas.jsonl"
+    filas = [{"programa": "Medicina", "semestre": "2025-10", "salones": "5", "laboratorios": 2, "franja": 0},
+             {"programa": "Artes", "semestre": "2025-20", "salones": 1, "laboratorios": 0, "edificio": None}]
+    ruta.write_text("\n".join(json.dumps(fila) for fila in filas) + "\n\n", encoding="utf-8")
+    assert leer_catalogo(str(ruta)) == [
+        {"programa": "Medicina", "semestre": "2025-10", "salones": 5, "laboratorios": 2, "franja": 0},
+        {"programa": "Artes", "semestre": "2025-20", "salones": 1, "laboratorios": 0},
+    ]
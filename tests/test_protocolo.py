@@ -0,0 +1,147 @@
+# test_protocolo.py
+
+import pytest
+
+from protocolo import (codificar, codificar_lote, decodificar, decodificar_lote, codec_respuesta, Negociacion,
+                       ErrorProtocolo, ESQUEMAS, ESTADOS, CODEC_JSON, CODEC_BINARIO, SOLICITUD, ASIGNACION,
+                       REGISTRO, CAMPO_VERSION, CAMPO_ERROR, VERSION_BINARIA, VERSION_MINIMA,
+                       CODEC_BINARIO_PREVIO, respuesta_ilegible)
+
+# Frames codificados por nodos v2 (antes de campus, trazas y estados de préstamo)
+SOLICITUD_V2  = (b"\x02\x01\x03\x00\x02\x00a1\x07\x002025-10\x0b\x00Ingenier\xc3\xada\x01\x007\x01\x00\x00"
+                 b"\x01\x00\x02\x00\x02\x00\x00\x00\x01\x00\x00\x00\x03\x00\x00\x00")
+ASIGNACION_V2 = (b"\x02\x02\x05\x00\x02\x00a1\x0b\x00Ingenier\xc3\xada\x03\x00S-1\x03\x00S-2\x03\x00L-1\x01"
+                 b"\x00\xe3\x00\x00\x00\x01\x00\x01\x02\x00\x02\x00\x03\x00\x01\x00\x04\x00")
+
+def ejemplo(esquema, n=0):
+    """
+    Mensaje con todos los campos de `esquema`; los de la versión actual
+    entran siempre, así que las pruebas no dependen de la lista de campos.
+    """
+    mensaje = {}
+    for nombre, tipo in esquema:
+        if isinstance(tipo, tuple):
+            mensaje[nombre] = [ejemplo(tipo[1], n), ejemplo(tipo[1], n + 1)]
+        elif tipo == "s":
+            mensaje[nombre] = f"{nombre} {n % 3} ñ"
+        elif tipo == "ls":
+            mensaje[nombre] = [f"A{n % 5:03d}", f"A{n % 5 + 1:03d}"]
+        elif tipo == "i":
+            mensaje[nombre] = n % 7
+        elif tipo == "q":
+            mensaje[nombre] = n + 1
+        elif tipo == "e":
+            mensaje[nombre] = ESTADOS[n % len(ESTADOS)]
+        else:
+            mensaje[nombre] = bool(n % 2)
+    return mensaje
+
+@pytest.mark.parametrize("tipo", sorted(ESQUEMAS))
+@pytest.mark.parametrize("codec", [CODEC_JSON, CODEC_BINARIO])
+def test_mensaje_ida_y_vuelta(tipo, codec):
+    mensaje = ejemplo(ESQUEMAS[tipo], 1)
+    assert decodificar(codificar(mensaje, tipo, codec)) == (mensaje, codec)
+
+@pytest.mark.parametrize("estado", ESTADOS)
+def test_asignacion_binaria_con_cada_estado(estado):
+    asignacion = dict(ejemplo(ESQUEMAS[ASIGNACION]), estado=estado)
+    assert decodificar(codificar(asignacion, ASIGNACION, CODEC_BINARIO)) == (asignacion, CODEC_BINARIO)
+
+def test_campos_ausentes_no_aparecen():
+    asignacion = {"facultad": "F", "estado": ESTADOS[0]}
+    assert decodificar(codificar(asignacion, ASIGNACION, CODEC_BINARIO))[0] == asignacion
+
+def test_lote_binario_interna_las_cadenas():
+    registros = [ejemplo(ESQUEMAS[REGISTRO], n) for n in range(100)]
+    binario = codificar_lote(registros, REGISTRO, CODEC_BINARIO)
+    assert decodificar_lote(binario) == (registros, CODEC_BINARIO)
+    # Cada cadena repetida se escribe una sola vez por frame
+    assert len(binario) * 3 < len(codificar_lote(registros, REGISTRO, CODEC_JSON))
+
+def test_lote_json_y_objeto_suelto():
+    registros = [ejemplo(ESQUEMAS[REGISTRO], n) for n in range(2)]
+    assert decodificar_lote(codificar_lote(registros, REGISTRO)) == (registros, CODEC_JSON)
+    assert decodificar_lote(codificar(registros[0], REGISTRO)) == ([registros[0]], CODEC_JSON)
+
+@pytest.mark.parametrize("cambio", [
+    {"campo_nuevo": "x"},            # campo fuera del esquema
+    {"estado": "desconocido"},       # estado fuera de la lista
+    {"salones_asignados": 2 ** 40},  # no cabe en int32
+    {"facultad": 3},                 # tipo equivocado
+])
+def test_lo_no_representable_viaja_en_json(cambio):
+    mensaje = dict(ejemplo(ESQUEMAS[REGISTRO]), **cambio)
+    assert decodificar(codificar(mensaje, REGISTRO, CODEC_BINARIO)) == (mensaje, CODEC_JSON)
+
+def test_decodificar_exige_un_solo_mensaje():
+    registros = [ejemplo(ESQUEMAS[REGISTRO], n) for n in range(2)]
+    with pytest.raises(ErrorProtocolo):
+        decodificar(codificar_lote(registros, REGISTRO, CODEC_BINARIO))
+
+@pytest.mark.parametrize("payload", [
+    bytes([VERSION_BINARIA + 1, REGISTRO]),   # versión futura
+    b"\x00garbage",
+    b"{no es json",
+])
+def test_payload_invalido(payload):
+    with pytest.raises(ErrorProtocolo):
+        decodificar_lote(payload)
+
+def test_payload_binario_truncado():
+    registros = [ejemplo(ESQUEMAS[REGISTRO], n) for n in range(2)]
+    payload = codificar_lote(registros, REGISTRO, CODEC_BINARIO)
+    for largo in range(1, len(payload)):
+        with pytest.raises(ErrorProtocolo):
+            decodificar_lote(payload[:largo])
+
+def test_codec_respuesta_sigue_el_anuncio():
+    solicitud = ejemplo(ESQUEMAS[SOLICITUD])
+    anunciada = dict(solicitud, **{CAMPO_VERSION: VERSION_BINARIA})
+    assert codec_respuesta(CODEC_JSON, anunciada) == CODEC_BINARIO
+    assert CAMPO_VERSION not in anunciada
+    assert codec_respuesta(CODEC_JSON, dict(solicitud, **{CAMPO_VERSION: VERSION_BINARIA + 1})) == CODEC_JSON
+    assert codec_respuesta(CODEC_JSON, dict(solicitud)) == CODEC_JSON
+    assert codec_respuesta(CODEC_BINARIO, dict(solicitud)) == CODEC_BINARIO
+
+def test_negociacion_pasa_a_binario_con_la_primera_respuesta_binaria():
+    solicitud = ejemplo(ESQUEMAS[SOLICITUD])
+    negociacion = Negociacion()
+    mensaje, codec = decodificar(negociacion.codificar(solicitud, SOLICITUD))
+    assert codec == CODEC_JSON and mensaje[CAMPO_VERSION] == VERSION_BINARIA
+
+    negociacion.decodificar(codificar({"estado": ESTADOS[1]}, ASIGNACION, CODEC_BINARIO))
+    assert decodificar(negociacion.codificar(solicitud, SOLICITUD)) == (solicitud, CODEC_BINARIO)
+
+    negociacion.reiniciar()
+    assert decodificar(negociacion.codificar(solicitud, SOLICITUD))[1] == CODEC_JSON
+
+def test_frame_de_version_anterior_se_lee_y_se_responde_en_json():
+    solicitud, codec = decodificar(SOLICITUD_V2)
+    assert codec == CODEC_BINARIO_PREVIO
+    assert solicitud == {"id_solicitud": "a1", "semestre": "2025-10", "facultad": "Ingeniería",
+                         "salones": 2, "laboratorios": 1, "franja": 3}
+    # Los campos posteriores a la v2 no vienen y toman su valor por defecto
+    assert solicitud.get("campus") is None
+    assert codec_respuesta(codec, solicitud) == CODEC_JSON
+
+    asignacion, _ = decodificar(ASIGNACION_V2)
+    assert asignacion == {"id_solicitud": "a1", "facultad": "Ingeniería", "estado": "asignado",
+                          "salones_ids": ["S-1", "S-2"], "laboratorios_ids": ["L-1"]}
+
+@pytest.mark.parametrize("version", range(VERSION_MINIMA, VERSION_BINARIA))
+def test_todas_las_versiones_soportadas_se_leen(version):
+    mensaje = {"id_solicitud": "x", "semestre": "2025-10", "salones": 1, "laboratorios": 0}
+    payload = bytes([version]) + codificar(mensaje, SOLICITUD, CODEC_BINARIO)[1:]
+    assert decodificar(payload) == (mensaje, CODEC_BINARIO_PREVIO)
+
+def test_negociacion_vuelve_a_json_ante_una_respuesta_de_error():
+    negociacion = Negociacion()
+    negociacion.decodificar(codificar({"estado": ESTADOS[1]}, ASIGNACION, CODEC_BINARIO))
+    assert negociacion.codec == CODEC_BINARIO
+
+    with pytest.raises(ErrorProtocolo) as error:
+        decodificar(bytes([VERSION_BINARIA + 1, SOLICITUD]))
+    respuesta = negociacion.decodificar(respuesta_ilegible(error.value))
+    assert CAMPO_ERROR in respuesta
+    assert negociacion.codec == CODEC_JSON
+    assert decodificar(negociacion.codificar({"salones": 1}, SOLICITUD))[1] == CODEC_JSON
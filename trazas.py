@@ -0,0 +1,224 @@
+# trazas.py
+
+import os
+import sys
+import time
+import random
+import signal
+import cProfile
+import threading
+import tracemalloc
+
+from escritor import escritor_compartido
+from histograma import Histograma
+
+# Campo del mensaje que lleva el id de traza de programa_aca hasta la Réplica
+CAMPO_TRAZA = "traza"
+
+# Fracción de solicitudes que se trazan en el origen (programas y lotes sin traza)
+MUESTREO_TRAZAS = 0.01
+
+# Cada proceso anexa sus tramos a trazas_<proceso>.tsv, una línea por tramo:
+#   traza \t etapa \t inicio (µs desde epoch) \t duración (µs)
+ARCHIVO_TRAZAS = "trazas_{proceso}.tsv"
+
+# Perfilado bajo demanda: `kill -USR2 <pid>` lo activa y la siguiente señal lo
+# detiene y vuelca perfil_<proceso>_<hilo>_<instante>.prof y memoria_<proceso>_<instante>.txt
+SENAL_PERFIL = getattr(signal, "SIGUSR2", None)
+LINEAS_MEMORIA = 25   # líneas de mayor asignación de memoria en el volcado
+
+_proceso  = "proceso"
+_archivo  = ARCHIVO_TRAZAS.format(proceso=_proceso)
+_muestreo = MUESTREO_TRAZAS
+_local    = threading.local()
+
+def configurar(proceso, muestreo=MUESTREO_TRAZAS, archivo=None):
+    """
+    Fija el nombre del proceso, la tasa de muestreo y el archivo de tramos.
+
+    Args:
+        proceso (str): Nombre del proceso (e.g., "central", "facultades").
+        muestreo (float): Fracción de solicitudes a trazar en el origen (0 = ninguna).
+        archivo (str): Ruta del archivo de tramos (por defecto ARCHIVO_TRAZAS).
+    """
+    global _proceso, _archivo, _muestreo
+    _proceso  = proceso
+    _archivo  = archivo or ARCHIVO_TRAZAS.format(proceso=proceso)
+    _muestreo = muestreo
+
+def muestrear():
+    """
+    Devuelve un id de traza nuevo con probabilidad `muestreo`, o None.
+    """
+    if _muestreo > 0 and random.random() < _muestreo:
+        return os.urandom(8).hex()
+    return None
+
+def activar(traza):
+    """
+    Fija la traza en curso del hilo (None para ninguna), para los tramos que
+    se miden lejos del mensaje (p. ej. dentro de Recursos).
+    """
+    _local.traza = traza
+
+def activa():
+    return getattr(_local, "traza", None)
+
+def registrar(traza, etapa, inicio, fin):
+    """
+    Anota un tramo ya medido. No hace nada si la solicitud no está muestreada.
+    """
+    if traza is None:
+        return
+    escritor_compartido().escribir(
+        _archivo, f"{traza}\t{etapa}\t{int(inicio * 1e6)}\t{int((fin - inicio) * 1e6)}\n"
+    )
+
+class _Tramo:
+    __slots__ = ("traza", "etapa", "inicio")
+
+    def __init__(self, traza, etapa):
+        self.traza = traza
+        self.etapa = etapa
+
+    def __enter__(self):
+        self.inicio = time.time()
+        return self
+
+    def __exit__(self, *excepcion):
+        registrar(self.traza, self.etapa, self.inicio, time.time())
+        return False
+
+class _TramoNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        return False
+
+_NULO = _TramoNulo()
+
+def tramo(etapa, traza=None):
+    """
+    Context manager que mide `etapa` para `traza` (o la traza activa del hilo).
+    Sin traza devuelve un objeto nulo compartido: el camino no muestreado no
+    llama a time.time() ni escribe nada.
+    """
+    traza = traza or activa()
+    return _Tramo(traza, etapa) if traza is not None else _NULO
+
+# --- PERFILADO BAJO DEMANDA ---
+
+class Perfilador:
+    """
+    cProfile y tracemalloc que se encienden y apagan en caliente.
+
+    `alternar` (o la señal SENAL_PERFIL) cambia el estado pedido; tracemalloc
+    es global y se enciende al momento. cProfile mide solo el hilo que lo
+    activa, así que cada bucle de atención llama a `revisar()` en cada vuelta
+    para seguir el estado pedido dentro de su propio hilo.
+    """
+    def __init__(self):
+        self.solicitado = False
+        self.lock       = threading.Lock()
+
+    def alternar(self):
+        with self.lock:
+            self.solicitado = not self.solicitado
+            if self.solicitado:
+                tracemalloc.start()
+                print(f"Perfilado activado en {_proceso}")
+            elif tracemalloc.is_tracing():
+                ruta = f"memoria_{_proceso}_{int(time.time())}.txt"
+                estadisticas = tracemalloc.take_snapshot().statistics("lineno")
+                tracemalloc.stop()
+                with open(ruta, "w") as f:
+                    f.writelines(f"{linea}\n" for linea in estadisticas[:LINEAS_MEMORIA])
+                print(f"Perfilado detenido en {_proceso}; memoria en {ruta}")
+
+    def revisar(self):
+        """
+        Enciende o apaga cProfile en el hilo actual según el estado pedido.
+        """
+        perfil = getattr(_local, "perfil", None)
+        if self.solicitado and perfil is None:
+            _local.perfil = cProfile.Profile()
+            _local.perfil.enable()
+        elif not self.solicitado and perfil is not None:
+            perfil.disable()
+            _local.perfil = None
+            ruta = f"perfil_{_proceso}_{threading.current_thread().name}_{int(time.time())}.prof"
+            perfil.dump_stats(ruta)
+            print(f"Perfil del hilo {threading.current_thread().name} en {ruta}")
+
+PERFILADOR = Perfilador()
+
+def instalar_senal():
+    """
+    Asocia SENAL_PERFIL a PERFILADOR.alternar. Solo el hilo principal puede
+    instalar manejadores de señales; en otro hilo (p. ej. en el banco de
+    pruebas) o sin SIGUSR2 (Windows) no hace nada.
+    """
+    if SENAL_PERFIL is None or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(SENAL_PERFIL, lambda numero, marco: PERFILADOR.alternar())
+
+# --- AGREGACIÓN ---
+
+def leer_tramos(rutas):
+    """
+    Lee los tramos de varios archivos de trazas: lista de (traza, etapa, inicio_us, duracion_us).
+    """
+    tramos = []
+    for ruta in rutas:
+        with open(ruta) as f:
+            for linea in f:
+                partes = linea.rstrip("\n").split("\t")
+                if len(partes) == 4:
+                    tramos.append((partes[0], partes[1], int(partes[2]), int(partes[3])))
+    return tramos
+
+def agregar(tramos):
+    """
+    Resume los tramos por etapa (histograma de duraciones) y reconstruye cada
+    traza: suma de duraciones por etapa y extremo a extremo (del primer
+    inicio al último fin; los relojes de las máquinas deben estar sincronizados).
+    """
+    por_etapa = {}
+    por_traza = {}
+    for traza, etapa, inicio, duracion in tramos:
+        if etapa not in por_etapa:
+            por_etapa[etapa] = Histograma()
+        por_etapa[etapa].registrar(duracion / 1e6)
+        datos = por_traza.setdefault(traza, {"inicio": inicio, "fin": inicio + duracion, "etapas": {}})
+        datos["inicio"] = min(datos["inicio"], inicio)
+        datos["fin"] = max(datos["fin"], inicio + duracion)
+        datos["etapas"][etapa] = datos["etapas"].get(etapa, 0) + duracion
+    return por_etapa, por_traza
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python3 trazas.py <trazas_*.tsv> [...] [--lentas N]")
+        sys.exit(1)
+    argumentos = sys.argv[1:]
+    lentas = 5
+    if "--lentas" in argumentos:
+        i = argumentos.index("--lentas")
+        lentas = int(argumentos[i + 1])
+        del argumentos[i:i + 2]
+    por_etapa, por_traza = agregar(leer_tramos(argumentos))
+
+    print(f"{len(por_traza)} trazas, {sum(h.total for h in por_etapa.values())} tramos\n")
+    print(f"{'etapa':32} {'n':>7} {'p50 ms':>9} {'p99 ms':>9} {'total s':>9}")
+    for etapa, histograma in sorted(por_etapa.items(), key=lambda e: -e[1].suma):
+        resumen = histograma.resumen()
+        print(f"{etapa:32} {histograma.total:>7} {resumen['p50'] * 1e3:>9.3f} "
+              f"{resumen['p99'] * 1e3:>9.3f} {histograma.suma:>9.3f}")
+
+    print("\nTrazas más lentas (extremo a extremo):")
+    for traza, datos in sorted(por_traza.items(), key=lambda t: t[1]["inicio"] - t[1]["fin"])[:lentas]:
+        print(f"  {traza}  {(datos['fin'] - datos['inicio']) / 1e3:.3f} ms")
+        for etapa, duracion in sorted(datos["etapas"].items(), key=lambda e: -e[1]):
+            print(f"    {etapa:30} {duracion / 1e3:>9.3f} ms")